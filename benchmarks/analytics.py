@@ -0,0 +1,253 @@
+"""
+Benchmark suite for the analytics core: Сorrelation, MultipleLinearRegression
+and OrdinalLogisticRegression on synthetic life-tracking data shaped like
+data/lifestyle_data_*.csv, across n (days) and p (parameters).
+
+    python -m benchmarks.analytics                      # full grid
+    python -m benchmarks.analytics --quick              # small grid
+    python -m benchmarks.analytics --compare benchmarks/results/<old>.json
+
+Each case records the median and best wall time over --repeat runs and the
+peak traced memory of one run. Results go to benchmarks/results/<timestamp>.json;
+--compare prints the speed ratio against an earlier file.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+import pandas as pd
+
+from core.correlation_kernels import bin_codes
+from core.correlations import Сorrelation
+from core.linear_regression import MultipleLinearRegression
+from core.logistic_regression import OrdinalLogisticRegression
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+N_VALUES = (10, 30, 100, 365, 1000, 10_000)
+P_VALUES = (3, 10, 20, 50)
+QUICK_N = (30, 365)
+QUICK_P = (3, 10)
+# pandas' Kendall is O(n²) per pair; above this it dominates the whole run
+KENDALL_MAX_N = 2000
+# distance correlation is O(n²) per pair too; the naive version also needs two n×n matrices per pair
+DCOR_MAX_N = 2000
+
+BASE_FEATURES = ("sleep_hours", "food_quality", "water_liters", "vitamins", "sleep_quality", "sport_hours")
+GOALS = ("mood", "productivity")
+# Share of cells left empty in the *_sparse cases
+SPARSE_MISSING = 0.3
+
+
+def synthetic_dataset(n: int, p: int, seed: int = 0) -> tuple[pd.DataFrame, list[str]]:
+    """
+    n days × p parameters in the style of data/lifestyle_data_*.csv: a mix of numeric,
+    1–5 class and 0/1 columns, with goals that depend on a few of the features.
+    Returns (frame, goal column names).
+    """
+    rng = np.random.default_rng(seed)
+    goals = list(GOALS[:1 if p < 4 else 2])
+    n_features = p - len(goals)
+
+    columns = {}
+    for i in range(n_features):
+        name = BASE_FEATURES[i] if i < len(BASE_FEATURES) else f"param_{i}"
+        kind = i % 3
+        if kind == 0:
+            columns[name] = rng.normal(7, 1.2, n).round(1)
+        elif kind == 1:
+            columns[name] = rng.integers(1, 6, n)
+        else:
+            columns[name] = rng.integers(0, 2, n)
+    df = pd.DataFrame(columns)
+
+    signal = df.iloc[:, : min(3, n_features)].sub(df.iloc[:, : min(3, n_features)].mean()).sum(axis=1)
+    for goal in goals:
+        latent = signal + rng.normal(0, 1, n)
+        # 1–5 classes, like the mood/productivity columns
+        df[goal] = pd.qcut(latent.rank(method="first"), 5, labels=False) + 1
+    return df, goals
+
+
+def _naive_mutual_info(df: pd.DataFrame, goals: list[str]) -> pd.DataFrame:
+    """Reference for the mutual_info kernel: the same bins, one crosstab per pair."""
+    features = [c for c in df.columns if c not in goals]
+    codes = pd.DataFrame(bin_codes(df.to_numpy(dtype=float)), columns=df.columns)
+    out = pd.DataFrame(index=features, columns=goals, dtype=float)
+    for f in features:
+        for g in goals:
+            pair = codes[[f, g]][(codes[f] >= 0) & (codes[g] >= 0)]
+            p = pd.crosstab(pair[f], pair[g]).to_numpy() / len(pair)
+            outer = np.outer(p.sum(axis=1), p.sum(axis=0))
+            nz = p > 0
+            out.at[f, g] = (p[nz] * np.log(p[nz] / outer[nz])).sum()
+    return out
+
+
+def _naive_dcor(df: pd.DataFrame, goals: list[str]) -> pd.DataFrame:
+    """Reference for the dcor kernel: the textbook double-centred n×n matrices, one pair at a time over its overlap."""
+    features = [c for c in df.columns if c not in goals]
+
+    def centred(x):
+        a = np.abs(x[:, None] - x[None, :])
+        return a - a.mean(axis=0) - a.mean(axis=1)[:, None] + a.mean()
+
+    out = pd.DataFrame(index=features, columns=goals, dtype=float)
+    for f in features:
+        for g in goals:
+            pair = df[[f, g]].dropna()
+            a = centred(pair[f].to_numpy(dtype=float))
+            b = centred(pair[g].to_numpy(dtype=float))
+            out.at[f, g] = np.sqrt((a * b).mean() / np.sqrt((a * a).mean() * (b * b).mean()))
+    return out
+
+
+def _timed(fn, repeat: int) -> dict:
+    with contextlib.redirect_stdout(io.StringIO()):  # Сorrelation prints its matrices
+        return _measure(fn, repeat)
+
+
+def _measure(fn, repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds_median": statistics.median(times), "seconds_min": min(times), "peak_mb": peak / 2**20}
+
+
+def _cases(df: pd.DataFrame, goals: list[str]) -> dict:
+    """name -> zero-argument callable; fits needed by predict cases are made once here."""
+    target = goals[0]
+    X, y = df.drop(columns=goals), df[target].astype(float)
+    cases = {
+        "linear_fit": lambda: MultipleLinearRegression(X.copy(), y),
+        "pearson": lambda: Сorrelation.pearson(df, goals),
+        "chart": lambda: Сorrelation.correlation_matrix_chart(Сorrelation.pearson(df, goals), out=BytesIO()),
+    }
+    if len(df) <= KENDALL_MAX_N:
+        cases["kendall"] = lambda: Сorrelation.kendall(df, goals)
+
+    # skipped parameters: masked pairwise-complete kernels against DataFrame.corr's per-pair loop
+    sparse = df.astype(float).mask(np.random.default_rng(0).random(df.shape) < SPARSE_MISSING)
+    for method in ("pearson", "spearman"):
+        cases[f"{method}_sparse"] = lambda m=method: Сorrelation.pairwise(sparse, goals, method=m)
+        cases[f"{method}_sparse_pandas"] = lambda m=method: sparse.corr(method=m)[goals].drop(goals)
+
+    # nonlinear dependence: the vectorised kernels against per-pair loops
+    cases["spearman"] = lambda: Сorrelation.spearman(df, goals)
+    cases["spearman_pandas"] = lambda: df.corr(method="spearman")[goals].drop(goals)
+    cases["mutual_info_sparse"] = lambda: Сorrelation.mutual_information(sparse, goals)
+    cases["mutual_info_naive"] = lambda: _naive_mutual_info(sparse, goals)
+    if len(df) <= DCOR_MAX_N:
+        cases["dcor"] = lambda: Сorrelation.distance_correlation(df, goals)
+        cases["dcor_naive"] = lambda: _naive_dcor(df, goals)
+        cases["dcor_sparse"] = lambda: Сorrelation.distance_correlation(sparse, goals)
+        cases["dcor_sparse_naive"] = lambda: _naive_dcor(sparse, goals)
+
+    try:
+        linear = MultipleLinearRegression(X.copy(), y)
+        cases["linear_predict"] = lambda: linear.predict(X.copy())
+    except Exception:
+        pass
+
+    cases["ordinal_fit"] = lambda: OrdinalLogisticRegression(X, df[target])
+    try:
+        ordinal = OrdinalLogisticRegression(X, df[target])
+        cases["ordinal_predict"] = lambda: ordinal.predict(X)
+    except Exception:
+        pass
+    return cases
+
+
+def run(n_values, p_values, repeat: int, seed: int = 0) -> list[dict]:
+    results = []
+    for n in n_values:
+        for p in p_values:
+            df, goals = synthetic_dataset(n, p, seed)
+            for name, fn in _cases(df, goals).items():
+                row = {"case": name, "n": n, "p": p}
+                try:
+                    row.update(_timed(fn, repeat))
+                except Exception as e:  # e.g. p > n: the fit itself is impossible, record why
+                    row["error"] = f"{type(e).__name__}: {e}"[:200]
+                results.append(row)
+                timing = f"{row['seconds_median'] * 1000:9.2f} ms  {row['peak_mb']:8.2f} MB" if "error" not in row else row["error"]
+                print(f"n={n:<6} p={p:<3} {name:16} {timing}")
+    return results
+
+
+def _meta() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    import statsmodels
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "statsmodels": statsmodels.__version__,
+    }
+
+
+def compare(old_path: str, new_results: list[dict]) -> None:
+    """Print new/old median time per case; below 1.0 means faster now."""
+    with open(old_path) as f:
+        old = {(r["case"], r["n"], r["p"]): r for r in json.load(f)["results"]}
+    print(f"\n{'case':16} {'n':>6} {'p':>3} {'old ms':>10} {'new ms':>10} {'ratio':>7}")
+    for r in new_results:
+        before = old.get((r["case"], r["n"], r["p"]))
+        if not before or "error" in r or "error" in before:
+            continue
+        ratio = r["seconds_median"] / before["seconds_median"]
+        print(f"{r['case']:16} {r['n']:>6} {r['p']:>3} {before['seconds_median'] * 1000:10.2f} "
+              f"{r['seconds_median'] * 1000:10.2f} {ratio:7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analytics core benchmarks")
+    parser.add_argument("--quick", action="store_true", help=f"n in {QUICK_N}, p in {QUICK_P}")
+    parser.add_argument("--n", type=int, nargs="*", help="override the n grid")
+    parser.add_argument("--p", type=int, nargs="*", help="override the p grid")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    n_values = args.n or (QUICK_N if args.quick else N_VALUES)
+    p_values = args.p or (QUICK_P if args.quick else P_VALUES)
+    results = run(n_values, p_values, args.repeat)
+
+    meta = _meta()
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{meta['timestamp'].replace(':', '-')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"\nSaved {len(results)} results to {out}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Load-testing harness: simulated users drive the real Dispatcher and router
+through /start → /new → define parameters → /enter → /analyze, against a
+local database and a fake Telegram Bot session (no network).
+
+    python -m benchmarks.load --users 200 --concurrency 1 10 50 \
+        --database-url sqlite+aiosqlite:////tmp/bot_load.db --reset
+
+Reports p50/p95/p99 latency per handler and updates/second per concurrency
+level. --reset drops and recreates every table of the target database, so
+point it at a throwaway database.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import core.database.models as models
+import core.database.requests as rq
+from bot.handlers import router
+from bot.middlewares import setup_admission, setup_metrics
+from core import workers
+
+HISTORY_DAYS = 30
+
+# (name, role callback, type callback, class range) in the order the user defines them
+PARAMETERS = [
+    ("sleep_hours", "role_independent", "type_numeric", None),
+    ("water_liters", "role_independent", "type_numeric", None),
+    ("vitamins", "role_independent", "type_boolean", None),
+    ("mood", "role_goal", "type_class", (1, 5)),
+    ("productivity", "role_goal", "type_numeric", None),
+]
+
+
+def _value(name: str, rng: random.Random) -> str:
+    if name == "vitamins":
+        return rng.choice("+-")
+    if name == "mood":
+        return str(rng.randint(1, 5))
+    if name == "sleep_hours":
+        return f"{rng.gauss(7, 1):.1f}"
+    return f"{rng.uniform(0, 5):.1f}"
+
+
+class FakeSession(BaseSession):
+    """Answers every Bot API call locally; optional fixed latency stands in for the network."""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls = defaultdict(int)
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method.__returning__ is Message:
+            chat_id = getattr(method, "chat_id", 0)
+            return Message(message_id=next(self._message_ids), date=datetime.now(),
+                           chat=Chat(id=chat_id, type="private"))
+        return True  # bool results and Message | bool edits
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+class HandlerTimer:
+    """Inner middleware: wall time of every handler call, keyed by handler function name."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    async def __call__(self, handler, event, data):
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.samples[data["handler"].callback.__name__].append(time.perf_counter() - start)
+
+
+class SimulatedUser:
+    def __init__(self, dp: Dispatcher, bot: Bot, uid: int, seed: int):
+        self.dp, self.bot, self.uid = dp, bot, uid
+        self.rng = random.Random(seed)
+        self.user = User(id=uid, is_bot=False, first_name="Load", username=f"load_{uid}")
+        self.chat = Chat(id=uid, type="private")
+        self.updates = 0
+
+    def _message(self, text: str = "") -> Message:
+        return Message(message_id=self.rng.randint(1, 10**6), date=datetime.now(), chat=self.chat,
+                       from_user=self.user, text=text)
+
+    async def text(self, text: str):
+        self.updates += 1
+        await self.dp.feed_update(self.bot, Update(update_id=self.updates, message=self._message(text)))
+
+    async def tap(self, data: str):
+        self.updates += 1
+        query = CallbackQuery(id=f"{self.uid}-{self.updates}", from_user=self.user, chat_instance=str(self.uid),
+                              message=self._message(), data=data)
+        await self.dp.feed_update(self.bot, Update(update_id=self.updates, callback_query=query))
+
+    async def run(self):
+        await self.text("/start")
+
+        await self.text("/new")
+        await self.text(f"Load test {self.uid}")
+        await self.tap("exp_confirm")
+        for name, role, ptype, class_range in PARAMETERS:
+            await self.tap("add_parameter")
+            await self.text(name)
+            await self.tap(role)
+            await self.tap(ptype)
+            if class_range:
+                await self.text(str(class_range[0]))
+                await self.text(str(class_range[1]))
+            await self.tap("confirm")
+        await self.tap("finish")
+
+        exp = (await rq.get_list_experiments(self.uid))[0]
+        params = {p.name: p for p in await rq.get_list_parameters(exp.id)}
+
+        # history written directly (not timed), so /analyze has enough days to fit
+        for day in range(HISTORY_DAYS, 0, -1):
+            data = {name: _value(name, self.rng) for name in params}
+            await rq.add_daily_entry(self.uid, exp.id, date.today() - timedelta(days=day), data)
+
+        await self.text("/enter")
+        await self.tap(f"sel_exp:{exp.id}")
+        for name, p in params.items():
+            await self.tap(f"sel_param:{p.id}")
+            await self.text(_value(name, self.rng))
+        await self.tap("finish")
+
+        await self.text("/analyze")
+        await self.tap(f"sel_exp:{exp.id}")
+        await self.tap(f"sel_param:{params['productivity'].id}")
+
+
+def _percentiles(samples: list[float]) -> dict:
+    if len(samples) < 2:
+        value = samples[0] * 1000 if samples else float("nan")
+        return {"count": len(samples), "p50_ms": value, "p95_ms": value, "p99_ms": value}
+    q = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"count": len(samples), "p50_ms": q[49] * 1000, "p95_ms": q[94] * 1000, "p99_ms": q[98] * 1000}
+
+
+async def run_level(dp: Dispatcher, bot: Bot, timer: HandlerTimer, users: int, concurrency: int, first_uid: int) -> dict:
+    timer.samples.clear()
+    gate = asyncio.Semaphore(concurrency)
+    simulated = [SimulatedUser(dp, bot, first_uid + i, seed=i) for i in range(users)]
+
+    async def one(user):
+        async with gate:
+            await user.run()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(u) for u in simulated))
+    elapsed = time.perf_counter() - start
+
+    updates = sum(u.updates for u in simulated)
+    return {
+        "concurrency": concurrency,
+        "users": users,
+        "updates": updates,
+        "seconds": elapsed,
+        "updates_per_second": updates / elapsed,
+        "handlers": {name: _percentiles(s) for name, s in sorted(timer.samples.items())},
+    }
+
+
+def _print_level(level: dict) -> None:
+    print(f"\nconcurrency={level['concurrency']}  users={level['users']}  "
+          f"{level['updates']} updates in {level['seconds']:.1f}s → {level['updates_per_second']:.1f} updates/s")
+    print(f"  {'handler':28} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, h in level["handlers"].items():
+        print(f"  {name:28} {h['count']:>6} {h['p50_ms']:9.1f} {h['p95_ms']:9.1f} {h['p99_ms']:9.1f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Drive the Dispatcher with simulated users")
+    parser.add_argument("--users", type=int, default=100, help="simulated users per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--database-url", default=None, help="defaults to config.DATABASE_URL")
+    parser.add_argument("--reset", action="store_true", help="drop and recreate all tables first")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="simulated Telegram API latency, seconds")
+    parser.add_argument("--metrics", action="store_true", help="install the production metrics middlewares and hooks")
+    parser.add_argument("--admission", action="store_true", help="install the admission control of the analysis handlers")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    # point the whole request layer at the load-test database
+    engine = models.make_engine(args.database_url or models.DATABASE_URL)
+    rq.async_session = async_sessionmaker(engine)
+    async with engine.begin() as conn:
+        if args.reset:
+            await conn.run_sync(models.Base.metadata.drop_all)
+        await conn.run_sync(models.Base.metadata.create_all)
+
+    timer = HandlerTimer()
+    router.message.middleware(timer)
+    router.callback_query.middleware(timer)
+    dp = Dispatcher()
+    dp.include_router(router)
+    session = FakeSession(latency=args.api_latency)
+    bot = Bot(token="42:LOAD-TEST", session=session)
+    if args.metrics:  # compare runs with and without to see the instrumentation overhead
+        setup_metrics(dp, router, bot, engine)
+    if args.admission:
+        setup_admission(router)
+
+    levels = []
+    first_uid = 7_000_000_000 + int(time.time()) % 1_000_000 * 1000  # fresh users on every run
+    for concurrency in args.concurrency:
+        level = await run_level(dp, bot, timer, args.users, concurrency, first_uid)
+        first_uid += args.users
+        levels.append(level)
+        _print_level(level)
+
+    print("\nBot API calls:", dict(session.calls))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"levels": levels, "api_calls": dict(session.calls)}, f, indent=2)
+    workers.shutdown()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
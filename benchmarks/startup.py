@@ -0,0 +1,75 @@
+"""
+Bot cold-start benchmark: import time and resident memory up to the point
+where polling would begin (before the first update), measured in fresh
+interpreters.
+
+    python -m benchmarks.startup --runs 5
+
+Also reports whether the analytics stack leaked onto the startup path and
+what importing it costs, which is what the workers pay in core.workers.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ("pandas", "numpy", "matplotlib", "seaborn", "statsmodels", "scipy")
+
+# Runs in a fresh interpreter; prints one JSON line
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - t0
+rss_kb = 0
+with open("/proc/self/status") as f:
+    for line in f:
+        if line.startswith("VmRSS:"):
+            rss_kb = int(line.split()[1])
+print(json.dumps({{
+    "seconds": elapsed,
+    "rss_mb": rss_kb / 1024,
+    "heavy_loaded": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+SCENARIOS = {
+    # everything main() does before dp.start_polling
+    "bot_startup": "import main\nfrom bot.daily_reminder import make_scheduler\n"
+                   "main.dp.include_router(main.router)\nmake_scheduler(main.bot)",
+    # what each analysis worker imports in its initializer
+    "analytics_stack": "import core.analysis",
+}
+
+
+def measure(imports: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", _PROBE.format(imports=imports, heavy=HEAVY_MODULES)],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for name, imports in SCENARIOS.items():
+        runs = [measure(imports) for _ in range(args.runs)]
+        results[name] = {
+            "median_seconds": statistics.median(r["seconds"] for r in runs),
+            "median_rss_mb": statistics.median(r["rss_mb"] for r in runs),
+            "heavy_loaded": runs[-1]["heavy_loaded"],
+        }
+        print(f"{name:16} {results[name]['median_seconds']:.3f}s  {results[name]['median_rss_mb']:.1f} MB  "
+              f"heavy: {', '.join(results[name]['heavy_loaded']) or '-'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
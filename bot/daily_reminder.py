@@ -1,47 +1,126 @@
-# bot/utils.py
+import asyncio
+import functools
 from datetime import date
-from sqlalchemy import select
 
-from core.database.models import User, DailyEntry
-from core.database.requests import async_session
+from core.database import models
+from core.database.requests import get_users_without_entry
+from core.database.leader import LeaderElection
+from core.database.query_audit import audited
 from aiogram import Bot
 
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 
-async def remind_missing_entries(bot: Bot):
-    today = date.today()
-    async with async_session() as session:
-        # load every user
-        users = (await session.scalars(select(User))).all()
-
-        for user in users:
-            # for each, check if they’ve entered today’s data
-            stmt = select(DailyEntry).where(
-                DailyEntry.user_id == user.id,
-                DailyEntry.experiment_id != None,   # optional: only for existing experiments
-                DailyEntry.entry_date == today
+# Jobs live in this table of the bot's database, so a restart keeps their next run
+# times and missed runs are caught up (once, coalesced) within their grace time
+JOBSTORE_TABLE = "apscheduler_jobs"
+# the job store is synchronous: the same database through a sync driver
+_SYNC_DRIVERS = {"postgresql+asyncpg": "postgresql+psycopg2", "sqlite+aiosqlite": "sqlite"}
+
+# Stored jobs are pickled, so they get no Bot argument: the process' bot is set by make_scheduler
+_bot: Bot | None = None
+# ...and the election that decides whether this process may run them, set by start_scheduler
+_election: LeaderElection | None = None
+
+
+def leader_only(func):
+    """Run the job only after confirming on the lock connection that this instance still leads."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        if _election is not None and not await _election.confirm():
+            return None
+        return await func(*args, **kwargs)
+    return wrapper
+
+
+@leader_only
+@audited
+async def remind_missing_entries():
+    bot = _bot
+    for user in await get_users_without_entry(date.today()):
+        # no entry today → send reminder
+        await bot.send_message(
+            chat_id=user.user_chat_id,
+            text=(
+                "👋 Привіт! Здається, ви ще не ввели сьогоднішні дані. "
+                "Будь ласка, /enter або /enter_past, щоб додати їх."
             )
-            entry = await session.scalar(stmt)
-            if entry is None:
-                # no entry → send reminder
-                await bot.send_message(
-                    chat_id=user.user_chat_id,
-                    text=(
-                        "👋 Привіт! Здається, ви ще не ввели сьогоднішні дані. "
-                        "Будь ласка, /enter або /enter_past, щоб додати їх."
-                    )
-                )
-
-def make_scheduler(bot: Bot) -> AsyncIOScheduler:
-
-    scheduler = AsyncIOScheduler()
-    # every day at 19:00 local time
-    scheduler.add_job(
-        remind_missing_entries,
-        CronTrigger(hour=19, minute=0),
-        args=(bot,),
-        id="daily_reminder",
-        replace_existing=True,
+        )
+
+@leader_only
+@audited
+async def run_population_job():
+    # imported here so pandas/numpy stay off the bot's startup path
+    from core.population import population_job
+    await population_job()
+
+@leader_only
+@audited
+async def run_precompute_job():
+    from core.precompute import precompute_all
+    await precompute_all()
+
+# job id -> (function, trigger, seconds after the planned time a missed run still happens)
+JOBS = {
+    # every day at 19:00 local time; a reminder after 22:00 is no use
+    "daily_reminder": (remind_missing_entries, CronTrigger(hour=19, minute=0), 3 * 3600),
+    # every Sunday at 03:00: population-level correlations across all users
+    "population_stats": (run_population_job, CronTrigger(day_of_week="sun", hour=3, minute=0), 24 * 3600),
+    # every night at 02:00: refit /analyze and /correlation for experiments with new entries
+    "nightly_precompute": (run_precompute_job, CronTrigger(hour=2, minute=0), 6 * 3600),
+}
+
+
+def _sync_url(engine) -> str:
+    url = engine.url
+    return url.set(drivername=_SYNC_DRIVERS.get(url.drivername, url.drivername)).render_as_string(hide_password=False)
+
+
+def make_scheduler(bot: Bot, engine=None, event_loop=None) -> AsyncIOScheduler:
+    global _bot
+    _bot = bot
+    return AsyncIOScheduler(
+        jobstores={"default": SQLAlchemyJobStore(url=_sync_url(engine or models.engine), tablename=JOBSTORE_TABLE)},
+        job_defaults={"coalesce": True, "max_instances": 1},
+        event_loop=event_loop,
     )
-    return scheduler
\ No newline at end of file
+
+
+def add_jobs(scheduler: AsyncIOScheduler) -> None:
+    """Store JOBS in the started scheduler. Jobs already stored keep their next run time unless they changed."""
+    for job_id, (func, trigger, grace) in JOBS.items():
+        job = scheduler.get_job(job_id)
+        if job is not None and job.func is func and str(job.trigger) == str(trigger) and job.misfire_grace_time == grace:
+            continue
+        scheduler.add_job(func, trigger, id=job_id, misfire_grace_time=grace, replace_existing=True)
+
+
+async def start_scheduler(bot: Bot, engine=None) -> tuple[AsyncIOScheduler, LeaderElection]:
+    """
+    Start the scheduler paused and run it only while this instance is the elected leader,
+    so normally each job runs in one of the bot processes sharing the database (see
+    core.database.leader for what is and is not guaranteed).
+
+    The job store talks to the database through a blocking driver, so starting it and
+    storing the jobs run in a thread, off the event loop.
+    """
+    global _election
+    scheduler = make_scheduler(bot, engine, asyncio.get_running_loop())
+    await asyncio.to_thread(scheduler.start, paused=True)
+    leading = set()  # the running lead() task, kept referenced until it is done
+
+    async def lead():
+        await asyncio.to_thread(add_jobs, scheduler)
+        # deposed while the jobs were being stored: stay paused
+        if election.is_leader:
+            scheduler.resume()
+
+    def elected():
+        task = asyncio.create_task(lead())
+        leading.add(task)
+        task.add_done_callback(leading.discard)
+
+    election = _election = LeaderElection(engine or models.engine, on_elected=elected, on_deposed=scheduler.pause)
+    election.start()
+    return scheduler, election
@@ -5,6 +5,9 @@ router = Router()
 import bot.handlers.create_research
 import bot.handlers.handlers
 import bot.handlers.enter_data
+import bot.handlers.quick_entry
 import bot.handlers.delete
 import bot.handlers.correlation
-import bot.handlers.regression
\ No newline at end of file
+import bot.handlers.regression
+import bot.handlers.stats
+import bot.handlers.pagination
@@ -1,18 +1,23 @@
+import logging
+
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
-from aiogram.types import FSInputFile
+from aiogram.types import BufferedInputFile
 
 
-from bot.states import ShowStats
+from bot.states import Correlate
 import bot.keyboards as kb
+from bot.middlewares import STILL_COMPUTING
 import core.database.requests as rq
-from core.correlations import Сorrelation  # your correlation class
-import pandas as pd
+from core import precompute
+from core.singleflight import analysis_flights
 
 from . import router
-from core.database.models import ParamType
+
+logger = logging.getLogger(__name__)
+
 
 @router.message(Command("correlation"))
 async def cmd_correlation(message: Message, state: FSMContext):
@@ -20,67 +25,54 @@ async def cmd_correlation(message: Message, state: FSMContext):
     exps = await rq.get_list_experiments(message.from_user.id)
     if not exps:
         return await message.answer("❗ You have no experiments. Create one with /new")
-    await state.set_state(ShowStats.SELECT_EXP)
+    await state.set_state(Correlate.SELECT_EXP)
     await message.answer("📊 Select an experiment to correlate:", reply_markup= await kb.user_experiments_list(exps))
 
 
-@router.callback_query(ShowStats.SELECT_EXP, F.data.startswith("sel_exp:"))
+@router.callback_query(Correlate.SELECT_EXP, F.data.startswith("sel_exp:"))
 async def choose_experiment(query: CallbackQuery, state: FSMContext):
     await query.answer()
     exp_id = int(query.data.split(":",1)[1])
+    await state.update_data(exp_id=exp_id)
+    await state.set_state(Correlate.SELECT_MODE)
+    await query.message.edit_text("🔎 What do you want to look at?", reply_markup=kb.CORRELATION_MODE)
 
-    # 2) fetch data
-    entries = await rq.get_daily_entries_for_experiment(query.from_user.id, exp_id)
-    if not entries:
-        await state.clear()
-        return await query.message.edit_text("⚠️ No daily entries for that experiment.")
-
-    n = len(entries)
-
-    if n < 10:
-        await state.clear()
-        return await query.message.edit_text(
-            f"⚠️ Not enough data ({n} days). Need at least 10 entries to compute correlations."
-        )
 
-    # build DataFrame: each row is entry.data (a dict of {param_name: value})
-    df = pd.DataFrame([e.data for e in entries])
+async def chart_key(query: CallbackQuery, state: FSMContext) -> tuple | None:
+    """Single-flight key of the chart this tap asks for; None if the menu is stale."""
+    exp_id = (await state.get_data()).get("exp_id")
+    if exp_id is None:
+        return None
+    mode = query.data.split(":",1)[1]
+    return precompute.correlation_key(exp_id, mode, await rq.get_data_version(exp_id))
 
-    # you might need to convert strings to numeric here, e.g.
-    # for col in df.columns:
-    #     df[col] = pd.to_numeric(df[col], errors="ignore")
 
-    params = await rq.get_list_parameters(exp_id)
+@router.callback_query(Correlate.SELECT_MODE, F.data.startswith("corr_mode:"), flags={"cost": 2, "flight": chart_key})
+async def choose_mode(query: CallbackQuery, state: FSMContext, flight_key: tuple | None = None):
+    # normally worked out by AdmissionControl, which answers taps joining a running chart itself
+    key = flight_key or await chart_key(query, state)
+    if key is None:
+        await state.clear()
+        return await query.answer("⌛ This menu has expired, please start again.", show_alert=True)
+    _, exp_id, mode, version = key
 
-    for p in params:
-        if p.type == ParamType.BOOLEAN:
-            df[p.name] = df[p.name].map({"+": 1, "-": 0})
+    # a repeated tap while this exact chart is being computed: the first tap delivers it
+    if analysis_flights.in_flight(key):
+        return await query.answer(STILL_COMPUTING)
+    await query.answer()
 
-    # extract the names of all goal‐type parameters
-    goal_vars = [p.name for p in params if p.is_goal]
-    if not goal_vars:
-        await state.clear()
-        return await query.message.edit_text(
-            "⚠️ This experiment has no goal parameters defined."
+    # usually stored by the nightly precompute; computed here only if entries arrived since
+    try:
+        payload, png = await analysis_flights.do(
+            key, lambda: precompute.correlation_result(query.from_user.id, exp_id, mode, version)
         )
-
-    if 10 <= n < 20:
-        km = Сorrelation.kendall(df, goal_vars)
-        Сorrelation.correlation_matrix_chart(km)  # saves to out
-        caption = f"📈 Kendall correlation ({n} days)"
-    elif 20 <= n < 35:
-        km = Сorrelation.kendall(df, goal_vars)
-        pm = Сorrelation.pearson(df, goal_vars)
-        Сorrelation.two_correlation_matrices_chart(km, pm)
-        caption = f"📊 Kendall & Pearson ({n} days)"
-    else:  # n >= 35
-        pm = Сorrelation.pearson(df, goal_vars)
-        Сorrelation.correlation_matrix_chart(pm)
-        caption = f"📉 Pearson correlation ({n} days)"
-
-    img = FSInputFile(path="data/correlation_heatmaps.png")
+    except Exception:
+        logger.exception("/correlation failed for experiment %s, mode %s", exp_id, mode)
+        await state.clear()
+        return await query.message.edit_text("⚠️ Could not compute this chart. Please try again later.")
+    await state.clear()
+    if png is None:
+        return await query.message.edit_text(payload["caption"])
 
     # 5) send the image back
-    await query.message.answer_photo(photo=img, caption= caption)
-
-    await state.clear()
+    await query.message.answer_photo(photo=BufferedInputFile(png, filename="correlation_heatmaps.png"), caption=payload["caption"])
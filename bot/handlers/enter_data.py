@@ -1,3 +1,4 @@
+import math
 from datetime import date
 
 from aiogram import F
@@ -6,6 +7,7 @@ from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 
 from bot.states import EnterData
+from core import anomaly
 from core.database.models import ParamType
 import core.database.requests as rq
 
@@ -20,7 +22,7 @@ async def cmd_enter(message: Message, state: FSMContext):
         return await message.answer("You have no experiments yet. Create one with /new")
 
     await state.set_state(EnterData.SELECT_EXP)
-    await state.update_data(entry_date=date.today(), day_values={})
+    await state.set_data(dict(entry_date=date.today(), day_values={}))
     await message.answer("🔬 Select experiment:", reply_markup=await kb.user_experiments_list(exps))
 
 
@@ -43,7 +45,7 @@ async def parse_manual_date(message: Message, state: FSMContext):
 
         # now stash & proceed exactly like /enter does
     await state.set_state(EnterData.SELECT_EXP)
-    await state.update_data(entry_date=chosen, day_values={})
+    await state.set_data(dict(entry_date=chosen, day_values={}))
 
     exps = await rq.get_list_experiments(message.from_user.id)
     await message.answer("🔬 Select experiment:", reply_markup=await kb.user_experiments_list(exps))
@@ -88,7 +90,6 @@ async def select_parameter(query: CallbackQuery, state: FSMContext):
 @router.callback_query(EnterData.SELECT_PARAM, F.data=="finish")
 async def finish_entry(query: CallbackQuery, state: FSMContext):
     data = await state.get_data()
-    date = data.get("entry_date")
     day_values = data.get("day_values", {})
     exp_id = data.get("exp_id")
 
@@ -98,12 +99,75 @@ async def finish_entry(query: CallbackQuery, state: FSMContext):
     if not exp_id:
         return await query.answer("No experiment selected!", show_alert=True)
 
+    # unusual numbers (typos like 75 hours of sleep) are shown back before saving
+    flagged = await unusual_values(exp_id, day_values)
+    if flagged:
+        await state.set_state(EnterData.CONFIRM_SAVE)
+        await query.answer()
+        return await query.message.edit_text(
+            "🤔 These look unusual:\n" + "\n".join(flagged) + "\n\nSave them as they are?",
+            reply_markup=kb.SAVE_ANYWAY
+        )
+    await _save_day(query, state)
+
+
+@router.callback_query(EnterData.CONFIRM_SAVE, F.data.startswith("save_day:"))
+async def confirm_save(query: CallbackQuery, state: FSMContext):
+    if query.data == "save_day:yes":
+        return await _save_day(query, state)
+
+    # back to the parameter list to re-enter the flagged values
+    await query.answer()
+    data = await state.get_data()
+    params = await rq.get_list_parameters(data["exp_id"])
+    await state.set_state(EnterData.SELECT_PARAM)
+    await query.message.edit_text(
+        "✏️ Select a parameter to enter:",
+        reply_markup=await kb.enter_parameter_list(params, set(data.get("day_values", {})))
+    )
+
+
+async def unusual_values(exp_id: int, values: dict) -> list[str]:
+    """One line per numeric value far from the parameter's usual range (see core/anomaly.py)."""
+    stats = await rq.get_parameter_stats(exp_id)
+    return [
+        f"• {o.name} = {o.value:g} (usually {o.mean:.3g} ± {o.sd:.2g})"
+        for o in anomaly.outliers(stats, values)
+    ]
+
+
+async def _save_day(query: CallbackQuery, state: FSMContext):
+    data = await state.get_data()
     # one‐shot save
-    await rq.add_daily_entry( user_id=query.from_user.id, experiment_id = exp_id, entry_date=date, data=day_values)
+    await rq.add_daily_entry(user_id=query.from_user.id, experiment_id=data["exp_id"],
+                             entry_date=data.get("entry_date"), data=data.get("day_values", {}),
+                             merge=data.get("merge", False))
+    await query.answer()
     await query.message.edit_text("✅ All saved for today!")
     await state.clear()
 
 
+def invalid_value(p, text: str) -> str | None:
+    """What is wrong with `text` as a value of parameter `p`, or None if it is valid."""
+    if p.type == ParamType.BOOLEAN and text not in ("+", "-"):
+        return "Send `+` or `-`."
+    if p.type == ParamType.CLASS:
+        try:
+            iv = int(text)
+        except ValueError:
+            return "Send an integer."
+        if not (p.class_min <= iv <= p.class_max):
+            return f"Value must be {p.class_min}–{p.class_max}."
+    if p.type == ParamType.NUMERIC:
+        try:
+            number = float(text)
+        except ValueError:
+            return "Send a number."
+        if not math.isfinite(number):
+            return "Send a finite number."
+    return None
+
+
 # Step 4: capture the user’s value and loop back
 @router.message(EnterData.WAIT_VALUE)
 async def receive_value(message: Message, state: FSMContext):
@@ -114,20 +178,9 @@ async def receive_value(message: Message, state: FSMContext):
     p = await rq.get_parameter(param_id)
 
     # simple validation
-    if p.type == ParamType.BOOLEAN and text not in ("+", "-"):
-        return await message.answer("Send `+` or `-`.")
-    if p.type == ParamType.CLASS:
-        try:
-            iv = int(text)
-        except ValueError:
-            return await message.answer("Send an integer.")
-        if not (p.class_min <= iv <= p.class_max):
-            return await message.answer(f"Value must be {p.class_min}–{p.class_max}.")
-    if p.type == ParamType.NUMERIC:
-        try:
-            float(text)
-        except ValueError:
-            return await message.answer("Send a number.")
+    error = invalid_value(p, text)
+    if error:
+        return await message.answer(error)
 
     # stash it in the day‐values dict
     day_values = data.get("day_values", {})
@@ -140,4 +193,6 @@ async def receive_value(message: Message, state: FSMContext):
 
 
     await state.set_state(EnterData.SELECT_PARAM)
-    await message.answer("Noted! Choose next or tap Done:", reply_markup=await kb.enter_parameter_list(params, set(day_values.keys())))
\ No newline at end of file
+    # stay on the page of the parameter just entered
+    page = kb.page_of(params, param_id)
+    await message.answer("Noted! Choose next or tap Done:", reply_markup=await kb.enter_parameter_list(params, set(day_values.keys()), page))
\ No newline at end of file
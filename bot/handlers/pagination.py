@@ -0,0 +1,38 @@
+from aiogram import F
+from aiogram.types import CallbackQuery
+from aiogram.fsm.context import FSMContext
+
+import bot.keyboards as kb
+import core.database.requests as rq
+
+from . import router
+
+
+# "pg:<list>:<page>" from the navigation row of a paginated list:
+#   e — the user's experiments, g — goal parameters, v — parameters on the /enter screen.
+# Only the markup of the message is replaced; the FSM state stays where it was.
+# Parameter lists need the experiment from the state: a tap on an old keyboard after the
+# dialog ended gets an alert instead.
+@router.callback_query(F.data.startswith("pg:"))
+async def turn_page(query: CallbackQuery, state: FSMContext):
+    if query.data == kb.PAGE_NOOP:
+        return await query.answer()
+    _, kind, page = query.data.split(":")
+    page = int(page)
+    data = await state.get_data()
+    if kind in ("g", "v") and data.get("exp_id") is None:
+        return await query.answer("⌛ This list has expired, please start again.", show_alert=True)
+    await query.answer()
+
+    if kind == "e":
+        exps = await rq.get_list_experiments(query.from_user.id)
+        markup = await kb.user_experiments_list(exps, page)
+    elif kind == "g":
+        params = await rq.get_list_parameters(data["exp_id"])
+        markup = await kb.parameter_list([p for p in params if p.is_goal], page)
+    elif kind == "v":
+        params = await rq.get_list_parameters(data["exp_id"])
+        markup = await kb.enter_parameter_list(params, set(data.get("day_values", {})), page)
+    else:
+        return
+    await query.message.edit_reply_markup(reply_markup=markup)
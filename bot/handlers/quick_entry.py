@@ -0,0 +1,146 @@
+import re
+from datetime import date
+from html import escape
+
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from aiogram.fsm.context import FSMContext
+
+from bot.handlers.enter_data import invalid_value, unusual_values
+from bot.states import EnterData
+from core.database.models import ParamType
+import bot.keyboards as kb
+import core.database.requests as rq
+
+from . import router
+
+# "name=value" pairs separated by spaces, commas, semicolons or new lines; names may contain spaces
+_PAIR = re.compile(r"[\s,;]*([^=,;\n]+?)[ \t]*=[ \t]*([^\s,;=]*)")
+
+
+def parse_pairs(text: str) -> list[tuple[str, str]] | None:
+    """[(name, value), ...] in order, or None if `text` is not a list of name=value pairs."""
+    pairs, end = [], 0
+    for match in _PAIR.finditer(text):
+        if match.start() != end:
+            return None
+        pairs.append((match.group(1).strip(), match.group(2)))
+        end = match.end()
+    return pairs if text[end:].strip(" \n,;") == "" else None
+
+
+def _hint(p) -> str:
+    if p.type == ParamType.BOOLEAN:
+        return "+/-"
+    if p.type == ParamType.CLASS:
+        return f"{p.class_min}–{p.class_max}"
+    return "number"
+
+
+def template(exp, params) -> str:
+    """A /log message for the experiment with every parameter left empty, for the user to fill in."""
+    lines = "\n".join([f"/log {exp.name}:"] + [f"{p.name}=" for p in params])
+    hints = ", ".join(f"{p.name}: {_hint(p)}" for p in params)
+    return f"<code>{escape(lines)}</code>\n\n<i>{escape(hints)}</i>"
+
+
+def validate(params, pairs: list[tuple[str, str]]) -> tuple[dict, date | None, list[str]]:
+    """
+    One pass over the pairs: (values by parameter name, entry date if given, errors).
+    Names are matched case-insensitively; empty values (template lines left blank) are skipped.
+    """
+    by_name = {p.name.casefold(): p for p in params}
+    values, entry_date, errors = {}, None, []
+    for name, text in pairs:
+        p = by_name.get(name.casefold())
+        if p is None and name.casefold() == "date":
+            try:
+                entry_date = date.fromisoformat(text)
+            except ValueError:
+                errors.append("date: use YYYY-MM-DD")
+            continue
+        if p is None:
+            errors.append(f"{name}: no such parameter")
+            continue
+        if text == "":
+            continue
+        error = invalid_value(p, text)
+        if error:
+            errors.append(f"{p.name}: {error}")
+        else:
+            values[p.name] = text
+    return values, entry_date, errors
+
+
+async def _pick_experiment(exps, exp_name: str | None, names: list[str]):
+    """(experiment, its parameters, None) the message is for, or (None, None, error text)."""
+    if exp_name is not None:
+        matching = [e for e in exps if e.name.casefold() == exp_name.casefold()]
+        if not matching:
+            return None, None, f"❌ No experiment called “{exp_name}”."
+        return matching[0], await rq.get_cached_parameters(matching[0].id), None
+    # no name given: the one experiment that has every parameter mentioned
+    wanted = {n.casefold() for n in names} - {"date"}
+    candidates = []
+    for exp in exps:
+        params = await rq.get_cached_parameters(exp.id)
+        if wanted <= {p.name.casefold() for p in params}:
+            candidates.append((exp, params, None))
+    if len(candidates) == 1:
+        return candidates[0]
+    listed = ", ".join(e.name for e in exps)
+    if not candidates:
+        return None, None, f"❌ No experiment has all of these parameters. Your experiments: {listed}"
+    return None, None, f"❓ Several experiments match — start with the name, e.g. /log {candidates[0][0].name}: …"
+
+
+@router.message(Command("log"))
+async def cmd_log(message: Message, command: CommandObject, state: FSMContext):
+    exps = await rq.get_list_experiments(message.from_user.id)
+    if not exps:
+        return await message.answer("You have no experiments yet. Create one with /new")
+
+    args = (command.args or "").strip()
+    exp_name = None
+    head, sep, rest = args.partition(":")
+    if sep and "=" not in head:
+        exp_name, args = head.strip(), rest
+
+    # no values: send a template to copy, fill in and send back
+    if "=" not in args:
+        if exp_name is not None:
+            exps = [e for e in exps if e.name.casefold() == exp_name.casefold()] or exps
+        for exp in exps:
+            await message.answer(template(exp, await rq.get_cached_parameters(exp.id)), parse_mode="HTML")
+        return
+
+    pairs = parse_pairs(args)
+    if pairs is None:
+        return await message.answer("❌ Use name=value pairs, e.g. /log sleep_hours=7.5 mood=4 vitamins=+")
+
+    exp, params, error = await _pick_experiment(exps, exp_name, [name for name, _ in pairs])
+    if exp is None:
+        return await message.answer(error)
+
+    values, entry_date, errors = validate(params, pairs)
+    entry_date = entry_date or date.today()
+    if entry_date > date.today():
+        errors.append("date: can't be in the future")
+    if errors:
+        return await message.answer("❌ Nothing saved:\n" + "\n".join(errors))
+    if not values:
+        return await message.answer("No values to save.")
+
+    flagged = await unusual_values(exp.id, values)
+    if flagged:
+        # same confirmation step as /enter
+        await state.set_state(EnterData.CONFIRM_SAVE)
+        await state.set_data(dict(exp_id=exp.id, entry_date=entry_date, day_values=values, merge=True))
+        return await message.answer(
+            "🤔 These look unusual:\n" + "\n".join(flagged) + "\n\nSave them as they are?",
+            reply_markup=kb.SAVE_ANYWAY
+        )
+
+    # one upsert; values already logged for that day are kept unless given again
+    await rq.add_daily_entry(message.from_user.id, exp.id, entry_date, values, merge=True)
+    await message.answer(f"✅ Saved {len(values)} values for {exp.name} ({entry_date:%Y-%m-%d}).")
@@ -1,6 +1,4 @@
-from io import BytesIO
-import matplotlib.pyplot as plt
-import pandas as pd
+import logging
 
 from aiogram import Router, F
 from aiogram.filters import Command
@@ -10,12 +8,16 @@ from aiogram.types import BufferedInputFile
 
 from bot.states import Analyze
 import bot.keyboards as kb
+from bot.middlewares import STILL_COMPUTING
 import core.database.requests as rq
-from core.logistic_regression import OrdinalLogisticRegression
-from core.linear_regression import MultipleLinearRegression
-from core.database.models import ParamType
+from core import precompute
+from core.singleflight import analysis_flights
 
 from . import router
+
+logger = logging.getLogger(__name__)
+
+
 @router.message(Command("analyze"))
 async def cmd_analyze(message: Message, state: FSMContext):
     exps = await rq.get_list_experiments(message.from_user.id)
@@ -42,71 +44,72 @@ async def choose_experiment(query: CallbackQuery, state: FSMContext):
     await query.message.edit_text("🎯 Select a target variable:", reply_markup=await kb.parameter_list(goals))
 
 
-@router.callback_query(Analyze.SELECT_TARGET, F.data.startswith("sel_param:"))
-async def run_analysis(query: CallbackQuery, state: FSMContext):
-    await query.answer()
-    data = await state.get_data()
-    exp_id = data['exp_id']
+async def analysis_key(query: CallbackQuery, state: FSMContext) -> tuple | None:
+    """Single-flight key of the fit this tap asks for; None if the list is stale or the parameter is gone."""
+    exp_id = (await state.get_data()).get("exp_id")
+    if exp_id is None:
+        return None
     target_id = int(query.data.split(':',1)[1])
+    p = next((p for p in await rq.get_list_parameters(exp_id) if p.id == target_id), None)
+    if p is None:
+        return None
+    return precompute.regression_key(exp_id, p.name, await rq.get_data_version(exp_id))
 
-    params = await rq.get_list_parameters(exp_id)
 
-    # Find the one with matching id
-    p = next(p for p in params if p.id == target_id)
-    col = p.name   # the actual DataFrame column
-
-    # fetch entries
-    entries = await rq.get_daily_entries_for_experiment(query.from_user.id, exp_id)
-    df = pd.DataFrame([e.data for e in entries])
-
-    for p in params:
-        if p.type == ParamType.BOOLEAN:
-            df[p.name] = df[p.name].map({"+": 1, "-": 0})
-
-    X = df.drop(columns=[col])
-    y = df[col]
-
-
-
-    # choose model by type
-    p = next(p for p in params if p.name == col)
-    if p.type == ParamType.NUMERIC:
-        model = MultipleLinearRegression(X, y, add_polynomial_terms=False)
-        # Summary text
-        summary = model.summary().as_text()
-        await query.message.answer(f"<pre>{summary}</pre>", parse_mode="HTML")
-        # Coefficients table
-        coef_df = model.coefficients()
-        await query.message.answer(f"<pre>{coef_df.to_markdown()}</pre>", parse_mode="HTML")
-        # R-squared
-        await query.message.answer(f"R² = {model.r_squared()}")
-        # Residuals plot
-        resid = model.model.resid
-        fit   = model.model.fittedvalues
-        buf = BytesIO()
-        plt.figure(figsize=(6,4))
-        plt.scatter(fit, resid, alpha=0.7)
-        plt.axhline(0, color='red', linestyle='--')
-        plt.xlabel('Fitted')
-        plt.ylabel('Residuals')
-        plt.tight_layout()
-        plt.savefig(buf, format='PNG')
-        plt.close()
-        buf.seek(0)
-        await query.message.answer_photo(BufferedInputFile(buf, filename='residuals.png'))
-    else:
-        model = OrdinalLogisticRegression(X, y)
-        summary = model.summary().as_text()
-        await query.message.answer(f"<pre>{summary}</pre>", parse_mode="HTML")
-        coef_df = model.coefficients()
-        await query.message.answer(f"<pre>{coef_df.to_markdown()}</pre>", parse_mode="HTML")
-        thresh_df = model.thresholds()
-        await query.message.answer(f"<pre>{thresh_df.to_markdown()}</pre>", parse_mode="HTML")
-        await query.message.answer(f"McFadden pseudo-R² = {model.pseudo_r2()}")
-        # class probs plot for first param
-        fixed = {col: X[col].mean() for col in X.columns}
-        buf = BytesIO()
-        # generate probabilities image
-        # reuse internal plotting but redirect to buf
-        model.plot_class_probabilities(query.message, fixed_values=fixed, class_labels=sorted(y.unique()))
+@router.callback_query(Analyze.SELECT_TARGET, F.data.startswith("sel_param:"), flags={"cost": 2, "flight": analysis_key})
+async def run_analysis(query: CallbackQuery, state: FSMContext, flight_key: tuple | None = None):
+    # normally worked out by AdmissionControl, which answers taps joining a running fit itself
+    key = flight_key or await analysis_key(query, state)
+    if key is None:
+        await state.clear()
+        return await query.answer("⌛ This list has expired, please start again.", show_alert=True)
+    _, exp_id, col, version = key   # col: the actual DataFrame column
+    target_id = int(query.data.split(':',1)[1])
+
+    # a repeated tap while this exact analysis is running: the first tap delivers the result
+    if analysis_flights.in_flight(key):
+        return await query.answer(STILL_COMPUTING)
+    await query.answer()
+
+    # usually stored by the nightly precompute; fitted here only if entries arrived since
+    params = await rq.get_list_parameters(exp_id)
+    try:
+        payload, image = await analysis_flights.do(
+            key, lambda: precompute.regression_result(query.from_user.id, exp_id, params, col, version)
+        )
+    except Exception:
+        logger.exception("/analyze failed for experiment %s, target %s", exp_id, col)
+        await state.clear()
+        return await query.message.answer("⚠️ Could not run this analysis. Please try again later.")
+
+    # one photo: tables and plot composed into the image, the key numbers in the caption;
+    # the statsmodels text is sent only on request (full_report below)
+    await query.message.answer_photo(
+        BufferedInputFile(image, filename=f"{payload['model']}.png"),
+        caption=payload.get("caption", payload["score"]),
+        reply_markup=kb.full_report(exp_id, target_id, version),
+    )
     await state.clear()
+
+
+def full_report_text(payload: dict) -> str:
+    return "\n\n".join([payload["summary"], *payload["tables"], payload["score"]]) + "\n"
+
+
+@router.callback_query(F.data.startswith("full_report:"))
+async def send_full_report(query: CallbackQuery):
+    exp_id, param_id, version = map(int, query.data.split(":")[1:])
+    exp = await rq.get_experiment(exp_id)
+    param = next((p for p in await rq.get_cached_parameters(exp_id) if p.id == param_id), None)
+    if exp is None or exp.user_id != query.from_user.id or param is None:
+        return await query.answer("⚠️ Experiment not found.", show_alert=True)
+
+    # the stored artefact behind the photo; replaced once new entries are analysed
+    stored = await rq.get_analysis_result(exp_id, "regression", param.name, version)
+    if stored is None:
+        return await query.answer("⚠️ This report is out of date. Run /analyze again.", show_alert=True)
+    await query.answer()
+    await query.message.answer_document(
+        BufferedInputFile(full_report_text(stored.payload).encode(), filename=f"{exp.name} - {param.name}.txt")
+    )
+
@@ -0,0 +1,97 @@
+from datetime import date, timedelta
+from html import escape
+
+from aiogram import F
+from aiogram.filters import Command
+from aiogram.types import Message, CallbackQuery
+from aiogram.fsm.context import FSMContext
+
+from bot.states import ShowStats
+import bot.keyboards as kb
+import core.database.requests as rq
+
+from . import router
+
+
+@router.message(Command("stats"))
+async def cmd_stats(message: Message, state: FSMContext):
+    exps = await rq.get_list_experiments(message.from_user.id)
+    if not exps:
+        return await message.answer("❗ You have no experiments. Create one with /new")
+    await state.set_state(ShowStats.SELECT_EXP)
+    await message.answer("📋 Select an experiment:", reply_markup=await kb.user_experiments_list(exps))
+
+
+@router.callback_query(ShowStats.SELECT_EXP, F.data.startswith("sel_exp:"))
+async def show_stats(query: CallbackQuery, state: FSMContext):
+    await query.answer()
+    await state.clear()
+    exp_id = int(query.data.split(":", 1)[1])
+    exp = await rq.get_experiment(exp_id)
+    if exp is None:
+        return await query.message.edit_text("⚠️ Experiment not found.")
+
+    today = date.today()
+    week_since, month_since = _previous_starts(today)
+    if exp.last_entry_date is None and await rq.has_daily_entries(exp.user_id, exp_id):
+        # entries written before rollups existed (their data_version may still be 0): build them once
+        exp = await rq.rebuild_rollups(exp_id)
+    rollups = await rq.get_rollups(exp_id, week_since, month_since)
+    entry_dates = await rq.get_entry_dates(exp.user_id, exp_id, month_since)
+
+    await query.message.edit_text(render_stats(exp, rollups, today, entry_dates), parse_mode="HTML")
+
+
+def _previous_starts(today: date) -> tuple[date, date]:
+    """Start of last week and of last month."""
+    starts = rq.period_starts(today)
+    return starts["week"] - timedelta(days=7), rq.period_starts(starts["month"] - timedelta(days=1))["month"]
+
+
+def _mean(row) -> str:
+    return f"{row.total / row.count:.1f}" if row is not None else "–"
+
+
+def render_stats(exp, rollups, today: date, entry_dates: list[date]) -> str:
+    """
+    The /stats message: streak, completion and per-parameter averages for this and the previous week/month.
+    entry_dates are the days with an entry since the start of last month.
+    """
+    this = rq.period_starts(today)
+    last_week, last_month = _previous_starts(today)
+    periods = {
+        ("week", this["week"]): (today - this["week"]).days + 1,
+        ("week", last_week): 7,
+        ("month", this["month"]): today.day,
+        ("month", last_month): (this["month"] - last_month).days,
+    }
+    cells = {(r.period, r.period_start, r.parameter): r for r in rollups}
+    # days with an entry, per period: parameters logged on different days all count
+    logged = {key: sum(1 for day in entry_dates if rq.period_starts(day)[key[0]] == key[1]) for key in periods}
+
+    streak = exp.streak if exp.last_entry_date is not None and exp.last_entry_date >= today - timedelta(days=1) else 0
+    lines = [
+        f"📋 <b>{escape(exp.name)}</b>",
+        f"🔥 Streak: {streak} d (best {exp.best_streak} d)",
+        "✅ Logged: week {}/{} (last {}/7), month {}/{} (last {}/{})".format(
+            logged["week", this["week"]], periods["week", this["week"]], logged["week", last_week],
+            logged["month", this["month"]], periods["month", this["month"]],
+            logged["month", last_month], periods["month", last_month],
+        ),
+    ]
+    names = sorted({r.parameter for r in rollups})
+    if not names:
+        lines.append("\nNo entries in the last two months yet. Add some with /enter")
+        return "\n".join(lines)
+
+    table = [f"{'':12} {'week':>6} {'last':>6} {'month':>6} {'last':>6}  min–max"]
+    for name in names:
+        month = cells.get(("month", this["month"], name))
+        table.append(
+            f"{escape(name[:12]):12} {_mean(cells.get(('week', this['week'], name))):>6} "
+            f"{_mean(cells.get(('week', last_week, name))):>6} {_mean(month):>6} "
+            f"{_mean(cells.get(('month', last_month, name))):>6}  "
+            + (f"{month.min_value:g}–{month.max_value:g}" if month is not None else "–")
+        )
+    lines.append("\n<pre>" + "\n".join(table) + "</pre>")
+    return "\n".join(lines)
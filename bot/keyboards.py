@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 
 from aiogram.utils.keyboard import InlineKeyboardBuilder
@@ -47,6 +49,27 @@ DELETE_CONFIRM = InlineKeyboardMarkup(inline_keyboard=[
     ]
 ])
 
+SAVE_ANYWAY = InlineKeyboardMarkup(inline_keyboard=[
+    [
+      InlineKeyboardButton(text="✅ Save anyway", callback_data="save_day:yes"),
+      InlineKeyboardButton(text="✏️ Fix values", callback_data="save_day:fix"),
+    ]
+])
+
+CORRELATION_MODE = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="📊 Same day", callback_data="corr_mode:same")],
+    [InlineKeyboardButton(text="⏳ Delayed effects (lags 0–7 days)", callback_data="corr_mode:lag")],
+    [InlineKeyboardButton(text="📈 Over time (14-day window)", callback_data="corr_mode:rolling")],
+    [InlineKeyboardButton(text="🔢 Ranks (Spearman)", callback_data="corr_mode:spearman")],
+    [InlineKeyboardButton(text="🔀 Any relation: mutual information", callback_data="corr_mode:mutual_info")],
+    [InlineKeyboardButton(text="🔀 Any relation: distance correlation", callback_data="corr_mode:dcor")],
+])
+
+def full_report(exp_id: int, param_id: int, version: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="📄 Full report", callback_data=f"full_report:{exp_id}:{param_id}:{version}")]
+    ])
+
 async def back_to_main():
     keyboard = InlineKeyboardBuilder()
     keyboard.add(InlineKeyboardButton(text="Назад", callback_data="back_to_main"))
@@ -67,31 +90,79 @@ async def item(category_id, item_id):
     keyboard.add(InlineKeyboardButton(text="Назад", callback_data=f"category_{category_id}"))
     return keyboard.as_markup()
 
-async def user_experiments_list(experiments: list[Experiment]):
-    keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [ InlineKeyboardButton(text=exp.name, callback_data=f"sel_exp:{exp.id}") ]
-                for exp in experiments
-            ]
-        )
-    return keyboard
-
-async def parameter_list(params: list[Parameter]):
-    keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [InlineKeyboardButton(text=p.name, callback_data=f"sel_param:{p.id}")]
-                for p in params
-            ] + [[InlineKeyboardButton(text="✅ Done", callback_data="finish")]]
-        )
-    return keyboard
-
-async def enter_parameter_list(params: list[Parameter], entered_keys: set[str]):
+# Lists longer than this are split into pages turned by "pg:<list>:<page>" buttons (bot/handlers/pagination.py)
+PAGE_SIZE = 8
+PAGE_NOOP = "pg:-"  # the "2/5" counter in the middle of the navigation row
+
+
+def _page_bounds(total: int, page: int) -> tuple[int, int, int]:
+    """Clamp `page` and return (page, pages, first index on it)."""
+    pages = max(1, -(-total // PAGE_SIZE))
+    page = min(max(page, 0), pages - 1)
+    return page, pages, page * PAGE_SIZE
+
+
+def _nav_row(kind: str, page: int, pages: int) -> list[list[InlineKeyboardButton]]:
+    if pages == 1:
+        return []
+    row = []
+    if page > 0:
+        row.append(InlineKeyboardButton(text="«", callback_data=f"pg:{kind}:{page - 1}"))
+    row.append(InlineKeyboardButton(text=f"{page + 1}/{pages}", callback_data=PAGE_NOOP))
+    if page < pages - 1:
+        row.append(InlineKeyboardButton(text="»", callback_data=f"pg:{kind}:{page + 1}"))
+    return [row]
+
+
+# The builders below are memoised on the (id, name) tuples of the list, so the
+# markup is rebuilt only when the list, the page or the entered set changes.
+@lru_cache(maxsize=1024)
+def _experiments_page(items: tuple, page: int) -> InlineKeyboardMarkup:
+    page, pages, first = _page_bounds(len(items), page)
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text=name, callback_data=f"sel_exp:{exp_id}")]
+            for exp_id, name in items[first:first + PAGE_SIZE]
+        ] + _nav_row("e", page, pages)
+    )
+
+
+@lru_cache(maxsize=1024)
+def _goals_page(items: tuple, page: int) -> InlineKeyboardMarkup:
+    page, pages, first = _page_bounds(len(items), page)
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text=name, callback_data=f"sel_param:{param_id}")]
+            for param_id, name in items[first:first + PAGE_SIZE]
+        ] + _nav_row("g", page, pages) + [[InlineKeyboardButton(text="✅ Done", callback_data="finish")]]
+    )
+
+
+@lru_cache(maxsize=1024)
+def _enter_page(items: tuple, entered: frozenset, page: int) -> InlineKeyboardMarkup:
+    page, pages, first = _page_bounds(len(items), page)
     buttons = []
-    for p in params:
-        prefix = "✅" if p.name in entered_keys else "❓"
-        text = f"{prefix} {p.name}"
-        buttons.append([InlineKeyboardButton(text=text,
-                                             callback_data=f"sel_param:{p.id}")])
-        # finally the Done button
+    for param_id, name in items[first:first + PAGE_SIZE]:
+        prefix = "✅" if name in entered else "❓"
+        buttons.append([InlineKeyboardButton(text=f"{prefix} {name}", callback_data=f"sel_param:{param_id}")])
+    buttons += _nav_row("v", page, pages)
+    # finally the Done button
     buttons.append([InlineKeyboardButton(text="🏁 Done", callback_data="finish")])
     return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def page_of(items: list, item_id: int) -> int:
+    """Page on which the item with `item_id` is shown (0 if it is not in the list)."""
+    ids = [i.id for i in items]
+    return ids.index(item_id) // PAGE_SIZE if item_id in ids else 0
+
+
+async def user_experiments_list(experiments: list[Experiment], page: int = 0):
+    return _experiments_page(tuple((exp.id, exp.name) for exp in experiments), page)
+
+async def parameter_list(params: list[Parameter], page: int = 0):
+    return _goals_page(tuple((p.id, p.name) for p in params), page)
+
+async def enter_parameter_list(params: list[Parameter], entered_keys: set[str], page: int = 0):
+    items = tuple((p.id, p.name) for p in params)
+    return _enter_page(items, frozenset(entered_keys) & {name for _, name in items}, page)
@@ -0,0 +1,221 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from aiogram import BaseMiddleware, Bot, Dispatcher, Router
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery
+
+from core import metrics, profiling
+from core.admission import Admission, analysis_admission
+from core.database import query_audit
+from core.singleflight import SingleFlight, analysis_flights
+
+STILL_COMPUTING = "⏳ Still computing…"
+
+
+@contextmanager
+def _update_stats():
+    """The update's UpdateStats; a fresh one when UpdateMetrics is not installed, so HandlerName still has a target."""
+    stats = metrics.current_update.get()
+    if stats is not None:
+        yield stats
+        return
+    stats = metrics.UpdateStats()
+    token = metrics.current_update.set(stats)
+    try:
+        yield stats
+    finally:
+        metrics.current_update.reset(token)
+
+
+class UpdateMetrics(BaseMiddleware):
+    """
+    Outer middleware on dp.update: times the whole update and collects the SQL
+    statements run while it is handled, labelled with the handler that took it.
+    """
+
+    async def __call__(self, handler, event, data):
+        stats = metrics.UpdateStats()
+        token = metrics.current_update.set(stats)
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            metrics.HANDLER_ERRORS.inc(stats.handler)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.current_update.reset(token)
+            metrics.HANDLER_SECONDS.observe(elapsed, stats.handler)
+            metrics.UPDATE_SQL_STATEMENTS.observe(stats.sql_statements, stats.handler)
+            metrics.UPDATE_SQL_SECONDS.observe(stats.sql_seconds, stats.handler)
+
+
+class HandlerName(BaseMiddleware):
+    """Inner middleware: the handler is only known once filters have matched, so name it here."""
+
+    async def __call__(self, handler, event, data):
+        stats = metrics.current_update.get()
+        if stats is not None:
+            stats.handler = data["handler"].callback.__name__
+        return await handler(event, data)
+
+
+class TelegramApiMetrics(BaseRequestMiddleware):
+    """Bot session middleware: duration of every Bot API call by method."""
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            metrics.TELEGRAM_ERRORS.inc(name)
+            raise
+        finally:
+            metrics.TELEGRAM_SECONDS.observe(time.perf_counter() - start, name)
+
+
+class ProfileUpdates(BaseMiddleware):
+    """
+    Outer middleware on dp.update: samples updates and saves the trace of those
+    slower than `threshold` seconds or coming from one of `users` (see core.profiling).
+    """
+
+    def __init__(self, threshold: float | None, users: set[int]):
+        self.threshold, self.users = threshold, users
+        self.sampler = None
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        flagged = user is not None and user.id in self.users
+        if self.threshold is None and not flagged:
+            return await handler(event, data)
+
+        if self.sampler is None:
+            self.sampler = profiling.Sampler(threading.get_ident())
+            self.sampler.start()
+        trace = profiling.Trace()
+        token = profiling.current_trace.set(trace)
+        self.sampler.acquire()
+        start = time.perf_counter()
+        with _update_stats() as stats:
+            try:
+                return await handler(event, data)
+            finally:
+                end = time.perf_counter()
+                in_flight = self.sampler.users
+                self.sampler.release()
+                profiling.current_trace.reset(token)
+                if flagged or end - start >= self.threshold:
+                    query = event.callback_query
+                    profiling.save_trace({
+                        "handler": stats.handler,
+                        "user_id": user.id if user else None,
+                        "callback_data": query.data if query else None,
+                        "text": event.message.text if event.message else None,
+                        "seconds": end - start,
+                        "in_flight": in_flight,
+                        "interval": self.sampler.interval,
+                        "loop_samples": dict(self.sampler.collapsed(start, end)),
+                        "worker_samples": dict(trace.worker_samples),
+                    })
+
+
+class QueryAudit(BaseMiddleware):
+    """Outer middleware on dp.update: one core.database.query_audit scope per update, named after its handler."""
+
+    async def __call__(self, handler, event, data):
+        with _update_stats() as stats, query_audit.query_scope("update") as scope:
+            try:
+                return await handler(event, data)
+            finally:
+                scope.name = f"handler:{stats.handler}"
+
+
+class AdmissionControl(BaseMiddleware):
+    """
+    Inner middleware: handlers flagged with a cost, e.g. flags={"cost": 2}, go through
+    core.admission — the user's token bucket, then a global slot (queued if all are taken).
+    Updates turned away get a short answer instead of reaching the handler.
+
+    A handler may also flag "flight": an async (event, state) -> key of the single-flight
+    computation the update asks for (None if there is none). A tap joining a computation
+    already in flight is answered here and costs neither tokens nor a slot; the key is
+    passed on to the handler as `flight_key`.
+    """
+
+    def __init__(self, admission: Admission, flights: SingleFlight = analysis_flights):
+        self.admission = admission
+        self.flights = flights
+
+    async def __call__(self, handler, event, data):
+        cost = get_flag(data, "cost")
+        user = data.get("event_from_user")
+        if not cost or user is None:
+            return await handler(event, data)
+
+        key = None
+        flight = get_flag(data, "flight")
+        if flight is not None:
+            key = data["flight_key"] = await flight(event, data["state"])
+            if key is not None and self.flights.in_flight(key):
+                return await event.answer(STILL_COMPUTING)
+
+        name = data["handler"].callback.__name__
+        if self.admission.busy():
+            metrics.ADMISSION_REJECTED.inc(name, "busy")
+            return await _reject(event, "🚦 The bot is busy with other analyses right now. Please try again in a minute.")
+        wait = self.admission.take(user.id, cost)
+        if wait:
+            metrics.ADMISSION_REJECTED.inc(name, "rate")
+            return await _reject(event, f"⏳ You've run a lot of analyses lately. Try again in {math.ceil(wait)} s.")
+
+        async with self.admission.slot(name):
+            # started by another tap while this one was queued: join it without charge
+            if key is not None and self.flights.in_flight(key):
+                self.admission.refund(user.id, cost)
+                return await event.answer(STILL_COMPUTING)
+            metrics.ADMISSION_COST.inc(name, amount=cost)
+            return await handler(event, data)
+
+
+async def _reject(event, text: str):
+    if isinstance(event, CallbackQuery):
+        return await event.answer(text, show_alert=True)
+    return await event.answer(text)
+
+
+def _name_handlers(router: Router) -> None:
+    for observer in (router.message, router.callback_query):
+        if not any(isinstance(m, HandlerName) for m in observer.middleware):
+            observer.middleware(HandlerName())
+
+
+def setup_profiling(dp: Dispatcher, router: Router) -> None:
+    """Install the profiler if BOT_PROFILE_THRESHOLD or BOT_PROFILE_USERS is set; otherwise do nothing."""
+    if profiling.THRESHOLD_SECONDS is None and not profiling.TRACED_USERS:
+        return
+    dp.update.outer_middleware(ProfileUpdates(profiling.THRESHOLD_SECONDS, profiling.TRACED_USERS))
+    _name_handlers(router)
+
+
+def setup_query_audit(dp: Dispatcher, router: Router, engine) -> None:
+    dp.update.outer_middleware(QueryAudit())
+    _name_handlers(router)
+    query_audit.install(engine)
+
+
+def setup_admission(router: Router, admission: Admission = analysis_admission) -> None:
+    router.message.middleware(AdmissionControl(admission))
+    router.callback_query.middleware(AdmissionControl(admission))
+
+
+def setup_metrics(dp: Dispatcher, router: Router, bot: Bot, engine) -> None:
+    dp.update.outer_middleware(UpdateMetrics())
+    _name_handlers(router)
+    bot.session.middleware(TelegramApiMetrics())
+    metrics.instrument_engine(engine)
@@ -29,6 +29,10 @@ class DeleteExp(StatesGroup):
 class ShowStats(StatesGroup):
     SELECT_EXP = State()
 
+class Correlate(StatesGroup):
+    SELECT_EXP = State()
+    SELECT_MODE = State()
+
 class Analyze(StatesGroup):
     SELECT_EXP    = State()
     SELECT_TARGET = State()
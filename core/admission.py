@@ -0,0 +1,91 @@
+"""
+Admission control for the expensive commands (/analyze, /correlation).
+
+Two limits apply to every handler flagged with a cost (see
+bot.middlewares.AdmissionControl):
+
+- per user, a token bucket: BURST tokens, refilled at REFILL_PER_SECOND; an
+  update costing more tokens than the user has left is rejected with the
+  time until it would fit;
+- globally, CONCURRENCY slots: admitted updates beyond that wait in a queue
+  of at most MAX_QUEUE, and once the queue is full new ones are rejected.
+
+A rejected update costs the user nothing, and neither does one that only
+joins an identical computation already in flight (see core.singleflight). Queue depth, slots in use, wait
+time, tokens spent and rejections are exported through core.metrics.
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from core import metrics, workers
+
+# Analysis updates handled at once; more would only queue for the worker pool
+CONCURRENCY = int(os.environ.get("BOT_ANALYSIS_CONCURRENCY", workers.MAX_WORKERS))
+# Updates allowed to wait for a slot before new ones are turned away
+MAX_QUEUE = int(os.environ.get("BOT_ANALYSIS_QUEUE", 20))
+# Tokens per user: a burst of BURST, then one every 1 / REFILL_PER_SECOND seconds
+BURST = float(os.environ.get("BOT_ANALYSIS_BURST", 6))
+REFILL_PER_SECOND = float(os.environ.get("BOT_ANALYSIS_REFILL", 1 / 60))
+# Buckets kept before full (idle) ones are dropped
+MAX_TRACKED_USERS = 10_000
+
+
+class Admission:
+    def __init__(self, concurrency: int = CONCURRENCY, max_queue: int = MAX_QUEUE,
+                 burst: float = BURST, refill_per_second: float = REFILL_PER_SECOND):
+        self.burst, self.refill = burst, refill_per_second
+        self.max_queue = max_queue
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(concurrency)
+        self._buckets: dict[int, tuple[float, float]] = {}  # user id -> (tokens, at monotonic time)
+
+    def _tokens(self, user_id: int, now: float) -> float:
+        tokens, at = self._buckets.get(user_id, (self.burst, now))
+        return min(self.burst, tokens + (now - at) * self.refill)
+
+    def take(self, user_id: int, cost: float) -> float:
+        """Spend `cost` of the user's tokens and return 0, or return the seconds until they would have enough."""
+        now = time.monotonic()
+        cost = min(cost, self.burst)
+        tokens = self._tokens(user_id, now)
+        if tokens < cost:
+            return (cost - tokens) / self.refill
+        if len(self._buckets) >= MAX_TRACKED_USERS:
+            self._buckets = {u: b for u, b in self._buckets.items() if self._tokens(u, now) < self.burst}
+        self._buckets[user_id] = (tokens - cost, now)
+        return 0.0
+
+    def refund(self, user_id: int, cost: float) -> None:
+        """Give back tokens spent by take() on an update that turned out to need no work."""
+        now = time.monotonic()
+        if user_id in self._buckets:
+            self._buckets[user_id] = (min(self.burst, self._tokens(user_id, now) + min(cost, self.burst)), now)
+
+    def busy(self) -> bool:
+        """True when the queue is full: a new update would be turned away."""
+        return self.waiting >= self.max_queue
+
+    @asynccontextmanager
+    async def slot(self, handler: str):
+        """Hold one of the global slots, waiting in the queue for it if needed."""
+        self.waiting += 1
+        metrics.ADMISSION_QUEUE_DEPTH.inc()
+        start = time.perf_counter()
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+            metrics.ADMISSION_QUEUE_DEPTH.dec()
+        metrics.ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start, handler)
+        metrics.ADMISSION_IN_FLIGHT.inc()
+        try:
+            yield
+        finally:
+            metrics.ADMISSION_IN_FLIGHT.dec()
+            self._slots.release()
+
+
+# /analyze and /correlation share one budget
+analysis_admission = Admission()
@@ -0,0 +1,299 @@
+"""
+CPU-bound analysis pipelines behind /analyze and /correlation.
+
+Everything here takes plain rows and returns plain payloads and PNG bytes,
+so it can run in the worker processes of core.workers without touching the
+database or the bot. Importing this module pulls in the whole analytics stack.
+"""
+from datetime import date
+from io import BytesIO
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from core.correlations import Сorrelation
+from core.database.models import ParamType
+from core.linear_regression import MultipleLinearRegression
+from core.logistic_regression import OrdinalLogisticRegression
+
+
+def entries_to_frame(rows: list[tuple[date, dict]], param_types: dict[str, ParamType], by_date: bool = False) -> pd.DataFrame:
+    """
+    Build the analysis DataFrame from (entry_date, data) rows: one row per entry,
+    booleans mapped to 1/0 and everything else converted to numbers.
+
+    With by_date=True the frame is indexed by entry_date and has a row for every
+    calendar day in the range (NaN for skipped days), as lag/rolling analysis needs.
+    """
+    df = pd.DataFrame([data for _, data in rows])
+    if by_date:
+        df.index = pd.DatetimeIndex([entry_date for entry_date, _ in rows])
+    for name, ptype in param_types.items():
+        if name not in df.columns:
+            continue
+        if ptype == ParamType.BOOLEAN:
+            df[name] = df[name].map({"+": 1, "-": 0})
+        else:
+            df[name] = pd.to_numeric(df[name], errors="coerce")
+    if by_date and len(df):
+        df = df.reindex(pd.date_range(df.index.min(), df.index.max(), freq="D"))
+    return df
+
+
+# Fewest days with every modelled column present that a regression is fitted on
+MIN_COMPLETE_ROWS = 10
+
+
+def _densest_columns(X: pd.DataFrame, y: pd.Series, min_rows: int = MIN_COMPLETE_ROWS) -> list[str]:
+    """
+    Columns of X to model y with: the most often skipped ones are left out until at least
+    `min_rows` days have the target and every remaining column (sparse entries would
+    otherwise leave hardly any complete rows to fit on).
+    """
+    present = X[y.notna()].notna()
+    columns = list(present.sum().sort_values(ascending=False).index)
+    while len(columns) > 1 and present[columns].all(axis=1).sum() < min_rows:
+        columns.pop()
+    return columns
+
+
+def _fit_payload(result) -> dict:
+    """Parameter vector, covariance and p-values of a statsmodels result in a JSON-friendly form."""
+    return {
+        "param_names": [str(name) for name in result.params.index],
+        "params": result.params.tolist(),
+        "bse": result.bse.tolist(),
+        "pvalues": result.pvalues.tolist(),
+        "cov": result.cov_params().values.tolist(),
+    }
+
+
+# Telegram's limit for photo captions
+CAPTION_LIMIT = 1024
+SIGNIFICANCE = 0.05
+
+
+def _coefficient_frame(result, rows: slice = slice(None)) -> pd.DataFrame:
+    return pd.DataFrame({"coef": result.params[rows], "p": result.pvalues[rows]})
+
+
+def _compose_report(title: str, tables: list[tuple[str, pd.DataFrame]], draw) -> bytes:
+    """
+    The whole /analyze report as one PNG: coefficient tables on the left (significant
+    rows shaded), the model's plot, drawn by draw(ax), on the right.
+    """
+    fig = plt.figure(figsize=(12, 5.5))
+    grid = fig.add_gridspec(len(tables), 2, width_ratios=(1, 1.3))
+    for i, (name, frame) in enumerate(tables):
+        ax = fig.add_subplot(grid[i, 0])
+        ax.axis("off")
+        ax.set_title(name, loc="left")
+        if frame.empty:
+            ax.text(0.5, 0.9, "no usable feature", ha="center", va="top")
+            continue
+        cells = [[str(label)[:24], f"{row.coef:.3g}", f"{row.p:.3f}"] for label, row in frame.iterrows()]
+        table = ax.table(cellText=cells, colLabels=["", "coef", "p"], loc="upper center", colWidths=(0.5, 0.22, 0.18))
+        table.auto_set_font_size(False)
+        table.set_fontsize(9)
+        for r, p in enumerate(frame["p"], start=1):
+            if p < SIGNIFICANCE:
+                for c in range(3):
+                    table[r, c].set_facecolor("#d9f2d9")
+    draw(fig.add_subplot(grid[:, 1]))
+    fig.suptitle(title)
+    fig.tight_layout()
+    buf = BytesIO()
+    fig.savefig(buf, format="png", dpi=110)
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def _caption(target: str, score: str, coefficients: pd.DataFrame) -> str:
+    """Short photo caption: the fit score and the significant features with the direction of their effect."""
+    significant = coefficients[(coefficients["p"] < SIGNIFICANCE) & (coefficients.index != "const")]
+    if len(significant):
+        effects = ", ".join(f"{name} {'↑' if row.coef > 0 else '↓'}" for name, row in significant.iterrows())
+        found = f"Significant (p < {SIGNIFICANCE}): {effects}"
+    else:
+        found = f"No feature is significant at p < {SIGNIFICANCE}."
+    caption = f"🎯 {target}\n{score}\n{found}"
+    return caption if len(caption) <= CAPTION_LIMIT else caption[:CAPTION_LIMIT - 1] + "…"
+
+
+def regression_report(rows: list[tuple[date, dict]], param_types: dict[str, ParamType], target: str) -> tuple[dict, bytes]:
+    """
+    Fit the model for `target` against the other columns and render everything /analyze sends.
+
+    Returns (payload, png): payload holds the fitted parameters, fit statistics, the
+    photo caption and the pre-rendered text tables (the full-text report), so it can be
+    stored and replayed without refitting; png is the composed one-image report.
+    """
+    df = entries_to_frame(rows, param_types)
+    ptype = param_types[target]
+    y = df[target]
+    X = df.drop(columns=[target])
+    X = X[_densest_columns(X, y)]
+    # a column with a single value says nothing and the ordinal model rejects it as a second constant
+    X = X.loc[:, X.nunique() > 1]
+
+    if ptype == ParamType.NUMERIC:
+        # fit on the best subset by extended BIC instead of every column, which overfits on short experiments
+        candidates = MultipleLinearRegression.select_features(X, y, criterion="ebic", top=5)
+        # no subset at all when there is no usable feature (only the goal, or constant columns):
+        # the model is then the mean alone
+        selected = candidates["features"].iloc[0] if len(candidates) else []
+        # statsmodels refuses NaN: fit on the days that have the target and every selected feature
+        complete = pd.concat([X[selected], y], axis=1).dropna()
+        model = MultipleLinearRegression(complete[selected], complete[target], add_polynomial_terms=False)
+        res = model.model
+        ranking = candidates.assign(features=candidates["features"].map(", ".join))[["features", "k", "ebic", "adj_r2"]]
+        payload = {
+            "model": "ols",
+            "selected_features": selected,
+            **_fit_payload(res),
+            "stats": {
+                "nobs": int(res.nobs),
+                "r_squared": float(res.rsquared),
+                "adj_r_squared": float(res.rsquared_adj),
+                "aic": float(res.aic),
+                "bic": float(res.bic),
+                "llf": float(res.llf),
+            },
+            "summary": model.summary().as_text(),
+            "tables": [model.coefficients().to_markdown(), ranking.round(3).to_markdown(index=False)],
+            "score": f"R² = {model.r_squared()} ("
+                     + (f"features chosen by extended BIC: {', '.join(selected)}" if selected else "no usable feature")
+                     + f"; {int(res.nobs)} of {len(df)} days complete)",
+        }
+        coefficients = _coefficient_frame(res)
+        payload["caption"] = _caption(target, payload["score"], coefficients)
+        image = _compose_report(f"{target}: linear regression", [("Coefficients", coefficients)],
+                                lambda ax: model.plot_residuals(ax=ax))
+    else:
+        complete = df.dropna(subset=[target, *X.columns])
+        X, y = complete[X.columns], complete[target]
+        model = OrdinalLogisticRegression(X, y)
+        res = model.result
+        payload = {
+            "model": "ordinal_logit",
+            **_fit_payload(res),
+            "stats": {
+                "nobs": int(res.nobs),
+                "pseudo_r2": float(res.prsquared),
+                "aic": float(res.aic),
+                "bic": float(res.bic),
+                "llf": float(res.llf),
+            },
+            "summary": model.summary().as_text(),
+            "tables": [model.coefficients().to_markdown(), model.thresholds().to_markdown()],
+            "score": f"McFadden pseudo-R² = {model.pseudo_r2()}",
+        }
+        # thresholds between classes follow the feature coefficients in params
+        features = res.model.exog.shape[1]
+        coefficients = _coefficient_frame(res, slice(None, features))
+        payload["caption"] = _caption(target, payload["score"], coefficients)
+        # class probabilities along the first feature, others fixed at their means
+        fixed = {c: X[c].mean() for c in X.columns}
+
+        def draw(ax):
+            if len(X.columns):
+                model.plot_class_probabilities(X.columns[0], fixed_values=fixed, class_labels=sorted(y.unique()), ax=ax)
+            else:
+                ax.axis("off")
+
+        image = _compose_report(
+            f"{target}: ordinal logistic regression",
+            [("Coefficients", coefficients), ("Thresholds", _coefficient_frame(res, slice(features, None)))],
+            draw,
+        )
+
+    return payload, image
+
+
+def _matrix(frame: pd.DataFrame) -> dict:
+    """A coefficient frame in a JSON-friendly form (NaN → None, MultiIndex labels joined with "/")."""
+    def labels(index):
+        return ["/".join(map(str, label)) if isinstance(label, tuple) else str(label) for label in index]
+    values = frame.astype(float).to_numpy()
+    return {
+        "index": labels(frame.index),
+        "columns": labels(frame.columns),
+        "values": [[None if v != v else float(v) for v in row] for row in values],
+    }
+
+
+# /correlation modes for the other dependence measures: PAIRWISE method -> (chart title, signed scale)
+DEPENDENCE_MODES = {
+    "spearman": ("Spearman rank correlation", True),
+    "mutual_info": ("Mutual information (0–1)", False),
+    "dcor": ("Distance correlation (0–1)", False),
+}
+
+
+def correlation_report(rows: list[tuple[date, dict]], param_types: dict[str, ParamType], goal_vars: list[str],
+                       mode: str = "same", max_lag: int = 7, window: int = 14) -> tuple[dict, bytes]:
+    """
+    Render the /correlation chart for `mode` ("same", "lag", "rolling" or one of DEPENDENCE_MODES).
+
+    Returns (payload, png): payload holds the caption and the coefficient matrices
+    behind the chart, so it can be stored and replayed without recomputing.
+    """
+    n = len(rows)
+    buf = BytesIO()
+    if mode == "lag":
+        # one row per calendar day, so a lag of k rows is k days
+        df = entries_to_frame(rows, param_types, by_date=True)
+        lagged = Сorrelation.lagged(df, goal_vars, max_lag=max_lag)
+        Сorrelation.lag_heatmap_chart(lagged, out=buf)
+        caption = f"⏳ Feature N days earlier vs goal, Pearson ({n} days)"
+        return {"caption": caption, "matrices": {"pearson": _matrix(lagged)}}, buf.getvalue()
+    if mode == "rolling":
+        df = entries_to_frame(rows, param_types, by_date=True)
+        rolled = Сorrelation.rolling(df, goal_vars, window=window)
+        Сorrelation.rolling_chart(rolled, out=buf)
+        caption = f"📈 {window}-day rolling Pearson correlation ({n} days)"
+        return {"caption": caption, "matrices": {"pearson": _matrix(rolled)}}, buf.getvalue()
+    if mode in DEPENDENCE_MODES:
+        df = entries_to_frame(rows, param_types)
+        title, signed = DEPENDENCE_MODES[mode]
+        matrix, counts = Сorrelation.pairwise(df, goal_vars, method=mode)
+        Сorrelation.correlation_matrix_chart(matrix, counts=counts, title=title, signed=signed, out=buf)
+        caption = f"🔀 {title} ({n} days)"
+        if not signed:
+            caption += "\n0 = no relation; also catches effects Pearson misses, like too little or too much sleep"
+        return {"caption": caption, "matrices": {mode: _matrix(matrix), "counts": _matrix(counts)}}, buf.getvalue()
+
+    df = entries_to_frame(rows, param_types)
+    # coefficients are pairwise-complete, so a skipped parameter only thins its own pairs;
+    # pairs with too few overlapping days are greyed out on the chart
+    pm, counts = Сorrelation.pairwise(df, goal_vars, method="pearson")
+    # every coefficient is shown with its 95% bootstrap interval and
+    # permutation-test stars (Benjamini–Hochberg across the matrix); both resample
+    # whole days and stay pairwise-complete, like the coefficients themselves
+    def intervals(method):
+        _, q = Сorrelation.permutation_test(df, goal_vars, method=method)
+        return Сorrelation.bootstrap_ci(df, goal_vars, method=method), q
+
+    matrices = {"pearson": _matrix(pm), "counts": _matrix(counts)}
+    if 10 <= n < 20:
+        km = Сorrelation.kendall(df, goal_vars)
+        matrices["kendall"] = _matrix(km)
+        k_ci, k_q = intervals("kendall")
+        Сorrelation.correlation_matrix_chart(km, ci=k_ci, qvalues=k_q, counts=counts, out=buf)
+        caption = f"📈 Kendall correlation ({n} days)"
+    elif 20 <= n < 35:
+        km = Сorrelation.kendall(df, goal_vars)
+        matrices["kendall"] = _matrix(km)
+        k_ci, k_q = intervals("kendall")
+        p_ci, p_q = intervals("pearson")
+        Сorrelation.two_correlation_matrices_chart(km, pm, kendall_ci=k_ci, pearson_ci=p_ci,
+                                                  kendall_q=k_q, pearson_q=p_q, counts=counts, out=buf)
+        caption = f"📊 Kendall & Pearson ({n} days)"
+    else:  # n >= 35
+        p_ci, p_q = intervals("pearson")
+        Сorrelation.correlation_matrix_chart(pm, ci=p_ci, qvalues=p_q, counts=counts, out=buf)
+        caption = f"📉 Pearson correlation ({n} days)"
+    caption += "\n[..] 95% bootstrap CI · * q<0.05, ** q<0.01 (permutation test, BH)"
+    return {"caption": caption, "matrices": matrices}, buf.getvalue()
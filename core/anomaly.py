@@ -0,0 +1,69 @@
+"""
+Online outlier check for daily entries.
+
+Each numeric parameter of an experiment keeps one ParameterStats row: the
+number of days seen and an exponentially weighted mean and variance. A new
+value updates it in constant time (see add_daily_entry), and a value far
+from the weighted mean is flagged back to the user before the day is saved.
+No history is read for either step.
+
+The weight of a new value is max(ALPHA, 1 / count), so the first 1 / ALPHA
+days give the plain mean and variance and later days an EWMA that follows
+slow drifts in the user's habits.
+"""
+import math
+from dataclasses import dataclass
+
+from core.values import to_number
+
+ALPHA = 0.1
+# Days of history before a parameter is checked at all
+MIN_COUNT = 7
+# Flag values more than this many (weighted) standard deviations from the mean
+Z_THRESHOLD = 4.0
+# The deviation used is at least this share of |mean|, so a parameter that has always
+# had the same value does not flag every small change
+MIN_RELATIVE_SD = 0.1
+
+
+@dataclass(frozen=True)
+class Outlier:
+    name: str
+    value: float
+    mean: float
+    sd: float
+
+
+def weight(count: int) -> float:
+    """Weight of the value that brings the parameter to `count` days."""
+    return max(ALPHA, 1.0 / count)
+
+
+def update(count: int, mean: float, var: float, value: float) -> tuple[int, float, float]:
+    """(count, mean, var) after one more value (reference for the SQL upsert in add_daily_entry)."""
+    count += 1
+    a = weight(count)
+    diff = value - mean
+    return count, mean + a * diff, (1 - a) * (var + a * diff * diff)
+
+
+def _sd(mean: float, var: float) -> float:
+    return max(math.sqrt(max(var, 0.0)), MIN_RELATIVE_SD * abs(mean), 1e-9)
+
+
+def outliers(stats: dict, values: dict) -> list[Outlier]:
+    """
+    Values of a day that are unusual for their parameter. `stats` maps parameter
+    name -> ParameterStats (or anything with count/mean/var); names without
+    enough history and non-numeric values are never flagged.
+    """
+    flagged = []
+    for name, raw in values.items():
+        state = stats.get(name)
+        value = to_number(raw)
+        if state is None or value is None or state.count < MIN_COUNT:
+            continue
+        sd = _sd(state.mean, state.var)
+        if abs(value - state.mean) > Z_THRESHOLD * sd:
+            flagged.append(Outlier(name, value, state.mean, sd))
+    return flagged
@@ -0,0 +1,532 @@
+"""
+Batched NumPy kernels behind `Сorrelation`.
+
+Every kernel works on stacks of samples: goals G with shape (B, n, g) and
+features F with shape (B, n, f), and returns a (B, f, g) block of
+statistics, so B bootstrap resamples or permutations cost a few matrix
+operations instead of B calls to DataFrame.corr. Skipped entries are NaN
+and every statistic is pairwise-complete, as in DataFrame.corr.
+"""
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Upper bound for the temporary (chunk, n, n, p) sign arrays of the Kendall kernel
+KENDALL_CHUNK_BYTES = 64 * 2**20
+# Upper bound for the (rows, n, f + g) block of centred distances of the distance correlation kernel
+DCOR_CHUNK_BYTES = 64 * 2**20
+# Bins per column for mutual information; columns with at most this many distinct values keep them as-is
+MI_BINS = 5
+# Below this many (resample × row × column) cells a process pool costs more than it saves
+PARALLEL_MIN_WORK = 5_000_000
+
+
+def batched_pearson(G: np.ndarray, F: np.ndarray) -> np.ndarray:
+    """
+    Pearson r for every (feature, goal) pair of every sample in the stack. With missing
+    cells each pair uses its own complete rows: the six pairwise moments of
+    pairwise_moments, one batched product each.
+    """
+    if np.isnan(G).any() or np.isnan(F).any():
+        Fv, Fm = _masked(F, axis=1)
+        Gv, Gm = _masked(G, axis=1)
+
+        def products(a, b):
+            return np.einsum("bnf,bng->bfg", a, b, optimize=True)
+        return pearson_from_moments(products(Fm, Gm), products(Fv, Gm), products(Fm, Gv),
+                                    products(Fv ** 2, Gm), products(Fm, Gv ** 2), products(Fv, Gv))
+    Gc = G - G.mean(axis=1, keepdims=True)
+    Fc = F - F.mean(axis=1, keepdims=True)
+    num = np.einsum("bnf,bng->bfg", Fc, Gc, optimize=True)
+    den = np.sqrt((Fc ** 2).sum(axis=1))[:, :, None] * np.sqrt((Gc ** 2).sum(axis=1))[:, None, :]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return num / den
+
+
+def batched_kendall(G: np.ndarray, F: np.ndarray) -> np.ndarray:
+    """
+    Kendall tau-b (the variant DataFrame.corr uses) for every pair of every sample.
+    Built from pairwise sign matrices, processed in chunks to bound memory. With missing
+    cells a row pair (i, j) counts for a (feature, goal) pair only when both days have
+    both values: the signs of a missing cell are 0, and each side of the tau-b
+    denominator is weighted by the other column's presence on both days.
+    """
+    B, n, _ = G.shape
+    p = G.shape[2] + F.shape[2]
+    missing = np.isnan(G).any() or np.isnan(F).any()
+    # the masked path keeps twice the arrays alive
+    chunk = max(1, KENDALL_CHUNK_BYTES // (8 * n * n * p * (2 if missing else 1)))
+    out = np.empty((B, F.shape[2], G.shape[2]))
+    for start in range(0, B, chunk):
+        g = G[start:start + chunk]
+        f = F[start:start + chunk]
+        sG = np.sign(g[:, :, None, :] - g[:, None, :, :])
+        sF = np.sign(f[:, :, None, :] - f[:, None, :, :])
+        if missing:
+            sG, sF = np.nan_to_num(sG), np.nan_to_num(sF)
+            mG, mF = ~np.isnan(g), ~np.isnan(f)
+            both_G = (mG[:, :, None, :] & mG[:, None, :, :]).astype(float)
+            both_F = (mF[:, :, None, :] & mF[:, None, :, :]).astype(float)
+            num = np.einsum("bijf,bijg->bfg", sF, sG, optimize=True)
+            den = np.sqrt(np.einsum("bijf,bijg->bfg", np.abs(sF), both_G, optimize=True) *
+                          np.einsum("bijf,bijg->bfg", both_F, np.abs(sG), optimize=True))
+            overlap = np.einsum("bnf,bng->bfg", mF.astype(float), mG.astype(float), optimize=True)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out[start:start + chunk] = np.where(overlap >= 3, num / den, np.nan)
+            continue
+        num = np.einsum("bijf,bijg->bfg", sF, sG, optimize=True)
+        den = np.sqrt(np.abs(sF).sum(axis=(1, 2)))[:, :, None] * np.sqrt(np.abs(sG).sum(axis=(1, 2)))[:, None, :]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[start:start + chunk] = num / den
+    return out
+
+
+KERNELS = {
+    "pearson": batched_pearson,
+    "kendall": batched_kendall,
+}
+
+
+def _bootstrap_chunk(G: np.ndarray, F: np.ndarray, idx: np.ndarray, method: str) -> np.ndarray:
+    return KERNELS[method](G[idx], F[idx])
+
+
+def bootstrap_distribution(
+    G: np.ndarray, F: np.ndarray, method: str = "pearson", n_boot: int = 1000,
+    seed: int | None = None, n_jobs: int | None = 1
+) -> np.ndarray:
+    """
+    Resample rows (days) with replacement and return the (n_boot, f, g) stack of correlations.
+
+    All resample indices are drawn at once as one (n_boot, n) array. A day keeps its
+    skipped entries in every resample, and each replicate is pairwise-complete. Serial by default:
+    /correlation already runs this inside a core.workers process, and a pool of its own
+    there would bypass the worker and admission limits. Callers outside the pool
+    (benchmarks, scripts) may split large jobs over `n_jobs` processes (None: all cores).
+    """
+    n = G.shape[0]
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, n, size=(n_boot, n))
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if n_jobs <= 1 or n_boot * n * (G.shape[1] + F.shape[1]) < PARALLEL_MIN_WORK:
+        return _bootstrap_chunk(G, F, idx, method)
+
+    chunks = np.array_split(idx, n_jobs)
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        parts = pool.map(_bootstrap_chunk, [G] * n_jobs, [F] * n_jobs, chunks, [method] * n_jobs)
+        return np.concatenate(list(parts))
+
+
+def percentile_interval(stats: np.ndarray, alpha: float = 0.05) -> tuple[np.ndarray, np.ndarray]:
+    """Percentile (1 - alpha) interval over the first axis of a bootstrap stack."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN cells (constant columns) stay NaN
+        lower, upper = np.nanpercentile(stats, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+    return lower, upper
+
+
+def _permuted_goal_stats(G: np.ndarray, F: np.ndarray, method: str):
+    """
+    Statistic for a batch of goal permutations: takes a (batch, n) index array and a mask
+    of goal columns, returns (batch, f, selected goals).
+    Everything that does not depend on the permutation is computed once up front.
+    A permuted goal row keeps its missing cells, so with skipped entries each pair's
+    overlap (and the moments or tau-b denominator over it) is recomputed per permutation.
+    """
+    n = G.shape[0]
+    missing = np.isnan(G).any() or np.isnan(F).any()
+    if method == "pearson" and missing:
+        Fv, Fm = _masked(F)
+        Gv, Gm = _masked(G)
+
+        def pearson(idx, cols):
+            gv, gm = Gv[:, cols][idx], Gm[:, cols][idx]
+
+            def products(a, b):
+                return np.einsum("bng,nf->bfg", b, a, optimize=True)
+            return pearson_from_moments(products(Fm, gm), products(Fv, gm), products(Fm, gv),
+                                        products(Fv ** 2, gm), products(Fm, gv ** 2), products(Fv, gv))
+        return pearson
+    if method == "pearson":
+        # permuting rows leaves column means and norms unchanged, so only one product per batch is left
+        Gz = G - G.mean(axis=0)
+        Fz = F - F.mean(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            Gz = Gz / np.sqrt((Gz ** 2).sum(axis=0))
+            Fz = Fz / np.sqrt((Fz ** 2).sum(axis=0))
+        return lambda idx, cols: np.einsum("bng,nf->bfg", Gz[:, cols][idx], Fz, optimize=True)
+
+    sF = np.sign(F[:, None, :] - F[None, :, :])
+    if missing:
+        sF = np.nan_to_num(sF)
+        mF = ~np.isnan(F)
+        abs_F = np.abs(sF)
+        both_F = (mF[:, None, :] & mF[None, :, :]).astype(float)
+        overlap_F = mF.astype(float)
+
+        def masked_kendall(idx, cols):
+            g_all = G[:, cols]
+            chunk = max(1, KENDALL_CHUNK_BYTES // (16 * n * n * g_all.shape[1]))
+            out = np.empty((len(idx), F.shape[1], g_all.shape[1]))
+            for start in range(0, len(idx), chunk):
+                g = g_all[idx[start:start + chunk]]
+                mG = ~np.isnan(g)
+                sG = np.nan_to_num(np.sign(g[:, :, None, :] - g[:, None, :, :]))
+                both_G = (mG[:, :, None, :] & mG[:, None, :, :]).astype(float)
+                num = np.einsum("bijg,ijf->bfg", sG, sF, optimize=True)
+                den = np.sqrt(np.einsum("bijg,ijf->bfg", both_G, abs_F, optimize=True) *
+                              np.einsum("bijg,ijf->bfg", np.abs(sG), both_F, optimize=True))
+                overlap = np.einsum("bng,nf->bfg", mG.astype(float), overlap_F, optimize=True)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    out[start:start + chunk] = np.where(overlap >= 3, num / den, np.nan)
+            return out
+        return masked_kendall
+
+    sG_norm = np.sqrt(np.abs(np.sign(G[:, None, :] - G[None, :, :])).sum(axis=(0, 1)))
+    den = np.sqrt(np.abs(sF).sum(axis=(0, 1)))[:, None] * sG_norm[None, :]
+
+    def kendall(idx, cols):
+        g_all = G[:, cols]
+        chunk = max(1, KENDALL_CHUNK_BYTES // (8 * n * n * g_all.shape[1]))
+        out = np.empty((len(idx), F.shape[1], g_all.shape[1]))
+        for start in range(0, len(idx), chunk):
+            g = g_all[idx[start:start + chunk]]
+            sG = np.sign(g[:, :, None, :] - g[:, None, :, :])
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out[start:start + chunk] = np.einsum("bijg,ijf->bfg", sG, sF, optimize=True) / den[:, cols]
+        return out
+    return kendall
+
+
+def permutation_pvalues(
+    G: np.ndarray, F: np.ndarray, method: str = "pearson", alpha: float = 0.05, batch: int = 200,
+    max_perm: int = 10_000, min_perm: int = 200, z: float = 3.0, seed: int | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Two-sided permutation p-value for every feature×goal correlation.
+
+    All goal columns are permuted together (whole days, skipped entries included),
+    `batch` permutations at a time as one (batch, n) index block. A cell stops early once its running p-value is more than
+    `z` standard errors above `alpha`, or below alpha / m (the strictest
+    Benjamini–Hochberg threshold for m cells), so small p-values stay resolved enough
+    for the correction. The loop ends when every cell has stopped or `max_perm` is
+    reached. Returns (p-values, permutations used per cell: those with a defined statistic).
+    """
+    n = G.shape[0]
+    rng = np.random.default_rng(seed)
+    observed = np.abs(KERNELS[method](G[None], F[None])[0]) - 1e-12
+    stats = _permuted_goal_stats(G, F, method)
+
+    exceed = np.zeros(observed.shape)
+    used = np.zeros(observed.shape)   # permutations with a defined statistic
+    drawn = np.zeros(observed.shape)  # all permutations, for the max_perm cap
+    active = ~np.isnan(observed)
+    low = alpha / max(active.sum(), 1)
+    base = np.tile(np.arange(n), (batch, 1))
+
+    while active.any():
+        cols = active.any(axis=0)  # goal columns that still have undecided cells
+        idx = rng.permuted(base, axis=1)
+        r = stats(idx, cols)
+        # a permutation that leaves a pair too few overlapping days has no statistic: it is
+        # left out of that cell's count instead of counting as "not exceeding"
+        valid = ~np.isnan(r)
+        hits = (valid & (np.abs(r) >= observed[:, cols])).sum(axis=0)
+
+        sub = active[:, cols]
+        exceed[:, cols] += np.where(sub, hits, 0)
+        used[:, cols] += np.where(sub, valid.sum(axis=0), 0)
+        drawn[:, cols] += np.where(sub, batch, 0)
+
+        p = (exceed + 1) / (used + 1)
+        se = np.sqrt(p * (1 - p) / np.maximum(used, 1))
+        decided = (used >= min_perm) & ((p - z * se > alpha) | (p + z * se < low))
+        active &= ~decided & (drawn < max_perm)
+
+    with np.errstate(invalid="ignore"):
+        pvalues = np.where(np.isnan(observed), np.nan, (exceed + 1) / (used + 1))
+    return pvalues, used
+
+
+def benjamini_hochberg(pvalues: np.ndarray) -> np.ndarray:
+    """Benjamini–Hochberg adjusted p-values (q-values) across the whole matrix; NaN cells are ignored."""
+    flat = pvalues.ravel()
+    ok = ~np.isnan(flat)
+    p = flat[ok]
+    order = np.argsort(p)
+    ranked = p[order] * len(p) / np.arange(1, len(p) + 1)
+    ranked = np.minimum.accumulate(ranked[::-1])[::-1]
+    q = np.full(flat.shape, np.nan)
+    q_ok = np.empty(len(p))
+    q_ok[order] = np.minimum(ranked, 1.0)
+    q[ok] = q_ok
+    return q.reshape(pvalues.shape)
+
+
+def _masked(a: np.ndarray, axis: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (values centred on their column mean with NaN replaced by 0, 0/1 presence mask).
+    Pearson r does not change with a shift of either column, and centred moments keep
+    sxx - sx²/n from cancelling for values far from zero (a body weight of 80 ± 0.5 kg).
+    """
+    mask = ~np.isnan(a)
+    values = np.where(mask, a, 0.0)
+    mean = values.sum(axis=axis, keepdims=True) / np.maximum(mask.sum(axis=axis, keepdims=True), 1)
+    return np.where(mask, values - mean, 0.0), mask.astype(float)
+
+
+def pearson_from_moments(n, sx, sy, sxx, syy, sxy) -> np.ndarray:
+    """Pearson r from pairwise sufficient statistics (counts, sums, sums of squares and cross products)."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sxy - sx * sy / n
+        var_x = sxx - sx ** 2 / n
+        var_y = syy - sy ** 2 / n
+        r = cov / np.sqrt(var_x * var_y)
+    return np.where(n >= 3, np.clip(r, -1.0, 1.0), np.nan)
+
+
+def pairwise_moments(F: np.ndarray, G: np.ndarray) -> tuple[np.ndarray, ...]:
+    """
+    Sufficient statistics of every (feature, goal) pair over the rows where both are present:
+    (n, sx, sy, sxx, syy, sxy), each (f, g). Six matrix products, NaN-aware.
+    """
+    Fv, Fm = _masked(F)
+    Gv, Gm = _masked(G)
+    return (Fm.T @ Gm, Fv.T @ Gm, Fm.T @ Gv,
+            (Fv ** 2).T @ Gm, Fm.T @ (Gv ** 2), Fv.T @ Gv)
+
+
+def pairwise_pearson(G: np.ndarray, F: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Pairwise-complete Pearson r of every (feature, goal) pair, rows with NaN in either
+    column left out of that pair only. Returns (r, n), both (f, g); n is the overlap per pair.
+    """
+    moments = pairwise_moments(F, G)
+    return pearson_from_moments(*moments), moments[0]
+
+
+def _average_ranks(A: np.ndarray) -> np.ndarray:
+    """Column-wise average ranks (1-based, ties share their mean rank); NaN cells are skipped and stay NaN."""
+    order = np.argsort(A, axis=0, kind="stable")  # NaN sorts last
+    v = np.take_along_axis(A, order, axis=0)
+    pos = np.arange(A.shape[0])[:, None]
+    first = np.ones(v.shape, dtype=bool)
+    first[1:] = v[1:] != v[:-1]
+    last = np.ones(v.shape, dtype=bool)
+    last[:-1] = first[1:]
+    # every position's tie group spans [start, end] in sorted order
+    start = np.maximum.accumulate(np.where(first, pos, 0), axis=0)
+    end = np.minimum.accumulate(np.where(last, pos, A.shape[0])[::-1], axis=0)[::-1]
+    ranks = np.empty(A.shape)
+    np.put_along_axis(ranks, order, (start + end) / 2 + 1, axis=0)
+    return np.where(np.isnan(A), np.nan, ranks)
+
+
+def pairwise_spearman(G: np.ndarray, F: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Pairwise-complete Spearman rho: Pearson on average ranks, each pair ranked within its own
+    complete rows as DataFrame.corr does. Without missing cells every column is ranked once and
+    the rest is pairwise_pearson's matrix products; otherwise all pairs are ranked in one sort
+    of an (n, f·g) block. Returns (rho, n), both (f, g).
+    """
+    if not (np.isnan(F).any() or np.isnan(G).any()):
+        return pairwise_pearson(_average_ranks(G), _average_ranks(F))
+    both = ~np.isnan(F)[:, :, None] & ~np.isnan(G)[:, None, :]
+    shape = both.shape
+    rf = _average_ranks(np.where(both, F[:, :, None], np.nan).reshape(shape[0], -1)).reshape(shape)
+    rg = _average_ranks(np.where(both, G[:, None, :], np.nan).reshape(shape[0], -1)).reshape(shape)
+    rf, rg = np.where(both, rf, 0.0), np.where(both, rg, 0.0)
+    n = both.sum(axis=0).astype(float)
+    return pearson_from_moments(n, rf.sum(axis=0), rg.sum(axis=0),
+                                (rf ** 2).sum(axis=0), (rg ** 2).sum(axis=0), (rf * rg).sum(axis=0)), n
+
+
+def bin_codes(A: np.ndarray, bins: int = MI_BINS) -> np.ndarray:
+    """
+    Column-wise bin index (0..bins-1) of every cell, -1 for NaN. Columns with at most `bins`
+    distinct values (classes, yes/no) get one bin per value, the others equal-frequency bins.
+    """
+    codes = np.full(A.shape, -1)
+    for j in range(A.shape[1]):
+        column = A[:, j]
+        present = ~np.isnan(column)
+        values = np.unique(column[present])
+        if len(values) <= bins:
+            codes[present, j] = np.searchsorted(values, column[present])
+        else:
+            edges = np.quantile(column[present], np.linspace(0, 1, bins + 1)[1:-1])
+            codes[present, j] = np.searchsorted(edges, column[present], side="right")
+    return codes
+
+
+def _one_hot(codes: np.ndarray, bins: int) -> np.ndarray:
+    """(n, p) bin codes -> (n, p·bins) indicators; a missing cell is a row of zeros."""
+    n, p = codes.shape
+    out = np.zeros((n, p, bins))
+    rows, cols = np.nonzero(codes >= 0)
+    out[rows, cols, codes[rows, cols]] = 1.0
+    return out.reshape(n, p * bins)
+
+
+def _entropy_terms(p: np.ndarray, axis) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(p > 0, p * np.log(p), 0.0).sum(axis=axis)
+
+
+def pairwise_mutual_info(G: np.ndarray, F: np.ndarray, bins: int = MI_BINS) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Binned mutual information (nats) of every (feature, goal) pair over the rows where both are
+    present. The joint histograms of all pairs come from one matrix product of one-hot bin codes,
+    (f·bins, n) @ (n, g·bins); the Miller–Madow term corrects the small-sample upward bias.
+    Returns (mi, n), both (f, g).
+    """
+    f, g = F.shape[1], G.shape[1]
+    joint = (_one_hot(bin_codes(F, bins), bins).T @ _one_hot(bin_codes(G, bins), bins))
+    joint = joint.reshape(f, bins, g, bins).transpose(0, 2, 1, 3)  # (f, g, feature bin, goal bin)
+    n = joint.sum(axis=(2, 3))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p = joint / n[:, :, None, None]
+    pf, pg = p.sum(axis=3), p.sum(axis=2)
+    mi = _entropy_terms(p, (2, 3)) - _entropy_terms(pf, 2) - _entropy_terms(pg, 2)
+    cells = (joint > 0).sum(axis=(2, 3)) - (pf > 0).sum(axis=2) - (pg > 0).sum(axis=2) + 1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mi = np.maximum(mi - cells / (2 * n), 0.0)
+    return np.where(n >= 3, mi, np.nan), n
+
+
+def pairwise_information(G: np.ndarray, F: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Mutual information on the scale of |r|: Linfoot's informational coefficient
+    sqrt(1 - exp(-2 MI)), 0 for independence and equal to |r| for a Gaussian pair.
+    Returns (coefficient, n), both (f, g).
+    """
+    mi, n = pairwise_mutual_info(G, F)
+    return np.sqrt(1.0 - np.exp(-2.0 * mi)), n
+
+
+def _distance_row_means(X: np.ndarray) -> np.ndarray:
+    """mean_j |x_i - x_j| for every row i and column, in O(n log n) per column via sorting and prefix sums."""
+    n = X.shape[0]
+    order = np.argsort(X, axis=0)
+    v = np.take_along_axis(X, order, axis=0)
+    prefix = np.cumsum(v, axis=0)
+    k = np.arange(n)[:, None]
+    # sorted position k: k smaller values below, n - 1 - k larger above
+    sums = (k * v - (prefix - v)) + ((prefix[-1] - prefix) - (n - 1 - k) * v)
+    means = np.empty(X.shape)
+    np.put_along_axis(means, order, sums / n, axis=0)
+    return means
+
+
+def _distance_covariances(X: np.ndarray, f: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Squared distance covariances of X[:, :f] against X[:, f:] (f, p - f) and the distance
+    variances of every column (p,), over all rows of X (no NaN), each times n².
+
+    The row and grand means of each column's distance matrix are exact in O(n log n); the n×n
+    matrices themselves are only ever materialised a block of rows at a time (DCOR_CHUNK_BYTES,
+    twice that with the product's copy of it), with the cross products of all pairs accumulated
+    by one matrix product per block.
+    """
+    n, p = X.shape
+    row_means = _distance_row_means(X)
+    grand = row_means.mean(axis=0)
+    chunk = max(1, DCOR_CHUNK_BYTES // (8 * n * p))
+    dcov = np.zeros((f, p - f))
+    dvar = np.zeros(p)
+    for start in range(0, n, chunk):
+        rows = slice(start, start + chunk)
+        # built in place: one (rows, n, p) block at a time
+        centred = X[rows, None, :] - X[None, :, :]
+        np.abs(centred, out=centred)
+        centred -= row_means[rows, None, :]
+        centred -= row_means[None, :, :]
+        centred += grand
+        centred = centred.reshape(-1, p)
+        dcov += centred[:, :f].T @ centred[:, f:]
+        dvar += np.einsum("ij,ij->j", centred, centred)
+    return dcov, dvar
+
+
+def _dcor_from_moments(dcov: np.ndarray, dvar_x: np.ndarray, dvar_y: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.sqrt(np.maximum(dcov, 0.0) / np.sqrt(dvar_x[:, None] * dvar_y[None, :]))
+
+
+def distance_correlation(G: np.ndarray, F: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Distance correlation (Székely) of every (feature, goal) pair over the days on which both
+    were entered: 0 only for independent columns, and sensitive to non-monotonic effects
+    that r misses.
+
+    The double-centred distance matrices depend on the row set, so without skipped entries
+    all pairs share one pass over the full table; otherwise each pair with at least 3
+    overlapping days gets its own pass over just those days (see _distance_covariances).
+    Returns (dcor, n), both (f, g).
+    """
+    f, g = F.shape[1], G.shape[1]
+    present_F, present_G = ~np.isnan(F), ~np.isnan(G)
+    counts = present_F.T.astype(float) @ present_G.astype(float)
+    if F.shape[0] < 3:
+        return np.full((f, g), np.nan), counts
+    if present_F.all() and present_G.all():
+        dcov, dvar = _distance_covariances(np.concatenate([F, G], axis=1), f)
+        return _dcor_from_moments(dcov, dvar[:f], dvar[f:]), counts
+
+    dcor = np.full((f, g), np.nan)
+    for i, j in zip(*np.nonzero(counts >= 3)):
+        rows = present_F[:, i] & present_G[:, j]
+        dcov, dvar = _distance_covariances(np.column_stack([F[rows, i], G[rows, j]]), 1)
+        dcor[i, j] = _dcor_from_moments(dcov, dvar[:1], dvar[1:])[0, 0]
+    return dcor, counts
+
+
+PAIRWISE = {
+    "pearson": pairwise_pearson,
+    "spearman": pairwise_spearman,
+    "mutual_info": pairwise_information,
+    "dcor": distance_correlation,
+}
+
+
+def lagged_pearson(G: np.ndarray, F: np.ndarray, max_lag: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Correlation of feature[t - lag] with goal[t] for lag = 0..max_lag, rows being consecutive days
+    (missing days as NaN rows). Returns (r, n) with shape (max_lag + 1, f, g).
+    """
+    n_rows = G.shape[0]
+    r = np.full((max_lag + 1, F.shape[1], G.shape[1]), np.nan)
+    counts = np.zeros_like(r)
+    for lag in range(min(max_lag, n_rows - 1) + 1):
+        moments = pairwise_moments(F[:n_rows - lag], G[lag:])
+        counts[lag] = moments[0]
+        r[lag] = pearson_from_moments(*moments)
+    return r, counts
+
+
+def rolling_pearson(G: np.ndarray, F: np.ndarray, window: int, min_periods: int | None = None) -> np.ndarray:
+    """
+    Correlation over every window of `window` consecutive rows, shape (n - window + 1, f, g).
+
+    Per-row cross products are accumulated once with cumsum, so each window's sufficient
+    statistics are a difference of two prefix sums rather than a refit. The columns are
+    centred first (see _masked), which keeps those differences small.
+    """
+    min_periods = min_periods or window // 2
+    Fv, Fm = _masked(F)
+    Gv, Gm = _masked(G)
+
+    def prefix(a, b):
+        # (n + 1, f, g) running sums of the per-row products a[t, f] * b[t, g]
+        out = np.zeros((a.shape[0] + 1, a.shape[1], b.shape[1]))
+        np.cumsum(a[:, :, None] * b[:, None, :], axis=0, out=out[1:])
+        return out
+
+    sums = [prefix(Fm, Gm), prefix(Fv, Gm), prefix(Fm, Gv),
+            prefix(Fv ** 2, Gm), prefix(Fm, Gv ** 2), prefix(Fv, Gv)]
+    n, sx, sy, sxx, syy, sxy = (s[window:] - s[:-window] for s in sums)
+    r = pearson_from_moments(n, sx, sy, sxx, syy, sxy)
+    return np.where(n >= min_periods, r, np.nan)
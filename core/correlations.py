@@ -1,10 +1,79 @@
+import numpy as np
 import pandas as pd
 import matplotlib
-matplotlib.use('TkAgg')   # або 'Qt5Agg', 'Agg', тощо
+matplotlib.use('Agg')   # headless: charts are only ever saved to files/buffers
 import matplotlib.pyplot  as plt
 from io import BytesIO
 import seaborn as sns
 
+from core.correlation_kernels import (
+    bootstrap_distribution, percentile_interval, permutation_pvalues, benjamini_hochberg,
+    lagged_pearson, rolling_pearson, PAIRWISE,
+)
+
+# Default destination of the chart helpers; any path or binary buffer can be passed as `out`
+CHART_PATH = "data/correlation_heatmaps.png"
+# Heatmap cells backed by fewer overlapping days than this are greyed out
+MIN_PAIR_N = 8
+
+
+def _goal_feature_arrays(data: pd.DataFrame, goal_variables: list[str]) -> tuple[np.ndarray, np.ndarray, list[str]]:
+    """
+    Numeric rows split into goal (n, g) and feature (n, f) arrays, skipped entries as NaN,
+    plus the feature names. Days without any goal or without any feature belong to no pair
+    and are left out.
+    """
+    numeric = data.select_dtypes("number")
+    features = [c for c in numeric.columns if c not in goal_variables]
+    G = numeric[goal_variables].to_numpy(dtype=float)
+    F = numeric[features].to_numpy(dtype=float)
+    keep = ~np.isnan(G).all(axis=1) & ~np.isnan(F).all(axis=1)
+    return G[keep], F[keep], features
+
+
+def _stars(q: float) -> str:
+    if q < 0.01:
+        return "**"
+    if q < 0.05:
+        return "*"
+    return ""
+
+
+def _annotations(matrix: pd.DataFrame, ci: tuple[pd.DataFrame, pd.DataFrame] | None, qvalues: pd.DataFrame | None = None):
+    """
+    Heatmap cell labels: the coefficient, significance stars when q-values are given
+    and the interval underneath when one is given.
+    """
+    if ci is None and qvalues is None:
+        return True, ".2g"
+    labels = []
+    for row in matrix.index:
+        cells = []
+        for col in matrix.columns:
+            text = f"{matrix.at[row, col]:.2f}"
+            if qvalues is not None:
+                text += _stars(qvalues.at[row, col])
+            if ci is not None:
+                text += f"\n[{ci[0].at[row, col]:.2f}, {ci[1].at[row, col]:.2f}]"
+            cells.append(text)
+        labels.append(cells)
+    return np.array(labels), ""
+
+
+def _heatmap(matrix: pd.DataFrame, counts: pd.DataFrame | None, min_n: int, ci=None, qvalues=None, **kwargs):
+    """seaborn heatmap of a feature×goal matrix with cells under `min_n` overlapping days greyed out."""
+    annot, fmt = _annotations(matrix, ci, qvalues)
+    mask = None
+    if counts is not None:
+        mask = (counts.reindex_like(matrix) < min_n).to_numpy() | matrix.isna().to_numpy()
+    kwargs = {"cmap": "coolwarm", "vmin": -1, "vmax": 1, **kwargs}
+    ax = sns.heatmap(matrix, annot=annot, fmt=fmt, mask=mask, **kwargs)
+    ax.set_facecolor("lightgrey")
+    if mask is not None and mask.any():
+        ax.set_xlabel(f"grey: fewer than {min_n} days with both values")
+    return ax
+
+
 class Сorrelation:
     @staticmethod
     def kendall(data: pd.DataFrame, goal_variables: list[str]) -> pd.DataFrame:
@@ -17,36 +86,163 @@ class Сorrelation:
 
     @staticmethod
     def pearson(data: pd.DataFrame, goal_variables: list[str]) -> pd.DataFrame:
-        pearson_corr = data.corr(method='pearson')[goal_variables].drop(
-            goal_variables)  # Deleting selfcorrelations and correlations with goal variables
+        pearson_corr, _ = Сorrelation.pairwise(data, goal_variables, method="pearson")
         print("-----Pearson correlation matrix-------")
         print(pearson_corr, '\n')
 
         return pearson_corr
 
     @staticmethod
-    def two_correlation_matrices_chart(kendal_matrix: pd.DataFrame, pearson_martix: pd.DataFrame) -> None:
+    def spearman(data: pd.DataFrame, goal_variables: list[str]) -> pd.DataFrame:
+        spearman_corr, _ = Сorrelation.pairwise(data, goal_variables, method="spearman")
+        return spearman_corr
+
+    @staticmethod
+    def mutual_information(data: pd.DataFrame, goal_variables: list[str]) -> pd.DataFrame:
+        """Binned mutual information as a 0–1 coefficient (see correlation_kernels.pairwise_information)."""
+        information, _ = Сorrelation.pairwise(data, goal_variables, method="mutual_info")
+        return information
+
+    @staticmethod
+    def distance_correlation(data: pd.DataFrame, goal_variables: list[str]) -> pd.DataFrame:
+        dcor, _ = Сorrelation.pairwise(data, goal_variables, method="dcor")
+        return dcor
+
+    @staticmethod
+    def pairwise(data: pd.DataFrame, goal_variables: list[str], method: str = "pearson") -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Pairwise-complete feature×goal coefficients: each pair uses every day on which both
+        were entered, so skipped parameters cost only their own pairs. `method` is a key of PAIRWISE.
+        Returns (coefficients, overlapping days per pair), shaped like kendall()/pearson().
+        """
+        numeric = data.select_dtypes("number")
+        columns = list(numeric.columns)
+        features = [c for c in columns if c not in goal_variables]
+        values = numeric.to_numpy(dtype=float)  # one copy, columns picked by position
+        r, n = PAIRWISE[method](values[:, [columns.index(c) for c in goal_variables]],
+                                values[:, [columns.index(c) for c in features]])
+        return (pd.DataFrame(r, index=features, columns=goal_variables),
+                pd.DataFrame(n.astype(int), index=features, columns=goal_variables))
+
+    @staticmethod
+    def bootstrap_ci(data: pd.DataFrame, goal_variables: list[str], method: str = "pearson", n_boot: int = 1000,
+                     alpha: float = 0.05, seed: int | None = None, n_jobs: int | None = 1) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Percentile bootstrap interval for every feature×goal coefficient: whole days are
+        resampled and every replicate is pairwise-complete (serial unless n_jobs says
+        otherwise, see bootstrap_distribution).
+        Returns (lower, upper) shaped like the matrices from kendall()/pearson().
+        """
+        G, F, features = _goal_feature_arrays(data, goal_variables)
+        stats = bootstrap_distribution(G, F, method=method, n_boot=n_boot, seed=seed, n_jobs=n_jobs)
+        lower, upper = percentile_interval(stats, alpha)
+        return (pd.DataFrame(lower, index=features, columns=goal_variables),
+                pd.DataFrame(upper, index=features, columns=goal_variables))
+
+    @staticmethod
+    def permutation_test(data: pd.DataFrame, goal_variables: list[str], method: str = "pearson", alpha: float = 0.05,
+                         seed: int | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Permutation p-values for every pairwise-complete feature×goal coefficient and their
+        Benjamini–Hochberg q-values across the whole matrix.
+        """
+        G, F, features = _goal_feature_arrays(data, goal_variables)
+        pvalues, _ = permutation_pvalues(G, F, method=method, alpha=alpha, seed=seed)
+        qvalues = benjamini_hochberg(pvalues)
+        return (pd.DataFrame(pvalues, index=features, columns=goal_variables),
+                pd.DataFrame(qvalues, index=features, columns=goal_variables))
+
+    @staticmethod
+    def lagged(data: pd.DataFrame, goal_variables: list[str], max_lag: int = 7) -> pd.DataFrame:
+        """
+        Pearson correlation of each feature `lag` days earlier with each goal, lag = 0..max_lag.
+        `data` must have one row per calendar day (missing days as NaN rows).
+        Rows are features, columns are a (goal, lag) MultiIndex.
+        """
+        numeric = data.select_dtypes("number")
+        features = [c for c in numeric.columns if c not in goal_variables]
+        r, _ = lagged_pearson(numeric[goal_variables].to_numpy(dtype=float),
+                              numeric[features].to_numpy(dtype=float), max_lag)
+        columns = pd.MultiIndex.from_product([goal_variables, range(max_lag + 1)], names=["goal", "lag"])
+        # (lag, f, g) -> (f, g, lag) so the flattened columns follow (goal, lag)
+        return pd.DataFrame(r.transpose(1, 2, 0).reshape(len(features), -1), index=features, columns=columns)
+
+    @staticmethod
+    def rolling(data: pd.DataFrame, goal_variables: list[str], window: int = 14) -> pd.DataFrame:
+        """
+        Pearson correlation over a sliding window of `window` days, indexed by the window's last day.
+        `data` must have one row per calendar day. Columns are a (goal, feature) MultiIndex.
+        """
+        numeric = data.select_dtypes("number")
+        features = [c for c in numeric.columns if c not in goal_variables]
+        r = rolling_pearson(numeric[goal_variables].to_numpy(dtype=float),
+                            numeric[features].to_numpy(dtype=float), window)
+        columns = pd.MultiIndex.from_product([goal_variables, features], names=["goal", "feature"])
+        # (window, f, g) -> (window, g, f) so the flattened columns follow (goal, feature)
+        return pd.DataFrame(r.transpose(0, 2, 1).reshape(r.shape[0], -1), index=numeric.index[window - 1:], columns=columns)
+
+    @staticmethod
+    def lag_heatmap_chart(lagged: pd.DataFrame, out=CHART_PATH) -> None:
+        goals = list(lagged.columns.get_level_values("goal").unique())
+        plt.figure(figsize=(6 * len(goals), 5))
+        for i, goal in enumerate(goals, start=1):
+            plt.subplot(1, len(goals), i)
+            sns.heatmap(lagged[goal], annot=True, fmt=".2f", cmap="coolwarm", vmin=-1, vmax=1,
+                        cbar=i == len(goals))
+            plt.title(f'{goal}: feature N days earlier')
+            plt.xlabel('lag, days')
+        plt.tight_layout()
+        plt.savefig(out, format="png")
+        plt.close()
+
+    @staticmethod
+    def rolling_chart(rolled: pd.DataFrame, top: int = 3, out=CHART_PATH) -> None:
+        """One panel per goal with the `top` features of the largest average |r|."""
+        goals = list(rolled.columns.get_level_values("goal").unique())
+        plt.figure(figsize=(9, 3.5 * len(goals)))
+        for i, goal in enumerate(goals, start=1):
+            plt.subplot(len(goals), 1, i)
+            series = rolled[goal]
+            for feature in series.abs().mean().nlargest(top).index:
+                plt.plot(series.index, series[feature], label=feature)
+            plt.axhline(0, color="grey", linewidth=0.8)
+            plt.ylim(-1, 1)
+            plt.title(f'Rolling correlation with {goal}')
+            plt.legend(loc="upper left")
+            plt.grid(True)
+        plt.tight_layout()
+        plt.savefig(out, format="png")
+        plt.close()
+
+    @staticmethod
+    def two_correlation_matrices_chart(kendal_matrix: pd.DataFrame, pearson_martix: pd.DataFrame,
+                                       kendall_ci=None, pearson_ci=None, kendall_q=None, pearson_q=None,
+                                       counts=None, min_n=MIN_PAIR_N, out=CHART_PATH) -> None:
         plt.figure(figsize=(13, 5))
         plt.subplot(1, 2, 1)
-        sns.heatmap(kendal_matrix, annot=True, cmap="coolwarm", cbar=False)
+        _heatmap(kendal_matrix, counts, min_n, kendall_ci, kendall_q, cbar=False)
         plt.title('Kendall Correlation matrix')
 
         plt.subplot(1, 2, 2)
-        sns.heatmap(pearson_martix, annot=True, cmap="coolwarm")
+        _heatmap(pearson_martix, counts, min_n, pearson_ci, pearson_q)
         plt.title('Pearson Correlation matrix')
         plt.tight_layout()
         #plt.show()
-        plt.savefig("data/correlation_heatmaps.png")
+        plt.savefig(out, format="png")
         plt.close()
 
     @staticmethod
-    def correlation_matrix_chart(correlation_matrix: pd.DataFrame) -> None:
+    def correlation_matrix_chart(correlation_matrix: pd.DataFrame, ci=None, qvalues=None,
+                                 counts=None, min_n=MIN_PAIR_N, title='Correlation matrix', signed=True,
+                                 out=CHART_PATH) -> None:
+        # unsigned measures (mutual information, distance correlation) run from 0 to 1
+        scale = {} if signed else {"cmap": "Reds", "vmin": 0}
         plt.figure(figsize=(7,5))
-        sns.heatmap(correlation_matrix, annot=True, cmap="coolwarm", cbar=False)
-        plt.title('Correlation matrix')
+        _heatmap(correlation_matrix, counts, min_n, ci, qvalues, cbar=False, **scale)
+        plt.title(title)
         plt.tight_layout()
         #plt.show()
-        plt.savefig("data/correlation_heatmaps.png")
+        plt.savefig(out, format="png")
         plt.close()
 
 
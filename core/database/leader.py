@@ -0,0 +1,128 @@
+"""
+Leader election across bot instances with a Postgres advisory lock.
+
+Every instance runs a LeaderElection on the shared database. The instance
+holding the session-level advisory lock LOCK_KEY is the leader; the lock
+lives on one dedicated connection, so it is released by Postgres itself
+when the leader exits or loses that connection. The others retry every
+`interval` seconds and one of them takes over.
+
+The leader checks its connection on the same interval and steps down
+(on_deposed) when it fails, and callers confirm the lock right before
+doing leader-only work (confirm()). This only narrows the window: if the
+lock connection drops after a confirmation, or Postgres frees the lock
+before the old leader notices, another instance can be elected while the
+old one is still finishing a job. Runs are at most one per instance, not
+at most once overall, so leader-only jobs must tolerate an occasional
+duplicate.
+
+SQLite has no advisory locks and is single-node anyway: the only instance
+is elected at once.
+"""
+import asyncio
+import logging
+from collections.abc import Callable
+
+from sqlalchemy import text
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary, but the same in every instance: the "scheduler leader" lock
+LOCK_KEY = 0x6179_6C00
+RETRY_SECONDS = 15.0
+
+
+class LeaderElection:
+    def __init__(self, engine, on_elected: Callable[[], None], on_deposed: Callable[[], None],
+                 key: int = LOCK_KEY, interval: float = RETRY_SECONDS):
+        self.engine, self.key, self.interval = engine, key, interval
+        self.on_elected, self.on_deposed = on_elected, on_deposed
+        self.is_leader = False
+        self._conn = None
+        self._task: asyncio.Task | None = None
+        self._busy = asyncio.Lock()  # one statement at a time on the lock connection
+
+    async def _try_acquire(self) -> bool:
+        if self.engine.dialect.name != "postgresql":
+            return True
+        conn = await self.engine.connect()
+        try:
+            # autocommit: the lock is held by the session, not by an open transaction
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            if await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}):
+                self._conn, conn = conn, None
+                return True
+            return False
+        finally:
+            if conn is not None:
+                await conn.close()
+
+    async def _still_held(self) -> bool:
+        if self._conn is None:
+            return True
+        try:
+            await self._conn.scalar(text("SELECT 1"))
+            return True
+        except Exception:
+            logger.exception("Lost the leader lock connection")
+            return False
+
+    async def _release(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            await conn.scalar(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+        except Exception:
+            await conn.invalidate()  # the lock went with the broken connection
+        finally:
+            await conn.close()
+
+    def _set_leader(self, leader: bool) -> None:
+        self.is_leader = leader
+        metrics.SCHEDULER_LEADER.set(int(leader))
+        logger.info("Scheduler leader: %s", leader)
+        (self.on_elected if leader else self.on_deposed)()
+
+    async def _step_down(self) -> None:
+        self._set_leader(False)
+        await self._release()
+
+    async def confirm(self) -> bool:
+        """True if this instance leads and its lock connection answers right now; steps down otherwise."""
+        async with self._busy:
+            if not self.is_leader:
+                return False
+            if await self._still_held():
+                return True
+            await self._step_down()
+            return False
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with self._busy:
+                    if not self.is_leader:
+                        if await self._try_acquire():
+                            self._set_leader(True)
+                    elif not await self._still_held():
+                        await self._step_down()
+            except Exception:
+                logger.exception("Leader election round failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self.is_leader:
+            self._set_leader(False)
+        await self._release()
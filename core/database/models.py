@@ -1,15 +1,49 @@
 import enum
 
-from sqlalchemy import create_engine, Column, Integer, String, Date, ForeignKey, UniqueConstraint, Boolean, Enum, BigInteger
+from sqlalchemy import create_engine, event, Column, Integer, Float, String, Date, ForeignKey, UniqueConstraint, Boolean, Enum, BigInteger, LargeBinary, JSON
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker
-from config import DATABASE_URL
 
+try:
+    from config import DATABASE_URL
+except ImportError:
+    # no config.py: single-node deployment / test run on the embedded backend
+    DATABASE_URL = "sqlite+aiosqlite:///data/bot.db"
 
+# JSONB on Postgres, plain JSON (text) everywhere else
+JSONType = JSON().with_variant(JSONB(), "postgresql")
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+# Applied to every new SQLite connection: WAL lets readers run during a write,
+# synchronous=NORMAL is durable enough under WAL and avoids an fsync per commit
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "foreign_keys": "ON",
+    "busy_timeout": 5000,      # ms to wait for the writer lock instead of failing with "database is locked"
+    "cache_size": -16000,      # 16 MB page cache
+    "temp_store": "MEMORY",
+    "mmap_size": 134217728,    # 128 MB
+}
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def make_engine(url: str, **kwargs):
+    """Async engine for `url`; the backend (Postgres via asyncpg, SQLite via aiosqlite) follows the URL."""
+    engine = create_async_engine(url, **kwargs)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+engine = make_engine(DATABASE_URL, echo=True)
 
 async_session = async_sessionmaker(engine)
 
@@ -25,8 +59,14 @@ class Experiment(Base):
     __tablename__ = "experiments"
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.tg_id"), nullable=False)
+    user_id = Column(BigInteger, ForeignKey("users.tg_id"), nullable=False)
     name = Column(String, nullable=False)
+    # bumped on every write to daily_entries, so cached analysis results can tell they are stale
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # consecutive days with an entry, kept up to date by add_daily_entry
+    streak = Column(Integer, nullable=False, default=0, server_default="0")
+    best_streak = Column(Integer, nullable=False, default=0, server_default="0")
+    last_entry_date = Column(Date, nullable=True)
 
     user = relationship("User", back_populates="experiments")
     parameters = relationship("Parameter", back_populates="experiment", cascade="all, delete-orphan", passive_deletes=True)
@@ -38,7 +78,7 @@ class Parameter(Base):
     __tablename__ = "parameters"
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.tg_id"), nullable=False)
+    user_id = Column(BigInteger, ForeignKey("users.tg_id"), nullable=False)
     experiment_id = Column(Integer, ForeignKey("experiments.id"), nullable=False)
 
     name = Column(String, nullable=False)
@@ -59,7 +99,7 @@ class User(Base):
 
     # # Optionally, store configuration in a JSONB column
     # configuration = Column(JSONB, nullable=True)
-    user_chat_id = Column(Integer)
+    user_chat_id = Column(BigInteger)
 
     experiments    = relationship("Experiment", back_populates="user")
 
@@ -70,23 +110,93 @@ class User(Base):
 
 
 # Daily entries table
+# On Postgres it is hash-partitioned by user_id into DAILY_ENTRY_PARTITIONS
+# partitions (created right after the table, see below); every query that
+# filters on user_id touches a single partition. Elsewhere it is a plain table.
+DAILY_ENTRY_PARTITIONS = 16
+
 class DailyEntry(Base):
     __tablename__ = "daily_entries"
 
-    id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.tg_id"), nullable=False)
-    experiment_id = Column(Integer, ForeignKey("experiments.id"), nullable=False)
-    entry_date = Column(Date, nullable=False)
-    data = Column(JSONB, nullable=False)
+    # natural key, one entry per day per user and experiment: add_daily_entry upserts on it.
+    # It has to include user_id, the partition key, for Postgres to enforce it across partitions.
+    user_id = Column(BigInteger, ForeignKey("users.tg_id"), primary_key=True)
+    experiment_id = Column(Integer, ForeignKey("experiments.id"), primary_key=True)
+    entry_date = Column(Date, primary_key=True)
+    data = Column(JSONType, nullable=False)
 
-    # Optional unique constraint to ensure one entry per day per user
-    UniqueConstraint("user_id", "experiment_id", "entry_date", name="_user_exp_date_uc"),
+    __table_args__ = {"postgresql_partition_by": "HASH (user_id)"}
 
     user = relationship("User", back_populates="daily_entries")
     experiment  = relationship("Experiment", back_populates="daily_entries")
 
     def __repr__(self):
-        return f"<DailyEntry(id={self.id}, user_id={self.user_id}, exp_id={self.experiment_id}, entry_date={self.entry_date})>"
+        return f"<DailyEntry(user_id={self.user_id}, exp_id={self.experiment_id}, entry_date={self.entry_date})>"
+
+
+def _create_daily_entry_partitions(target, connection, **kw):
+    if connection.dialect.name != "postgresql":
+        return
+    # IF NOT EXISTS keeps create_all idempotent; hash partitions cover every user_id, so nothing is added later
+    for remainder in range(DAILY_ENTRY_PARTITIONS):
+        connection.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS daily_entries_p{remainder} PARTITION OF daily_entries "
+            f"FOR VALUES WITH (MODULUS {DAILY_ENTRY_PARTITIONS}, REMAINDER {remainder})"
+        )
+
+event.listen(DailyEntry.__table__, "after_create", _create_daily_entry_partitions)
+
+# Weekly and monthly aggregates of every numeric parameter, maintained by add_daily_entry;
+# /stats reads a few rows of this instead of the experiment's whole history
+class ParameterRollup(Base):
+    __tablename__ = "parameter_rollups"
+
+    experiment_id = Column(Integer, ForeignKey("experiments.id"), primary_key=True)
+    period = Column(String, primary_key=True)        # "week" (starting Monday) or "month"
+    period_start = Column(Date, primary_key=True)
+    parameter = Column(String, primary_key=True)     # parameter name, as in DailyEntry.data
+
+    count = Column(Integer, nullable=False)
+    total = Column(Float, nullable=False)
+    total_sq = Column(Float, nullable=False)
+    min_value = Column(Float, nullable=False)
+    max_value = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<ParameterRollup(exp_id={self.experiment_id}, {self.period} {self.period_start}, {self.parameter}, n={self.count})>"
+
+# Running weighted mean/variance of every numeric parameter (see core/anomaly.py):
+# one row per parameter, updated in place by add_daily_entry
+class ParameterStats(Base):
+    __tablename__ = "parameter_stats"
+
+    experiment_id = Column(Integer, ForeignKey("experiments.id"), primary_key=True)
+    parameter = Column(String, primary_key=True)     # parameter name, as in DailyEntry.data
+
+    count = Column(Integer, nullable=False)
+    mean = Column(Float, nullable=False)
+    var = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<ParameterStats(exp_id={self.experiment_id}, {self.parameter}, n={self.count}, mean={self.mean:.3g})>"
+
+# Fitted models and pre-rendered reports, reused by /analyze until the experiment's data_version moves
+class AnalysisResult(Base):
+    __tablename__ = "analysis_results"
+
+    id = Column(Integer, primary_key=True)
+    experiment_id = Column(Integer, ForeignKey("experiments.id"), nullable=False)
+    kind = Column(String, nullable=False)           # e.g. "regression"
+    target = Column(String, nullable=False)         # goal parameter name
+    data_version = Column(Integer, nullable=False)  # Experiment.data_version the result was computed on
+
+    payload = Column(JSONType, nullable=False)     # parameter vectors, covariance, fit statistics, rendered tables
+    image = Column(LargeBinary, nullable=True)      # rendered PNG
+
+    __table_args__ = (UniqueConstraint("experiment_id", "kind", "target", name="_exp_kind_target_uc"),)
+
+    def __repr__(self):
+        return f"<AnalysisResult(exp_id={self.experiment_id}, kind={self.kind}, target={self.target}, version={self.data_version})>"
 
 async def async_main():
     async with engine.begin() as conn:
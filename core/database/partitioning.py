@@ -0,0 +1,173 @@
+"""
+Postgres hash partitioning of daily_entries (see DailyEntry in models.py).
+
+New databases get the partitioned table from create_all. For a database
+created before partitioning, `migrate` rebuilds the table in one transaction:
+the old rows are copied into the partitioned table, keeping the newest row of
+any duplicated (user, experiment, day). It also widens the remaining INTEGER
+Telegram id columns to BIGINT. `check` runs the daily_entries functions of
+core/database/requests.py on a sample experiment in a transaction it rolls
+back, EXPLAINs every statement they issued and reports how many partitions
+each one touches; every per-user statement should touch exactly one.
+
+    python -m core.database.partitioning migrate [--database-url URL]
+    python -m core.database.partitioning check [--database-url URL]
+"""
+import argparse
+import asyncio
+import re
+from collections.abc import Awaitable, Callable
+from datetime import date, timedelta
+
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncConnection, async_sessionmaker
+
+import core.database.requests as rq
+from core.database.models import DATABASE_URL, DailyEntry, make_engine
+
+_PARTITION = re.compile(r"\bdaily_entries_p\d+\b")
+
+
+# Telegram ids no longer fit in INTEGER; these were created as INTEGER before
+_BIGINT_COLUMNS = (("experiments", "user_id"), ("parameters", "user_id"), ("users", "user_chat_id"))
+
+
+def _widen_user_ids(connection) -> None:
+    for table, column in _BIGINT_COLUMNS:
+        data_type = connection.exec_driver_sql(
+            "SELECT data_type FROM information_schema.columns "
+            f"WHERE table_schema = 'public' AND table_name = '{table}' AND column_name = '{column}'"
+        ).scalar()
+        if data_type == "integer":
+            connection.exec_driver_sql(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE BIGINT")
+
+
+def migrate(connection) -> str:
+    """Rebuild an unpartitioned daily_entries as the partitioned table; no-op when it already is."""
+    _widen_user_ids(connection)
+    kind = connection.exec_driver_sql(
+        "SELECT relkind::text FROM pg_class WHERE relname = 'daily_entries' AND relnamespace = 'public'::regnamespace"
+    ).scalar()
+    if kind is None:
+        DailyEntry.__table__.create(connection)
+        return "created"
+    if kind == "p":
+        return "already partitioned"
+
+    old_columns = {c["name"] for c in inspect(connection).get_columns("daily_entries")}
+    newest_first = "id DESC" if "id" in old_columns else "entry_date"
+    connection.exec_driver_sql("ALTER TABLE daily_entries RENAME TO daily_entries_unpartitioned")
+    # constraint and index names are per schema: move the old ones out of the way
+    for name, in connection.exec_driver_sql(
+        "SELECT conname FROM pg_constraint WHERE conrelid = 'daily_entries_unpartitioned'::regclass"
+    ).all():
+        connection.exec_driver_sql(
+            f'ALTER TABLE daily_entries_unpartitioned RENAME CONSTRAINT "{name}" TO "{name}_unpartitioned"'
+        )
+    DailyEntry.__table__.create(connection)
+    connection.exec_driver_sql(
+        "INSERT INTO daily_entries (user_id, experiment_id, entry_date, data) "
+        "SELECT DISTINCT ON (user_id, experiment_id, entry_date) user_id, experiment_id, entry_date, data "
+        f"FROM daily_entries_unpartitioned ORDER BY user_id, experiment_id, entry_date, {newest_first}"
+    )
+    connection.exec_driver_sql("DROP TABLE daily_entries_unpartitioned")
+    return "migrated"
+
+
+def _request_calls(user_id: int, day: date) -> list[tuple[str, Callable[[int], Awaitable]]]:
+    """Every core/database/requests.py function that reads or writes daily_entries, called with sample values."""
+    earlier = day - timedelta(days=2)
+    return [
+        ("add_daily_entry", lambda exp: rq.add_daily_entry(user_id, exp, day, {"mood": 3})),
+        ("add_daily_entry (replace)", lambda exp: rq.add_daily_entry(user_id, exp, day, {"mood": 4})),
+        ("add_daily_entry (back-fill)", lambda exp: rq.add_daily_entry(user_id, exp, earlier, {"mood": 2})),
+        ("rebuild_rollups", lambda exp: rq.rebuild_rollups(exp)),
+        ("has_daily_entries", lambda exp: rq.has_daily_entries(user_id, exp)),
+        ("get_entry_dates", lambda exp: rq.get_entry_dates(user_id, exp, earlier)),
+        ("get_daily_entries_for_user", lambda exp: rq.get_daily_entries_for_user(user_id)),
+        ("get_daily_entry_by_date", lambda exp: rq.get_daily_entry_by_date(user_id, day)),
+        ("get_daily_entry_by_all_conditions", lambda exp: rq.get_daily_entry_by_all_conditions(user_id, exp, day)),
+        ("get_daily_entries_for_experiment", lambda exp: rq.get_daily_entries_for_experiment(user_id, exp)),
+        ("get_entry_rows_for_experiment", lambda exp: rq.get_entry_rows_for_experiment(user_id, exp)),
+        ("get_users_without_entry", lambda exp: rq.get_users_without_entry(day)),
+        ("get_analysis_backlog", lambda exp: rq.get_analysis_backlog()),
+        ("delete_experiment", lambda exp: rq.delete_experiment(exp)),
+    ]
+
+
+# look for entries of every user by design: these scan all partitions
+CROSS_USER = ("get_users_without_entry", "get_analysis_backlog")
+
+
+async def check_pruning(conn: AsyncConnection, user_id: int = 1, day: date | None = None) -> dict[str, tuple[str, list[str]]]:
+    """
+    (verdict, partitions touched) of the plan of every daily_entries statement the request layer runs.
+
+    The functions of _request_calls run for real against a throwaway experiment inside
+    the caller's transaction, which the caller rolls back; each captured statement is then
+    EXPLAINed with the parameters it ran with. Keyed by function (and statement number
+    when one function runs several).
+    """
+    captured = []  # (function, statement, parameters)
+    current = [None]
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if "daily_entries" in statement and not executemany:
+            captured.append((current[0], statement, parameters))
+
+    sync_conn = conn.sync_connection
+    event.listen(sync_conn, "before_cursor_execute", capture)
+    session_factory = rq.async_session
+    rq.async_session = async_sessionmaker(bind=conn, expire_on_commit=False, join_transaction_mode="create_savepoint")
+    try:
+        await rq.add_user(user_id, "partition check", user_id)
+        exp = await rq.add_experiment(user_id, "partition check")
+        for name, call in _request_calls(user_id, day or date.today()):
+            current[0] = name
+            await call(exp.id)
+    finally:
+        rq.async_session = session_factory
+        event.remove(sync_conn, "before_cursor_execute", capture)
+
+    report = {}
+    for name in dict.fromkeys(name for name, _, _ in captured):
+        statements = [(sql, params) for n, sql, params in captured if n == name]
+        for i, (sql, params) in enumerate(statements, 1):
+            plan = "\n".join(row[0] for row in await conn.exec_driver_sql(f"EXPLAIN {sql}", params))
+            partitions = sorted(set(_PARTITION.findall(plan)))
+            if name in CROSS_USER:
+                verdict = "all users"
+            elif sql.lstrip().upper().startswith("INSERT"):
+                verdict = "routed"  # tuple routing picks the row's partition at run time; the plan names none
+            else:
+                verdict = "ok" if len(partitions) == 1 else "NOT PRUNED"
+            report[f"{name} #{i}" if len(statements) > 1 else name] = (verdict, partitions)
+    return report
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="daily_entries partitioning (Postgres)")
+    parser.add_argument("command", choices=("migrate", "check"))
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    engine = make_engine(args.database_url or DATABASE_URL)
+    try:
+        async with engine.connect() as conn:
+            if conn.dialect.name != "postgresql":
+                raise SystemExit("daily_entries is only partitioned on Postgres")
+            async with conn.begin() as transaction:
+                if args.command == "migrate":
+                    print(await conn.run_sync(migrate))
+                    return
+                report = await check_pruning(conn)
+                # the check writes a sample experiment: leave nothing behind
+                await transaction.rollback()
+            for name, (verdict, partitions) in report.items():
+                print(f"{name:40} {verdict:11} {', '.join(partitions)}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
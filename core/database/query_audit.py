@@ -0,0 +1,148 @@
+"""
+N+1 and slow-query detector.
+
+Statements are grouped by normalised SQL inside a scope: one update
+(bot.middlewares.QueryAudit), one scheduler job (@audited) or one test
+(tests/conftest.py). When a scope closes, every statement shape that ran
+REPEAT_THRESHOLD times or more is logged as a likely N+1, e.g. a query
+issued once per user or once per parameter inside a loop. Any statement
+slower than SLOW_QUERY_SECONDS is logged with its EXPLAIN plan.
+
+Statements outside a scope cost one context-variable lookup unless they are slow.
+"""
+import functools
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+REPEAT_THRESHOLD = 5
+SLOW_QUERY_SECONDS = 0.2
+EXPLAINABLE = ("select", "with", "update", "delete", "insert")
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+# a list of placeholders such as IN ($1::INTEGER, $2::INTEGER, ...) or IN (?, ?, ?) is one shape however long
+_PLACEHOLDER_LISTS = re.compile(r"\(\s*(?:\?|\$\d+(?:::\w+)?|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|\$\d+(?:::\w+)?|%\(\w+\)s|:\w+))+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=2048)
+def normalize(statement: str) -> str:
+    """SQL shape: literals replaced by ?, placeholder lists collapsed to (...), whitespace squeezed."""
+    sql = _PLACEHOLDER_LISTS.sub("(...)", statement)
+    sql = _LITERALS.sub("?", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+class QueryScope:
+    def __init__(self, name: str):
+        self.name = name
+        self.statements = {}  # normalised SQL -> [count, seconds]
+
+    def add(self, sql: str, seconds: float):
+        entry = self.statements.get(sql)
+        if entry is None:
+            self.statements[sql] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def repeated(self, threshold: int = REPEAT_THRESHOLD) -> list[dict]:
+        rows = [{"sql": sql, "count": count, "seconds": seconds}
+                for sql, (count, seconds) in self.statements.items() if count >= threshold]
+        return sorted(rows, key=lambda r: r["count"], reverse=True)
+
+    def summary(self) -> dict:
+        return {
+            "statements": sum(count for count, _ in self.statements.values()),
+            "seconds": sum(seconds for _, seconds in self.statements.values()),
+            "repeated": self.repeated(),
+        }
+
+
+current_scope: ContextVar[QueryScope | None] = ContextVar("current_scope", default=None)
+
+
+@contextmanager
+def query_scope(name: str):
+    """Group the statements run inside the block; log the repeated ones when it closes."""
+    scope = QueryScope(name)
+    token = current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        current_scope.reset(token)
+        for row in scope.repeated():
+            logger.warning("Possible N+1 in %s: %d× (%.1f ms total) %s",
+                           scope.name, row["count"], row["seconds"] * 1000, row["sql"][:300])
+
+
+def audited(func):
+    """Run an async job inside a query scope named after it."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with query_scope(f"job:{func.__name__}"):
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+def _explain(conn, statement: str, parameters) -> str:
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    # on Postgres a failed statement aborts the whole transaction, which belongs to the
+    # request being audited: a failing EXPLAIN is rolled back to a savepoint instead
+    savepoint = conn.dialect.name == "postgresql" and not getattr(conn.connection, "autocommit", False)
+    # a fresh DBAPI cursor: does not fire engine events and leaves the original result alone
+    cursor = conn.connection.cursor()
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT query_audit_explain")
+        try:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+        except Exception:
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT query_audit_explain")
+            raise
+        if savepoint:
+            cursor.execute("RELEASE SAVEPOINT query_audit_explain")
+        return "\n".join(" ".join(str(col) for col in row) for row in rows)
+    finally:
+        cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_audit_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_audit_start"].pop()
+    scope = current_scope.get()
+    if scope is not None:
+        scope.add(normalize(statement), elapsed)
+    if elapsed < SLOW_QUERY_SECONDS:
+        return
+
+    where = scope.name if scope is not None else "no scope"
+    plan = ""
+    if not executemany and statement.lstrip().lower().startswith(EXPLAINABLE):
+        try:
+            plan = _explain(conn, statement, parameters)
+        except Exception as e:
+            plan = f"EXPLAIN failed: {e}"
+    logger.warning("Slow query in %s: %.1f ms\n%s\n%s", where, elapsed * 1000, normalize(statement), plan)
+
+
+def install(target) -> None:
+    """
+    Listen on `target`: an AsyncEngine, an Engine, or the Engine class itself
+    (every engine in the process, as the test suite does).
+    """
+    target = getattr(target, "sync_engine", target)
+    if not event.contains(target, "before_cursor_execute", _before_cursor_execute):
+        event.listen(target, "before_cursor_execute", _before_cursor_execute)
+        event.listen(target, "after_cursor_execute", _after_cursor_execute)
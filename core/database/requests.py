@@ -1,5 +1,15 @@
-from .models import async_session, DailyEntry, User, Experiment, Parameter
-from sqlalchemy import select, delete
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from .models import (
+    async_session, DailyEntry, User, Experiment, Parameter, AnalysisResult, ParameterRollup, ParameterStats
+)
+from sqlalchemy import select, delete, update, func, or_, and_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from core import anomaly
+from core.values import to_number
 
 
 async def add_experiment(user_id: int, name: str) -> Experiment:
@@ -29,19 +39,31 @@ async def delete_experiment(experiment_id: int) -> None:
     Deletes an Experiment and all its related parameters & daily entries.
     Manually cascades deletes in case the database constraint was not applied.
     """
+    _parameter_cache.pop(experiment_id, None)
     async with async_session() as session:
+        exp = await session.get(Experiment, experiment_id)
+        if exp is None:
+            return
         # explicitly remove any parameters and entries tied to this experiment
         await session.execute(
             delete(Parameter).where(Parameter.experiment_id == experiment_id)
         )
+        # filtering on the owner too keeps the delete on one daily_entries partition
+        await session.execute(
+            delete(DailyEntry).where(DailyEntry.user_id == exp.user_id, DailyEntry.experiment_id == experiment_id)
+        )
+        await session.execute(
+            delete(AnalysisResult).where(AnalysisResult.experiment_id == experiment_id)
+        )
+        await session.execute(
+            delete(ParameterRollup).where(ParameterRollup.experiment_id == experiment_id)
+        )
         await session.execute(
-            delete(DailyEntry).where(DailyEntry.experiment_id == experiment_id)
+            delete(ParameterStats).where(ParameterStats.experiment_id == experiment_id)
         )
         # now delete the experiment itself
-        exp = await session.get(Experiment, experiment_id)
-        if exp:
-            await session.delete(exp)
-            await session.commit()
+        await session.delete(exp)
+        await session.commit()
 
 
 async def add_parameter(
@@ -58,7 +80,10 @@ async def add_parameter(
             class_max=class_max,
         )
         session.add(param)
+        # a new parameter (e.g. the first goal) changes what every analysis shows
+        await _bump_data_version(session, exp_id)
         await session.commit()
+        _parameter_cache.pop(exp_id, None)
         return param
 
 async def get_parameter(param_id: int) -> Parameter | None:
@@ -76,21 +101,304 @@ async def get_list_parameters(exp_id: int) -> list[Parameter]:
         return rows.all()
 
 
-async def add_daily_entry(user_id: int, experiment_id: int, entry_date, data: dict) -> DailyEntry:
-    existing = await get_daily_entry_by_all_conditions(user_id, experiment_id, entry_date)
+# Parameter definitions per experiment, for lookups on every message (/log).
+# add_parameter and delete_experiment drop the entry, but only in their own process:
+# another bot instance sharing the database sees the change once its entry expires.
+PARAMETER_CACHE_TTL = 60.0
+_parameter_cache: dict[int, tuple[float, tuple[Parameter, ...]]] = {}  # exp id -> (loaded at, parameters)
+
+async def get_cached_parameters(exp_id: int) -> tuple[Parameter, ...]:
+    """
+    Same as get_list_parameters, but served from memory for up to PARAMETER_CACHE_TTL seconds.
+    """
+    now = time.monotonic()
+    cached = _parameter_cache.get(exp_id)
+    if cached is not None and now - cached[0] < PARAMETER_CACHE_TTL:
+        return cached[1]
+    params = tuple(await get_list_parameters(exp_id))
+    _parameter_cache[exp_id] = (now, params)
+    return params
+
+
+def _insert(session, table):
+    """INSERT with ON CONFLICT support for the session's backend."""
+    dialect = session.get_bind().dialect.name
+    return (postgresql if dialect == "postgresql" else sqlite).insert(table)
+
+
+def _least_greatest(session):
+    """Two-argument min() and max() SQL functions of the session's backend."""
+    if session.get_bind().dialect.name == "postgresql":
+        return func.least, func.greatest
+    return func.min, func.max  # SQLite's scalar min()/max() with two arguments
+
+
+async def _update_parameter_stats(session, experiment_id: int, data: dict) -> None:
+    """
+    Fold one new day into the running mean/variance of each numeric parameter
+    (core/anomaly.py update(), as one multi-row upsert computed from the stored row).
+    """
+    rows = [
+        {"experiment_id": experiment_id, "parameter": name, "count": 1, "mean": value, "var": 0.0}
+        for name, raw in data.items() if (value := to_number(raw)) is not None
+    ]
+    if not rows:
+        return
+    stmt = _insert(session, ParameterStats).values(rows)
+    table, new = ParameterStats.__table__.c, stmt.excluded
+    _, upper = _least_greatest(session)
+    a = upper(anomaly.ALPHA, 1.0 / (table.count + 1))
+    diff = new.mean - table.mean  # excluded.mean is the new value
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.experiment_id, table.parameter],
+        set_={
+            "count": table.count + 1,
+            "mean": table.mean + a * diff,
+            "var": (1 - a) * (table.var + a * diff * diff),
+        },
+    )
+    await session.execute(stmt)
+
+
+def period_starts(day: date) -> dict[str, date]:
+    """First day of the week (Monday) and of the month that `day` falls in."""
+    return {"week": day - timedelta(days=day.weekday()), "month": day.replace(day=1)}
+
+
+def _rollup_rows(experiment_id: int, entries) -> list[dict]:
+    """ParameterRollup rows aggregated from (entry_date, data) pairs; non-numeric values are skipped."""
+    buckets = {}
+    for entry_date, data in entries:
+        for period, start in period_starts(entry_date).items():
+            for name, raw in data.items():
+                value = to_number(raw)
+                if value is None:
+                    continue
+                row = buckets.get((period, start, name))
+                if row is None:
+                    buckets[period, start, name] = {
+                        "experiment_id": experiment_id, "period": period, "period_start": start,
+                        "parameter": name, "count": 1, "total": value, "total_sq": value * value,
+                        "min_value": value, "max_value": value,
+                    }
+                else:
+                    row["count"] += 1
+                    row["total"] += value
+                    row["total_sq"] += value * value
+                    row["min_value"] = min(row["min_value"], value)
+                    row["max_value"] = max(row["max_value"], value)
+    return list(buckets.values())
+
+
+def _streaks(dates: list[date]) -> tuple[int, int]:
+    """(run of consecutive days ending at the latest date, longest run) for ascending dates."""
+    current = best = 0
+    previous = None
+    for day in dates:
+        current = current + 1 if previous is not None and day == previous + timedelta(days=1) else 1
+        best = max(best, current)
+        previous = day
+    return current, best
+
+
+async def _add_to_rollups(session, experiment_id: int, entry_date, data: dict) -> None:
+    """Fold one new day into its week and month rollups (single multi-row upsert)."""
+    rows = _rollup_rows(experiment_id, [(entry_date, data)])
+    if not rows:
+        return
+    stmt = _insert(session, ParameterRollup).values(rows)
+    table, new = ParameterRollup.__table__.c, stmt.excluded
+    lower, upper = _least_greatest(session)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.experiment_id, table.period, table.period_start, table.parameter],
+        set_={
+            "count": table.count + new.count,
+            "total": table.total + new.total,
+            "total_sq": table.total_sq + new.total_sq,
+            "min_value": lower(table.min_value, new.min_value),
+            "max_value": upper(table.max_value, new.max_value),
+        },
+    )
+    await session.execute(stmt)
+
+
+async def _recompute_rollups(session, user_id: int, experiment_id: int, entry_date) -> None:
+    """Rebuild the week and month rollups around `entry_date` (a replaced day can't be subtracted from min/max)."""
+    starts = period_starts(entry_date)
+    week_end = starts["week"] + timedelta(days=6)
+    month_end = (starts["month"] + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+    result = await session.execute(
+        select(DailyEntry.entry_date, DailyEntry.data).where(
+            DailyEntry.user_id == user_id,
+            DailyEntry.experiment_id == experiment_id,
+            DailyEntry.entry_date >= min(starts.values()),
+            DailyEntry.entry_date <= max(week_end, month_end)
+        )
+    )
+    entries = [(day, data) for day, data in result.all() if period_starts(day).items() & starts.items()]
+    await session.execute(
+        delete(ParameterRollup).where(
+            ParameterRollup.experiment_id == experiment_id,
+            or_(*(and_(ParameterRollup.period == period, ParameterRollup.period_start == start)
+                  for period, start in starts.items()))
+        )
+    )
+    rows = [row for row in _rollup_rows(experiment_id, entries) if starts[row["period"]] == row["period_start"]]
+    if rows:
+        await session.execute(ParameterRollup.__table__.insert(), rows)
+
+
+async def _update_streak(session, exp: Experiment, entry_date) -> None:
+    last = exp.last_entry_date
+    if last is None or entry_date > last:
+        exp.streak = exp.streak + 1 if last is not None and entry_date == last + timedelta(days=1) else 1
+        exp.last_entry_date = entry_date
+    else:
+        # a back-filled day may join two runs: recount from the stored dates
+        dates = await session.scalars(
+            select(DailyEntry.entry_date)
+            .where(DailyEntry.user_id == exp.user_id, DailyEntry.experiment_id == exp.id)
+            .order_by(DailyEntry.entry_date)
+        )
+        exp.streak, exp.best_streak = _streaks(dates.all())
+    exp.best_streak = max(exp.best_streak, exp.streak)
+
+
+async def _bump_data_version(session, experiment_id: int) -> None:
+    """Invalidate every stored analysis of the experiment: they are keyed on data_version."""
+    await session.execute(
+        update(Experiment)
+        .where(Experiment.id == experiment_id)
+        .values(data_version=Experiment.data_version + 1)
+    )
+
+
+async def add_daily_entry(user_id: int, experiment_id: int, entry_date, data: dict, merge: bool = False) -> DailyEntry:
+    """
+    Insert the day's entry, or replace its data if one already exists
+    (single upsert on the user+experiment+date unique constraint).
+    With merge=True the new values are added to the existing ones instead.
+    Keeps the experiment's rollups and streak up to date in the same transaction.
+    """
     async with async_session() as session:
+        # the experiment row lock serializes concurrent submits: each one reads the
+        # `previous` the other wrote, so the rollups, stats and streak count a day once
+        exp = await session.scalar(
+            select(Experiment).where(Experiment.id == experiment_id).with_for_update()
+        )
+        previous = await session.scalar(
+            select(DailyEntry.data).where(
+                DailyEntry.user_id == user_id,
+                DailyEntry.experiment_id == experiment_id,
+                DailyEntry.entry_date == entry_date
+            )
+        )
+        if merge and previous is not None:
+            data = {**previous, **data}
+        stmt = _insert(session, DailyEntry).values(
+            user_id=user_id, experiment_id=experiment_id, entry_date=entry_date, data=data
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DailyEntry.user_id, DailyEntry.experiment_id, DailyEntry.entry_date],
+            set_={"data": stmt.excluded.data},
+        )
+        entry = await session.scalar(stmt.returning(DailyEntry))
+
+        if previous is None:
+            await _add_to_rollups(session, experiment_id, entry_date, data)
+        elif previous != data:
+            await _recompute_rollups(session, user_id, experiment_id, entry_date)
+        # only values new to this day: the running stats can't take a replaced value back
+        await _update_parameter_stats(
+            session, experiment_id, {k: v for k, v in data.items() if previous is None or k not in previous}
+        )
 
-        if existing:
-            # 2a) update its JSON payload
-            existing.data = data
-            entry = existing
-        else:
-            entry = DailyEntry(user_id=user_id, experiment_id= experiment_id, entry_date=entry_date , data=data)
-        session.add(entry)
+        if exp is not None and previous is None:
+            await _update_streak(session, exp, entry_date)
+        # new data invalidates every stored analysis of this experiment
+        await _bump_data_version(session, experiment_id)
         await session.commit()
         return entry
 
 
+async def get_parameter_stats(experiment_id: int) -> dict[str, ParameterStats]:
+    """
+    The running mean/variance of every numeric parameter of the experiment, by name.
+    """
+    async with async_session() as session:
+        rows = await session.scalars(select(ParameterStats).where(ParameterStats.experiment_id == experiment_id))
+        return {row.parameter: row for row in rows}
+
+async def get_rollups(experiment_id: int, week_since: date, month_since: date) -> list[ParameterRollup]:
+    """
+    Weekly rollups from `week_since` and monthly ones from `month_since`
+    (one query on the rollup primary key).
+    """
+    async with async_session() as session:
+        rows = await session.scalars(
+            select(ParameterRollup).where(
+                ParameterRollup.experiment_id == experiment_id,
+                or_(
+                    and_(ParameterRollup.period == "week", ParameterRollup.period_start >= week_since),
+                    and_(ParameterRollup.period == "month", ParameterRollup.period_start >= month_since),
+                )
+            )
+        )
+        return rows.all()
+
+async def rebuild_rollups(experiment_id: int) -> Experiment | None:
+    """
+    Recompute all rollups and the streak of an experiment from its entries —
+    for experiments whose entries were written before rollups existed.
+    """
+    async with async_session() as session:
+        exp = await session.get(Experiment, experiment_id)
+        if exp is None:
+            return None
+        result = await session.execute(
+            select(DailyEntry.entry_date, DailyEntry.data)
+            .where(DailyEntry.user_id == exp.user_id, DailyEntry.experiment_id == experiment_id)
+            .order_by(DailyEntry.entry_date)
+        )
+        entries = [tuple(row) for row in result.all()]
+        await session.execute(delete(ParameterRollup).where(ParameterRollup.experiment_id == experiment_id))
+        rows = _rollup_rows(experiment_id, entries)
+        if rows:
+            await session.execute(ParameterRollup.__table__.insert(), rows)
+        dates = [day for day, _ in entries]
+        exp.streak, exp.best_streak = _streaks(dates)
+        exp.last_entry_date = dates[-1] if dates else None
+        await session.commit()
+        return exp
+
+
+async def has_daily_entries(user_id: int, experiment_id: int) -> bool:
+    """Whether the experiment has any entry at all (one EXISTS, no rows loaded)."""
+    async with async_session() as session:
+        return await session.scalar(
+            select(
+                select(DailyEntry.entry_date)
+                .where(DailyEntry.user_id == user_id, DailyEntry.experiment_id == experiment_id)
+                .exists()
+            )
+        )
+
+
+async def get_entry_dates(user_id: int, experiment_id: int, since: date) -> list[date]:
+    """Days from `since` on that have an entry, in order (one date per day, whatever was logged)."""
+    async with async_session() as session:
+        result = await session.scalars(
+            select(DailyEntry.entry_date)
+            .where(
+                DailyEntry.user_id == user_id,
+                DailyEntry.experiment_id == experiment_id,
+                DailyEntry.entry_date >= since,
+            )
+            .order_by(DailyEntry.entry_date)
+        )
+        return result.all()
+
+
 async def get_daily_entries_for_user(user_id: int):
     """
     Returns:
@@ -146,6 +454,101 @@ async def get_daily_entries_for_experiment(user_id: int, experiment_id: int) ->
         result = await session.scalars(stmt)
         return result.all()
 
+async def get_data_version(experiment_id: int) -> int:
+    """
+    Return the experiment's data_version (0 for an unknown experiment).
+    """
+    async with async_session() as session:
+        version = await session.scalar(
+            select(Experiment.data_version).where(Experiment.id == experiment_id)
+        )
+        return version or 0
+
+async def get_analysis_result(experiment_id: int, kind: str, target: str, data_version: int) -> AnalysisResult | None:
+    """
+    Return the stored result for experiment+kind+target if it was computed
+    on `data_version`, or None if it is missing or stale.
+    """
+    async with async_session() as session:
+        return await session.scalar(
+            select(AnalysisResult).where(
+                AnalysisResult.experiment_id == experiment_id,
+                AnalysisResult.kind == kind,
+                AnalysisResult.target == target,
+                AnalysisResult.data_version == data_version
+            )
+        )
+
+async def save_analysis_result(
+    experiment_id: int, kind: str, target: str, data_version: int, payload: dict, image: bytes | None = None
+) -> AnalysisResult:
+    """
+    Store (or replace) the result for experiment+kind+target.
+    """
+    async with async_session() as session:
+        result = await session.scalar(
+            select(AnalysisResult).where(
+                AnalysisResult.experiment_id == experiment_id,
+                AnalysisResult.kind == kind,
+                AnalysisResult.target == target
+            )
+        )
+        if result is None:
+            result = AnalysisResult(experiment_id=experiment_id, kind=kind, target=target)
+        result.data_version = data_version
+        result.payload = payload
+        result.image = image
+        session.add(result)
+        await session.commit()
+        return result
+
+async def get_analysis_backlog() -> list[tuple[Experiment, list[Parameter], dict[tuple[str, str], int]]]:
+    """
+    Every experiment with entries, most recently active first, with its parameters and
+    the data_version of each stored analysis keyed by (kind, target). Three queries in total.
+    Experiments logged before data_version existed are included: the check is on the entries.
+    """
+    has_entries = (
+        select(DailyEntry.entry_date)
+        .where(DailyEntry.user_id == Experiment.user_id, DailyEntry.experiment_id == Experiment.id)
+        .exists()
+    )
+    async with async_session() as session:
+        experiments = (await session.scalars(
+            select(Experiment)
+            .where(has_entries)
+            .order_by(Experiment.last_entry_date.desc().nulls_last(), Experiment.id)
+        )).all()
+        ids = [exp.id for exp in experiments]
+        if not ids:
+            return []
+        params = defaultdict(list)
+        for param in await session.scalars(select(Parameter).where(Parameter.experiment_id.in_(ids))):
+            params[param.experiment_id].append(param)
+        stored = defaultdict(dict)
+        for exp_id, kind, target, version in await session.execute(
+            select(AnalysisResult.experiment_id, AnalysisResult.kind, AnalysisResult.target, AnalysisResult.data_version)
+            .where(AnalysisResult.experiment_id.in_(ids))
+        ):
+            stored[exp_id][kind, target] = version
+        return [(exp, params[exp.id], stored[exp.id]) for exp in experiments]
+
+async def get_entry_rows_for_experiment(user_id: int, experiment_id: int) -> list[tuple]:
+    """
+    Same rows as get_daily_entries_for_experiment, but only (entry_date, data)
+    tuples: cheap to load and to hand to the analysis worker processes.
+    """
+    async with async_session() as session:
+        result = await session.execute(
+            select(DailyEntry.entry_date, DailyEntry.data)
+            .where(
+                DailyEntry.user_id == user_id,
+                DailyEntry.experiment_id == experiment_id
+            )
+            .order_by(DailyEntry.entry_date)
+        )
+        return [tuple(row) for row in result.all()]
+
 async def add_user(tg_id: int, tg_user_name: str, user_chat_id: int) -> None:
     async with async_session() as session:
         # Check if the user already exists based on Telegram ID
@@ -161,3 +564,17 @@ async def get_user(tg_id: int) -> User:
         user = await session.scalar(select(User).where(User.tg_id == tg_id))
         return user
 
+
+
+async def get_users_without_entry(entry_date) -> list[User]:
+    """
+    Users with no DailyEntry (in any experiment) on entry_date, in one query:
+    an anti-join on the user's tg_id instead of a lookup per user.
+    """
+    async with async_session() as session:
+        has_entry = select(DailyEntry.user_id).where(
+            DailyEntry.user_id == User.tg_id,
+            DailyEntry.entry_date == entry_date,
+        ).exists()
+        result = await session.scalars(select(User).where(~has_entry).order_by(User.tg_id))
+        return result.all()
@@ -0,0 +1,195 @@
+"""
+Best-subset and stepwise feature selection for MultipleLinearRegression.
+
+Subsets are explored depth-first. Each child adds one column to its parent's
+QR factorisation (one Gram–Schmidt step), so a child's RSS costs O(n·k).
+A branch is cut when even the largest subset under it cannot beat the
+current top models (branch and bound). Top-level branches can be spread
+over processes.
+"""
+import heapq
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Exhaustive search above this many features is replaced by stepwise search
+EXHAUSTIVE_MAX_FEATURES = 25
+# From this many features the top-level branches go to a process pool
+PARALLEL_MIN_FEATURES = 14
+# A column whose residual norm falls below this share of its own norm is collinear
+COLLINEAR_TOL = 1e-8
+# Subsets are at most one feature per this many rows: with fewer, the best of thousands of
+# subsets fits noise almost perfectly and every criterion picks the largest one allowed
+MIN_ROWS_PER_FEATURE = 6
+
+CRITERIA = ("aic", "bic", "ebic", "adj_r2")
+# Columns of the best_subsets result, also when no subset qualifies
+RESULT_COLUMNS = ["features", "k", "rss", "aic", "bic", "ebic", "r2", "adj_r2"]
+
+
+def _log_choose(p: int, k: int) -> float:
+    return math.lgamma(p + 1) - math.lgamma(k + 1) - math.lgamma(p - k + 1)
+
+
+def _scores(rss: float, k: int, n: int, tss: float, p: int) -> dict:
+    """
+    AIC/BIC as statsmodels reports them for OLS with an intercept, R², adjusted R², and the
+    extended BIC (Chen & Chen, γ = 1): BIC + 2·log C(p, k), which charges for how many subsets
+    of that size there were to choose from. C(p, k) is taken at min(k, p // 2) so the penalty
+    never shrinks as k grows.
+    """
+    llf = -n / 2 * (math.log(2 * math.pi) + math.log(max(rss, 1e-300) / n) + 1)
+    bic = -2 * llf + math.log(n) * (k + 1)
+    return {
+        "aic": -2 * llf + 2 * (k + 1),
+        "bic": bic,
+        "ebic": bic + 2 * _log_choose(p, min(k, p // 2)),
+        "r2": 1 - rss / tss,
+        "adj_r2": 1 - (rss / (n - k - 1)) / (tss / (n - 1)),
+    }
+
+
+def _loss(criterion: str, rss: float, k: int, n: int, tss: float, p: int) -> float:
+    """Criterion as a loss (lower is better). Non-decreasing in both rss and k, which the bound relies on."""
+    score = _scores(rss, k, n, tss, p)[criterion]
+    return -score if criterion == "adj_r2" else score
+
+
+class _Search:
+    """Depth-first branch-and-bound over subsets of the columns of a centred X."""
+
+    def __init__(self, X: np.ndarray, y: np.ndarray, criterion: str, top: int, max_size: int):
+        self.X, self.y = X, y
+        self.n, self.p = X.shape
+        self.tss = float(y @ y)
+        self.criterion, self.top, self.max_size = criterion, top, max_size
+        self.best = []       # heap of (-loss, subset, rss): the worst kept model sits on top
+        self.visited = 0
+
+    def _keep(self, subset: tuple, rss: float):
+        loss = _loss(self.criterion, rss, len(subset), self.n, self.tss, self.p)
+        item = (-loss, subset, rss)
+        if len(self.best) < self.top:
+            heapq.heappush(self.best, item)
+        elif loss < -self.best[0][0]:
+            heapq.heapreplace(self.best, item)
+
+    def _bound(self, Q: np.ndarray, resid: np.ndarray, subset: tuple) -> float:
+        """Lowest loss any strict superset under this node can reach."""
+        rest = self.X[:, subset[-1] + 1:]
+        if rest.shape[1] == 0 or len(subset) >= self.max_size:
+            return math.inf
+        rest = rest - Q @ (Q.T @ rest)
+        coef, *_ = np.linalg.lstsq(rest, resid, rcond=None)
+        rss_floor = float(np.sum((resid - rest @ coef) ** 2))
+        return _loss(self.criterion, rss_floor, len(subset) + 1, self.n, self.tss, self.p)
+
+    def _add(self, Q: np.ndarray, resid: np.ndarray, j: int):
+        """One Gram–Schmidt step: extend Q by column j and update the residual, or None if collinear."""
+        x = self.X[:, j]
+        v = x - Q @ (Q.T @ x)
+        norm = np.linalg.norm(v)
+        if norm <= COLLINEAR_TOL * max(np.linalg.norm(x), 1e-300):
+            return None
+        q = v / norm
+        return np.column_stack([Q, q]), resid - q * (q @ resid)
+
+    def run(self, first: int | None = None):
+        roots = range(self.p) if first is None else [first]
+        Q0 = np.empty((self.n, 0))
+        for j in roots:
+            step = self._add(Q0, self.y, j)
+            if step is not None:
+                self._descend((j,), *step)
+        return self
+
+    def _descend(self, subset: tuple, Q: np.ndarray, resid: np.ndarray):
+        self.visited += 1
+        self._keep(subset, float(resid @ resid))
+        if len(self.best) == self.top and self._bound(Q, resid, subset) >= -self.best[0][0]:
+            return
+        if len(subset) >= self.max_size:
+            return
+        for j in range(subset[-1] + 1, self.p):
+            step = self._add(Q, resid, j)
+            if step is not None:
+                self._descend(subset + (j,), *step)
+
+
+def _branch(X, y, criterion, top, max_size, first):
+    search = _Search(X, y, criterion, top, max_size).run(first)
+    return search.best, search.visited
+
+
+def _stepwise(X: np.ndarray, y: np.ndarray, criterion: str, top: int, max_size: int) -> list:
+    """Forward selection: add the column that lowers the loss most until nothing improves."""
+    search = _Search(X, y, criterion, top, max_size)
+    Q, resid, subset = np.empty((X.shape[0], 0)), y, ()
+    current = math.inf
+    while len(subset) < max_size:
+        candidates = []
+        for j in set(range(X.shape[1])) - set(subset):
+            step = search._add(Q, resid, j)
+            if step is None:
+                continue
+            new = tuple(sorted(subset + (j,)))
+            rss = float(step[1] @ step[1])
+            search._keep(new, rss)
+            candidates.append((_loss(criterion, rss, len(new), search.n, search.tss, search.p), new, step))
+        if not candidates:
+            break
+        loss, new, (Q, resid) = min(candidates, key=lambda c: c[0])
+        if loss >= current:
+            break
+        current, subset = loss, new
+    return search.best
+
+
+def best_subsets(X: pd.DataFrame, y: pd.Series, criterion: str = "bic", top: int = 5,
+                 method: str = "auto", max_size: int | None = None, n_jobs: int | None = 1) -> pd.DataFrame:
+    """
+    Rank feature subsets of X for predicting y with OLS (intercept always included).
+
+    criterion: "aic", "bic", "ebic" or "adj_r2"; method: "exhaustive", "stepwise" or "auto"
+    (exhaustive up to EXHAUSTIVE_MAX_FEATURES columns). Rows with missing values are dropped,
+    and subsets have at most one feature per MIN_ROWS_PER_FEATURE remaining rows.
+    Serial by default, since /analyze runs this inside a core.workers process; callers
+    outside the pool may spread large searches over `n_jobs` processes (None: all cores).
+    Returns the `top` models, best first, with their feature lists and fit statistics.
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(f"criterion must be one of {CRITERIA}")
+
+    data = pd.concat([X, y.rename("__y__")], axis=1).dropna()
+    # strongest single predictors first, so good models are found early and prune more
+    order = data[X.columns].corrwith(data["__y__"]).abs().fillna(0).sort_values(ascending=False).index
+    names = list(order)
+    Xc = data[names].to_numpy(dtype=float)
+    Xc = Xc - Xc.mean(axis=0)
+    yc = data["__y__"].to_numpy(dtype=float)
+    yc = yc - yc.mean()
+    n, p = Xc.shape
+    max_size = min(max_size or p, p, n - 2, max(1, n // MIN_ROWS_PER_FEATURE))
+
+    if method == "auto":
+        method = "exhaustive" if p <= EXHAUSTIVE_MAX_FEATURES else "stepwise"
+
+    if method == "stepwise":
+        best = _stepwise(Xc, yc, criterion, top, max_size)
+    elif p >= PARALLEL_MIN_FEATURES and (n_jobs or os.cpu_count() or 1) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            parts = pool.map(_branch, *zip(*[(Xc, yc, criterion, top, max_size, j) for j in range(p)]))
+            best = heapq.nlargest(top, (item for part, _ in parts for item in part))
+    else:
+        best, _ = _branch(Xc, yc, criterion, top, max_size, None)
+
+    tss = float(yc @ yc)
+    rows = []
+    for _, subset, rss in sorted(best, reverse=True):
+        chosen = {names[j] for j in subset}
+        features = [c for c in X.columns if c in chosen]  # original column order
+        rows.append({"features": features, "k": len(subset), "rss": rss, **_scores(rss, len(subset), n, tss, p)})
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
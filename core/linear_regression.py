@@ -4,6 +4,7 @@ import seaborn as sns
 import statsmodels.api as sm
 import numpy as  np
 from core.base_classes import Regresion
+from core.feature_selection import best_subsets
 
 class MultipleLinearRegression(Regresion):
     def __init__(self, X: pd.DataFrame, y: pd.Series, add_polynomial_terms: bool = False):
@@ -28,6 +29,14 @@ class MultipleLinearRegression(Regresion):
         self.model = sm.OLS(self.y, self.X).fit()
         self.used_poly = add_polynomial_terms
 
+    @staticmethod
+    def select_features(X: pd.DataFrame, y: pd.Series, criterion: str = "ebic", top: int = 5) -> pd.DataFrame:
+        """
+        Найкращі набори ознак за AIC/BIC/розширеним BIC/скоригованим R² (best-subset, для великої
+        кількості ознак — stepwise). Повертає top моделей, найкраща першою.
+        """
+        return best_subsets(X, y.squeeze(), criterion=criterion, top=top)
+
     def summary(self):
         return self.model.summary()
 
@@ -76,18 +85,30 @@ class MultipleLinearRegression(Regresion):
     def r_squared(self) -> float:
         return round(self.model.rsquared, 4)
 
-    def plot_residuals(self):
+    def plot_residuals(self, buf=None, ax=None):
+        """
+        Графік залишків; якщо передано buf — зберігає PNG у нього замість показу,
+        якщо ax — малює на цих осях (у складеному звіті) і нічого не зберігає.
+        """
         residuals = self.model.resid
         fitted = self.model.fittedvalues
-        plt.figure(figsize=(6, 4))
-        plt.scatter(fitted, residuals, alpha=0.7)
-        plt.axhline(0, color="red", linestyle="--")
-        plt.xlabel("Прогнозовані значення")
-        plt.ylabel("Залишки")
-        plt.title("Графік залишків")
-        plt.grid(True)
+        if ax is None:
+            plt.figure(figsize=(6, 4))
+        target = ax or plt.gca()
+        target.scatter(fitted, residuals, alpha=0.7)
+        target.axhline(0, color="red", linestyle="--")
+        target.set_xlabel("Прогнозовані значення")
+        target.set_ylabel("Залишки")
+        target.set_title("Графік залишків")
+        target.grid(True)
+        if ax is not None:
+            return
         plt.tight_layout()
-        plt.show()
+        if buf is None:
+            plt.show()
+        else:
+            plt.savefig(buf, format="PNG")
+            plt.close()
 
     def plot_feature_relationship(self, feature_names):
         # Якщо передано окремий рядок, перетворимо його в список
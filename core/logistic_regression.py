@@ -73,12 +73,15 @@ class OrdinalLogisticRegression(Regresion):
         """Аналог R² — McFadden Pseudo R-squared."""
         return round(self.result.prsquared, 4)
 
-    def plot_class_probabilities(self, feature_name: str, fixed_values: dict, class_labels: list = None):
+    def plot_class_probabilities(self, feature_name: str, fixed_values: dict, class_labels: list = None, buf=None,
+                                 ax=None):
         """
         Графік: зміна ймовірності класу залежно від однієї ознаки.
         feature_name: змінна, яку будемо змінювати (x-вісь)
         fixed_values: інші змінні — значення по замовчуванню
         class_labels: необов’язково — перелік значень цільової змінної
+        buf: необов’язково — зберегти PNG у буфер замість показу
+        ax: необов’язково — малювати на цих осях (у складеному звіті), нічого не зберігаючи
         """
         x_range = pd.Series(np.linspace(self.X[feature_name].min(), self.X[feature_name].max(), num=40))
         probs = []
@@ -88,8 +91,8 @@ class OrdinalLogisticRegression(Regresion):
             obs[feature_name] = val
             # Обгортаємо в DataFrame з одним рядком
             pred = self.result.predict(pd.DataFrame([obs]))
-            # Вибираємо перший рядок (якщо predict повертає DataFrame з індексом)
-            probs.append(pred.iloc[0])
+            # Перший рядок як масив: мітки стовпців predict — номери класів 0..k-1, а не їх значення
+            probs.append(np.asarray(pred)[0])
 
         # Якщо class_labels не передано, використовуємо унікальні значення цільової змінної
         if class_labels is None:
@@ -97,14 +100,22 @@ class OrdinalLogisticRegression(Regresion):
 
 
         probs_df = pd.DataFrame(probs, columns=class_labels if class_labels else self.result.model.endog.unique())
-        plt.figure(figsize=(8, 5))
+        if ax is None:
+            plt.figure(figsize=(8, 5))
+        target = ax or plt.gca()
         for label in probs_df.columns:
-            plt.plot(x_range, probs_df[label], label=f"Клас {label}")
-        plt.title(f"Ймовірність класу залежно від {feature_name}")
-        plt.xlabel(feature_name)
-        plt.ylabel("Ймовірність")
-        plt.legend()
-        plt.grid(True)
+            target.plot(x_range, probs_df[label], label=f"Клас {label}")
+        target.set_title(f"Ймовірність класу залежно від {feature_name}")
+        target.set_xlabel(feature_name)
+        target.set_ylabel("Ймовірність")
+        target.legend()
+        target.grid(True)
+        if ax is not None:
+            return
         plt.tight_layout()
-        plt.show()
+        if buf is None:
+            plt.show()
+        else:
+            plt.savefig(buf, format="PNG")
+            plt.close()
 
@@ -0,0 +1,170 @@
+"""
+In-process metrics in the Prometheus text format.
+
+Handlers, SQL statements, worker-pool jobs and Telegram API calls are timed
+into fixed-bucket histograms; `serve()` exposes them on a local aiohttp
+endpoint for Prometheus to scrape. Recording is a dict lookup plus a bisect,
+so it can stay on in production.
+
+Work done while an update is being handled is attributed to it through the
+`current_update` context variable (set by bot.middlewares.UpdateMetrics).
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+
+@dataclass
+class UpdateStats:
+    """What one update cost: filled in by the SQL hooks and run_cpu while it is handled."""
+    handler: str = "unhandled"
+    sql_statements: int = 0
+    sql_seconds: float = 0.0
+
+
+current_update: ContextVar[UpdateStats | None] = ContextVar("current_update", default=None)
+
+_registry = []
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{k}="{v}"' for k, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.label_names = name, help, labels
+        self.values = {}
+        _registry.append(self)
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, *labels):
+        self.values[labels] = value
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.label_names, self.buckets = name, help, labels, buckets
+        self.series = {}  # labels -> [per-bucket counts (+Inf last), sum]
+        _registry.append(self)
+
+    def observe(self, value: float, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Time to handle one update, by handler", ("handler",))
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Updates whose handler raised", ("handler",))
+UPDATE_SQL_STATEMENTS = Histogram("bot_update_sql_statements", "SQL statements run while handling one update",
+                                  ("handler",), COUNT_BUCKETS)
+UPDATE_SQL_SECONDS = Histogram("bot_update_sql_seconds", "Time spent in SQL while handling one update",
+                               ("handler",), SQL_BUCKETS)
+SQL_SECONDS = Histogram("db_statement_seconds", "Duration of single SQL statements", (), SQL_BUCKETS)
+EXECUTOR_WAIT_SECONDS = Histogram("executor_queue_wait_seconds", "Time a run_cpu job waited for a free worker",
+                                  ("function",))
+EXECUTOR_RUN_SECONDS = Histogram("executor_run_seconds", "Time a run_cpu job ran in its worker", ("function",))
+TELEGRAM_SECONDS = Histogram("telegram_api_seconds", "Duration of Bot API calls", ("method",))
+TELEGRAM_ERRORS = Counter("telegram_api_errors_total", "Bot API calls that raised", ("method",))
+ADMISSION_QUEUE_DEPTH = Gauge("bot_admission_queue_depth", "Expensive updates waiting for a free analysis slot")
+ADMISSION_IN_FLIGHT = Gauge("bot_admission_in_flight", "Expensive updates holding an analysis slot")
+ADMISSION_WAIT_SECONDS = Histogram("bot_admission_wait_seconds", "Time an expensive update waited for a slot",
+                                   ("handler",))
+ADMISSION_COST = Counter("bot_admission_cost_total", "Tokens spent by admitted expensive updates", ("handler",))
+ADMISSION_REJECTED = Counter("bot_admission_rejected_total", "Expensive updates turned away (reason: rate or busy)",
+                             ("handler", "reason"))
+SCHEDULER_LEADER = Gauge("bot_scheduler_leader", "1 while this instance holds the scheduler leader lock")
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    SQL_SECONDS.observe(elapsed)
+    stats = current_update.get()
+    if stats is not None:
+        stats.sql_statements += 1
+        stats.sql_seconds += elapsed
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement run on `engine` (an AsyncEngine or a plain Engine)."""
+    target = getattr(engine, "sync_engine", engine)
+    if not event.contains(target, "before_cursor_execute", _before_cursor_execute):
+        event.listen(target, "before_cursor_execute", _before_cursor_execute)
+        event.listen(target, "after_cursor_execute", _after_cursor_execute)
+
+
+def record_executor_job(ref: str, submitted: float, started: float, finished: float) -> None:
+    """Wall-clock (time.time) timestamps of a run_cpu job, split into queue wait and run time."""
+    function = ref.rpartition(":")[2]
+    EXECUTOR_WAIT_SECONDS.observe(max(0.0, started - submitted), function)
+    EXECUTOR_RUN_SECONDS.observe(max(0.0, finished - started), function)
+
+
+async def serve(host: str = METRICS_HOST, port: int = METRICS_PORT):
+    """Expose GET /metrics; returns the aiohttp runner so the caller can clean it up."""
+    from aiohttp import web
+
+    async def metrics(request):
+        return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,151 @@
+"""
+Population-level correlations across every user's daily entries.
+
+On Postgres daily_entries is hash-partitioned by user_id (models.DAILY_ENTRY_PARTITIONS
+physical tables), and each worker process is given whole partitions to read
+directly, so together the workers read the table once. Elsewhere the table
+is not partitioned and is scanned in one process. Each worker streams its
+rows and keeps only mergeable
+sufficient statistics per parameter-name pair, so its memory depends on
+the number of distinct parameter names, not on the number of rows. The
+partial results are then merged and turned into one correlation matrix.
+
+Run from the scheduler (see bot/daily_reminder.py) or by hand:
+    python -m core.population --workers 4
+"""
+import argparse
+import asyncio
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import column, make_url, select, table
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from core.database.models import DATABASE_URL, DAILY_ENTRY_PARTITIONS, DailyEntry, JSONType, make_engine
+from core.values import to_number
+
+OUTPUT_PATH = "data/population_correlations.csv"
+# Pairs observed together on fewer days than this are left out of the matrix
+MIN_PAIR_COUNT = 30
+BATCH_SIZE = 1000
+
+
+class SufficientStats:
+    """
+    Per parameter-name pair: [n, mean a, mean b, M2 a, M2 b, C ab] over the days both were
+    recorded, where M2 are sums of squared deviations from the mean and C the sum of
+    co-deviations. Rows are added with Welford's update and two instances merge with
+    Chan et al.'s parallel formulas, so partitions can be reduced in any order and no
+    Σx² - (Σx)²/n cancellation happens for large, nearly constant values.
+    """
+
+    def __init__(self):
+        self.pairs: dict[tuple[str, str], list[float]] = {}
+
+    def update(self, data: dict) -> None:
+        values = {name: v for name, raw in data.items() if (v := to_number(raw)) is not None}
+        for a, b in itertools.combinations(sorted(values), 2):
+            x, y = values[a], values[b]
+            acc = self.pairs.get((a, b))
+            if acc is None:
+                self.pairs[(a, b)] = [1.0, x, y, 0.0, 0.0, 0.0]
+                continue
+            n, mean_a, mean_b, m2_a, m2_b, c_ab = acc
+            n += 1
+            dx, dy = x - mean_a, y - mean_b
+            mean_a += dx / n
+            mean_b += dy / n
+            acc[:] = n, mean_a, mean_b, m2_a + dx * (x - mean_a), m2_b + dy * (y - mean_b), c_ab + dx * (y - mean_b)
+
+    def merge(self, other: "SufficientStats") -> "SufficientStats":
+        for key, theirs in other.pairs.items():
+            ours = self.pairs.get(key)
+            if ours is None:
+                self.pairs[key] = list(theirs)
+                continue
+            n1, mean_a1, mean_b1, m2_a1, m2_b1, c1 = ours
+            n2, mean_a2, mean_b2, m2_a2, m2_b2, c2 = theirs
+            n = n1 + n2
+            da, db = mean_a2 - mean_a1, mean_b2 - mean_b1
+            weight = n1 * n2 / n
+            ours[:] = (n, mean_a1 + da * n2 / n, mean_b1 + db * n2 / n,
+                       m2_a1 + m2_a2 + da * da * weight, m2_b1 + m2_b2 + db * db * weight, c1 + c2 + da * db * weight)
+        return self
+
+    def correlation(self, min_count: int = MIN_PAIR_COUNT) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """Symmetric Pearson matrix and the number of days behind each cell."""
+        names = sorted({name for pair in self.pairs for name in pair})
+        corr = pd.DataFrame(np.eye(len(names)), index=names, columns=names)
+        counts = pd.DataFrame(0, index=names, columns=names)
+        for (a, b), (n, _, _, m2_a, m2_b, c_ab) in self.pairs.items():
+            counts.loc[a, b] = counts.loc[b, a] = int(n)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                r = np.float64(c_ab) / np.sqrt(m2_a * m2_b)
+            corr.loc[a, b] = corr.loc[b, a] = r if n >= min_count else np.nan
+        return corr, counts
+
+
+def _sources(database_url: str, part: int, parts: int) -> list:
+    """What worker `part` of `parts` reads: its share of the physical partitions, or the whole table."""
+    if make_url(database_url).get_backend_name() != "postgresql":
+        return [DailyEntry.__table__]
+    return [table(f"daily_entries_p{k}", column("data", JSONType))
+            for k in range(DAILY_ENTRY_PARTITIONS) if k % parts == part]
+
+
+async def _scan(database_url: str, part: int, parts: int, batch_size: int) -> SufficientStats:
+    # every worker process needs its own engine: connections cannot cross a fork
+    engine = make_engine(database_url)
+    stats = SufficientStats()
+    try:
+        async with async_sessionmaker(engine)() as session:
+            for source in _sources(database_url, part, parts):
+                stmt = select(source.c.data).execution_options(yield_per=batch_size)
+                async for data in await session.stream_scalars(stmt):
+                    stats.update(data)
+    finally:
+        await engine.dispose()
+    return stats
+
+
+def scan_partition(database_url: str, part: int, parts: int, batch_size: int = BATCH_SIZE) -> SufficientStats:
+    """Map step: sufficient statistics of worker `part`'s share of daily_entries (runs in a worker process)."""
+    return asyncio.run(_scan(database_url, part, parts, batch_size))
+
+
+def compute_population_correlations(workers: int = 4, database_url: str | None = None,
+                                    output_path: str | None = OUTPUT_PATH) -> pd.DataFrame:
+    """
+    Scan daily_entries in up to `workers` processes (one per group of Postgres partitions;
+    a single one elsewhere), reduce, and optionally save the matrix as CSV.
+    """
+    database_url = database_url or DATABASE_URL
+    if make_url(database_url).get_backend_name() == "postgresql":
+        workers = max(1, min(workers, DAILY_ENTRY_PARTITIONS))
+    else:
+        workers = 1
+    total = SufficientStats()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for partial in pool.map(scan_partition, [database_url] * workers, range(workers), [workers] * workers):
+            total.merge(partial)
+
+    corr, _ = total.correlation()
+    if output_path:
+        corr.to_csv(output_path)
+    return corr
+
+
+async def population_job(workers: int = 4) -> None:
+    """Scheduler entry point: runs the batch job off the event loop."""
+    await asyncio.get_running_loop().run_in_executor(None, compute_population_correlations, workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Population-level correlations across all users")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--out", default=OUTPUT_PATH)
+    args = parser.parse_args()
+    print(compute_population_correlations(args.workers, args.database_url, args.out).round(2))
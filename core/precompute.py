@@ -0,0 +1,187 @@
+"""
+Nightly precompute of the /analyze and /correlation artefacts.
+
+Every goal-parameter regression and every correlation view whose stored
+result in analysis_results is missing or older than the experiment's
+data_version is recomputed in the core.workers process pool, most recently
+active experiments first, `concurrency` at a time. Each result is saved as
+soon as it is ready, so a run cut short by its time budget (or a restart)
+resumes on the next run: finished artefacts are no longer stale.
+
+The handlers call the same `regression_result` / `correlation_result` through
+the same single-flight keys, so a daytime request is answered from the stored
+artefact, and one made while the artefact is being computed waits for that
+computation instead of starting another.
+
+Run from the scheduler (see bot/daily_reminder.py) or by hand:
+    python -m core.precompute --concurrency 2 --budget 1800
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from collections.abc import Awaitable, Callable
+
+import core.database.requests as rq
+from core import workers
+from core.singleflight import analysis_flights
+
+logger = logging.getLogger(__name__)
+
+CORRELATION_MODES = ("same", "lag", "rolling", "spearman", "mutual_info", "dcor")
+LAG_DAYS = 7
+ROLLING_WINDOW = 14
+# Fewest entries /correlation draws a chart for
+MIN_CORRELATION_DAYS = 10
+
+# Jobs in flight at once (at most the worker pool size is useful) and the wall-clock budget of one run
+CONCURRENCY = int(os.environ.get("BOT_PRECOMPUTE_CONCURRENCY", workers.MAX_WORKERS))
+BUDGET_SECONDS = float(os.environ.get("BOT_PRECOMPUTE_BUDGET", 2 * 3600))
+
+
+def regression_key(exp_id: int, target: str, version: int) -> tuple:
+    return ("regression", exp_id, target, version)
+
+
+def correlation_key(exp_id: int, mode: str, version: int) -> tuple:
+    return ("correlation", exp_id, mode, version)
+
+
+async def regression_result(user_id: int, exp_id: int, params, target: str, version: int) -> tuple[dict, bytes | None]:
+    """(payload, png) of the /analyze fit for `target`: the stored one if it is current, otherwise fitted and stored."""
+    stored = await rq.get_analysis_result(exp_id, "regression", target, version)
+    if stored is not None:
+        return stored.payload, stored.image
+    return await _store_regression(user_id, exp_id, params, target, version)
+
+
+async def _store_regression(user_id: int, exp_id: int, params, target: str, version: int) -> tuple[dict, bytes | None]:
+    rows = await rq.get_entry_rows_for_experiment(user_id, exp_id)
+    param_types = {p.name: p.type for p in params}
+    payload, image = await workers.run_cpu("core.analysis:regression_report", rows, param_types, target)
+    await rq.save_analysis_result(exp_id, "regression", target, version, payload, image)
+    return payload, image
+
+
+def _warning(text: str) -> tuple[dict, None]:
+    return {"caption": text}, None
+
+
+async def _correlation_report(user_id: int, exp_id: int, mode: str, params) -> tuple[dict, bytes | None]:
+    rows = await rq.get_entry_rows_for_experiment(user_id, exp_id)
+    if not rows:
+        return _warning("⚠️ No daily entries for that experiment.")
+
+    n = len(rows)
+
+    if n < MIN_CORRELATION_DAYS:
+        return _warning(f"⚠️ Not enough data ({n} days). Need at least {MIN_CORRELATION_DAYS} entries to compute correlations.")
+
+    # extract the names of all goal‐type parameters
+    goal_vars = [p.name for p in params if p.is_goal]
+    if not goal_vars:
+        return _warning("⚠️ This experiment has no goal parameters defined.")
+    # parameters defined but never entered have no column to correlate
+    entered = set().union(*(data for _, data in rows))
+    goal_vars = [g for g in goal_vars if g in entered]
+    if not goal_vars:
+        return _warning("⚠️ None of the goal parameters has been entered yet.")
+    if entered <= set(goal_vars):
+        return _warning("⚠️ Only goal parameters have been entered: there is nothing to correlate them with yet.")
+
+    if mode == "rolling" and n < 2 * ROLLING_WINDOW:
+        return _warning(f"⚠️ Not enough data ({n} days). Need at least {2 * ROLLING_WINDOW} entries for the rolling view.")
+
+    # fits and charts run in the analysis worker processes
+    return await workers.run_cpu(
+        "core.analysis:correlation_report",
+        rows, {p.name: p.type for p in params}, goal_vars, mode, LAG_DAYS, ROLLING_WINDOW
+    )
+
+
+async def correlation_result(user_id: int, exp_id: int, mode: str, version: int) -> tuple[dict, bytes | None]:
+    """
+    (payload, png) of the /correlation view `mode`: the stored one if it is current,
+    otherwise computed and stored. png is None when there is only a warning to show
+    (payload["caption"]); warnings are stored too, so they are not re-checked nightly.
+    """
+    stored = await rq.get_analysis_result(exp_id, "correlation", mode, version)
+    if stored is not None:
+        return stored.payload, stored.image
+    return await _store_correlation(user_id, exp_id, await rq.get_list_parameters(exp_id), mode, version)
+
+
+async def _store_correlation(user_id: int, exp_id: int, params, mode: str, version: int) -> tuple[dict, bytes | None]:
+    payload, image = await _correlation_report(user_id, exp_id, mode, params)
+    await rq.save_analysis_result(exp_id, "correlation", mode, version, payload, image)
+    return payload, image
+
+
+async def _stale_jobs() -> list[tuple[tuple, Callable[[], Awaitable]]]:
+    """
+    (single-flight key, coroutine factory) for every missing or outdated artefact.
+    The backlog query already tells which ones are stale and carries the parameters,
+    so a job only loads its experiment's entries and saves its result.
+    """
+    jobs = []
+    for exp, params, stored in await rq.get_analysis_backlog():
+        version = exp.data_version
+        for param in params:
+            if param.is_goal and stored.get(("regression", param.name)) != version:
+                jobs.append((
+                    regression_key(exp.id, param.name, version),
+                    lambda exp=exp, params=params, target=param.name, version=version:
+                        _store_regression(exp.user_id, exp.id, params, target, version),
+                ))
+        for mode in CORRELATION_MODES:
+            if stored.get(("correlation", mode)) != version:
+                jobs.append((
+                    correlation_key(exp.id, mode, version),
+                    lambda exp=exp, params=params, mode=mode, version=version:
+                        _store_correlation(exp.user_id, exp.id, params, mode, version),
+                ))
+    return jobs
+
+
+async def precompute_all(concurrency: int = CONCURRENCY, budget: float = BUDGET_SECONDS) -> dict[str, int]:
+    """
+    Recompute every stale artefact, `concurrency` at a time, starting no new job once
+    `budget` seconds have passed. Returns counts of done / failed / deferred jobs.
+    """
+    deadline = time.monotonic() + budget
+    slots = asyncio.Semaphore(concurrency)
+    counts = {"done": 0, "failed": 0, "deferred": 0}
+
+    async def run(key, compute):
+        async with slots:
+            if time.monotonic() > deadline:
+                counts["deferred"] += 1  # still stale, so the next run picks it up
+                return
+            try:
+                await analysis_flights.do(key, compute)
+            except Exception:
+                counts["failed"] += 1
+                logger.exception("Precompute of %s failed", key)
+            else:
+                counts["done"] += 1
+
+    jobs = await _stale_jobs()
+    await asyncio.gather(*(run(key, compute) for key, compute in jobs))
+    logger.info("Precompute: %d stale, %s", len(jobs), counts)
+    return counts
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Precompute stale /analyze and /correlation artefacts")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--budget", type=float, default=BUDGET_SECONDS, help="seconds after which no new job starts")
+    args = parser.parse_args()
+    try:
+        print(await precompute_all(args.concurrency, args.budget))
+    finally:
+        workers.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,158 @@
+"""
+Sampling profiler for slow updates.
+
+While a profiled update is in flight a background thread samples the event
+loop thread's stack every SAMPLE_INTERVAL seconds (sys._current_frames), and
+run_cpu jobs started by that update sample themselves inside the worker.
+When the update ends, the trace is kept if the update took longer than
+THRESHOLD_SECONDS or came from a user in TRACED_USERS. It is written to
+TRACE_DIR as JSON with the handler name and the callback data or message text.
+
+Loop samples sitting in the selector mean the loop was waiting on I/O
+(database, Bot API). Other updates handled at the same time show up in the
+loop samples too; `in_flight` in the trace says how many there were.
+
+Turn it on with BOT_PROFILE_THRESHOLD=<seconds> and/or
+BOT_PROFILE_USERS=<tg_id,...>. With neither set nothing is installed and
+nothing is sampled. Export for flamegraph.pl / speedscope:
+
+    python -m core.profiling data/traces/<trace>.json > analyze.folded
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+
+SAMPLE_INTERVAL = 0.005
+MAX_SAMPLES = 20_000  # ring buffer of loop samples, ~100 s at the default interval
+TRACE_DIR = Path("data/traces")
+
+THRESHOLD_SECONDS = float(os.environ["BOT_PROFILE_THRESHOLD"]) if os.environ.get("BOT_PROFILE_THRESHOLD") else None
+TRACED_USERS = {int(uid) for uid in os.environ.get("BOT_PROFILE_USERS", "").split(",") if uid.strip()}
+
+
+class Trace:
+    """Worker samples collected for one profiled update."""
+
+    def __init__(self):
+        self.worker_samples = Counter()
+
+
+# set while a profiled update is handled; run_cpu checks it to profile its job too
+current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+
+_frame_names = {}
+
+
+def _frame_name(code) -> str:
+    name = _frame_names.get(code)
+    if name is None:
+        name = _frame_names[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return name
+
+
+def _stack(frame) -> str:
+    """Collapsed stack, root first: "main (main.py:18);run (base_events.py:600);..."."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Sampler(threading.Thread):
+    """Samples one thread's stack while at least one caller has asked for it (start/stop nest)."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        super().__init__(daemon=True, name="stack-sampler")
+        self.thread_id, self.interval = thread_id, interval
+        self.samples = deque(maxlen=MAX_SAMPLES)  # (perf_counter, collapsed stack)
+        self.users = 0
+        self._wanted = threading.Event()
+        self._stopped = False
+
+    def acquire(self):
+        self.users += 1
+        self._wanted.set()
+
+    def release(self):
+        self.users -= 1
+        if self.users == 0:
+            self._wanted.clear()
+
+    def close(self):
+        self._stopped = True
+        self._wanted.set()
+
+    def run(self):
+        while True:
+            self._wanted.wait()
+            if self._stopped:
+                return
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples.append((time.perf_counter(), _stack(frame)))
+            del frame
+            time.sleep(self.interval)
+
+    def collapsed(self, start: float, end: float) -> Counter:
+        return Counter(stack for t, stack in list(self.samples) if start <= t <= end)
+
+
+def profiled_call(ref: str, args: tuple, kwargs: dict, interval: float = SAMPLE_INTERVAL):
+    """Worker side of run_cpu for a profiled update: core.workers._call plus its collapsed samples."""
+    from core.workers import _call
+
+    sampler = Sampler(threading.get_ident(), interval)
+    sampler.start()
+    sampler.acquire()
+    start = time.perf_counter()
+    try:
+        outcome = _call(ref, args, kwargs)
+    finally:
+        sampler.release()
+        sampler.close()
+    return outcome, dict(sampler.collapsed(start, time.perf_counter()))
+
+
+def save_trace(record: dict, out_dir: Path = TRACE_DIR) -> Path:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    path = out_dir / f"{stamp}_{record['handler']}_{record['user_id']}.json"
+    with open(path, "w") as f:
+        json.dump(record, f, indent=1)
+    return path
+
+
+def folded(record: dict, part: str = "all") -> Counter:
+    """Collapsed stacks of a saved trace; worker stacks are prefixed with "worker;"."""
+    stacks = Counter()
+    if part in ("all", "loop"):
+        stacks.update(record["loop_samples"])
+    if part in ("all", "worker"):
+        stacks.update({f"worker;{stack}": n for stack, n in record["worker_samples"].items()})
+    return stacks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print saved traces as collapsed stacks (flamegraph.pl input)")
+    parser.add_argument("traces", nargs="+", help="trace JSON files; several are merged")
+    parser.add_argument("--part", choices=("all", "loop", "worker"), default="all")
+    args = parser.parse_args()
+
+    total = Counter()
+    for path in args.traces:
+        with open(path) as f:
+            total.update(folded(json.load(f), args.part))
+    for stack, n in total.most_common():
+        print(f"{stack} {n}")
+
+
+if __name__ == "__main__":
+    main()
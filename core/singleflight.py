@@ -0,0 +1,31 @@
+"""
+Single-flight coalescing of identical in-flight work.
+
+Callers with the same key share one running computation instead of each
+starting their own; the first caller starts it and later ones await the
+same result. The computation runs as its own task, so a cancelled caller
+does not cancel it for the others.
+"""
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Task] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        """Await fn() — or the already running call for `key` — and return its result (or raise its error)."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._calls.pop(key) if self._calls.get(key) is done else None)
+        return await asyncio.shield(task)
+
+
+# /analyze and /correlation: keyed by (kind, experiment, target or mode, data_version)
+analysis_flights = SingleFlight()
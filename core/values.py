@@ -0,0 +1,17 @@
+import math
+
+
+def to_number(value) -> float | None:
+    """
+    Convert a raw DailyEntry value to a number: "+"/"-" → 1/0, numbers and
+    numeric strings → float. Anything else (empty, free text, NaN, ±inf) → None.
+    """
+    if value == "+":
+        return 1.0
+    if value == "-":
+        return 0.0
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None  # NaN and "inf" count as missing
@@ -0,0 +1,79 @@
+"""
+Process pool for the CPU-heavy analysis work.
+
+The bot process never imports pandas/statsmodels/matplotlib itself: jobs are
+submitted by dotted "module:function" reference (as in APScheduler job
+refs) and resolved inside the workers, which import the analytics stack
+once in their initializer. That keeps bot startup light and keeps fits and
+renders off the event loop.
+"""
+import asyncio
+import importlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from core import metrics, profiling
+
+# Modules every worker imports up front, so the first /analyze doesn't pay for them
+PREWARM_MODULES = ("core.analysis",)
+MAX_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def _init_worker(modules: tuple[str, ...]) -> None:
+    for name in modules:
+        importlib.import_module(name)
+
+
+def _resolve(ref: str):
+    module, _, attr = ref.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+def _call(ref: str, args: tuple, kwargs: dict):
+    # wall-clock timestamps, comparable with the submitting process, for the queue-wait metric
+    started = time.time()
+    result = _resolve(ref)(*args, **kwargs)
+    return started, time.time(), result
+
+
+def _noop() -> None:
+    return None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, initializer=_init_worker, initargs=(PREWARM_MODULES,))
+    return _pool
+
+
+def prewarm() -> None:
+    """Start every worker now (each runs the imports in its initializer) instead of on the first request."""
+    pool = get_pool()
+    for future in [pool.submit(_noop) for _ in range(MAX_WORKERS)]:
+        future.result()
+
+
+async def run_cpu(ref: str, *args, **kwargs):
+    """Run "module:function"(*args, **kwargs) in the worker pool and await its result."""
+    loop = asyncio.get_running_loop()
+    submitted = time.time()
+    trace = profiling.current_trace.get()
+    if trace is None:
+        started, finished, result = await loop.run_in_executor(get_pool(), _call, ref, args, kwargs)
+    else:
+        (started, finished, result), samples = await loop.run_in_executor(
+            get_pool(), profiling.profiled_call, ref, args, kwargs)
+        trace.worker_samples.update(samples)
+    metrics.record_executor_job(ref, submitted, started, finished)
+    return result
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
@@ -1,11 +1,13 @@
 import asyncio
 import logging
-from core.database.models import async_main
+from core.database.models import async_main, engine
 
 from aiogram import Bot, Dispatcher
 
 from bot.handlers.handlers import router
-from bot.daily_reminder import make_scheduler
+from bot.daily_reminder import start_scheduler
+from bot.middlewares import setup_admission, setup_metrics, setup_profiling, setup_query_audit
+from core import metrics, workers
 from config import TOKEN
 
 
@@ -16,11 +18,25 @@ dp = Dispatcher()
 async def main():
     await async_main()
     dp.include_router(router)
+    setup_metrics(dp, router, bot, engine)
+    setup_profiling(dp, router)
+    setup_query_audit(dp, router, engine)
+    setup_admission(router)
+    metrics_runner = await metrics.serve()
 
-    scheduler = make_scheduler(bot)
-    scheduler.start()
+    # analysis workers import pandas/statsmodels/matplotlib in the background, not on the startup path
+    asyncio.get_running_loop().run_in_executor(None, workers.prewarm)
 
-    await dp.start_polling(bot)
+    # runs the jobs only while this instance holds the leader lock
+    scheduler, election = await start_scheduler(bot, engine)
+
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await election.stop()
+        scheduler.shutdown(wait=False)
+        workers.shutdown()
+        await metrics_runner.cleanup()
 
 
 if __name__ =='__main__':
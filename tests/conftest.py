@@ -0,0 +1,57 @@
+import json
+import os
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.engine import Engine
+
+from core.database import query_audit
+from core.database.models import Base, make_engine
+
+# every engine a test creates, including ones built inside fixtures
+query_audit.install(Engine)
+
+_reports = {}
+
+# SQLite file in the test's tmp dir by default; set TEST_DATABASE_URL to run against Postgres
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+
+@pytest_asyncio.fixture
+async def db_engine(tmp_path):
+    engine = make_engine(TEST_DATABASE_URL or f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", echo=False)
+    async with engine.begin() as conn:
+        # Ensure clean slate
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+
+    # teardown: drop all tables to clean up
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def _query_scope(request):
+    """Per-test query report: statement count and time, plus statement shapes repeated REPEAT_THRESHOLD+ times."""
+    with query_audit.query_scope(request.node.nodeid) as scope:
+        yield
+    if scope.statements:
+        _reports[request.node.nodeid] = scope.summary()
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    if not _reports:
+        return
+    path = config.rootpath / ".pytest_cache" / "query_report.json"
+    path.parent.mkdir(exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(_reports, f, indent=2)
+
+    terminalreporter.section("SQL per test")
+    for nodeid, report in _reports.items():
+        terminalreporter.write_line(f"{report['statements']:5d} stmts {report['seconds'] * 1000:8.1f} ms  {nodeid}")
+        for row in report["repeated"]:
+            terminalreporter.write_line(f"      N+1? {row['count']}× {row['sql'][:120]}", yellow=True)
+    terminalreporter.write_line(f"full report: {path}")
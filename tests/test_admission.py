@@ -0,0 +1,126 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+from benchmarks.load import FakeSession
+from bot.middlewares import STILL_COMPUTING, AdmissionControl
+from core.admission import Admission
+from core.singleflight import SingleFlight
+
+
+def test_token_bucket_per_user():
+    admission = Admission(concurrency=1, max_queue=1, burst=4, refill_per_second=1 / 60)
+    assert admission.take(1, 2) == 0
+    assert admission.take(1, 2) == 0
+    # empty: about a minute per missing token
+    assert admission.take(1, 2) == pytest.approx(120, abs=1)
+    assert admission.take(2, 2) == 0
+
+
+@pytest.mark.asyncio
+async def test_slots_queue_then_busy():
+    admission = Admission(concurrency=1, max_queue=1, burst=10, refill_per_second=1)
+    release = asyncio.Event()
+
+    async def hold():
+        async with admission.slot("test"):
+            await release.wait()
+
+    first = asyncio.create_task(hold())
+    second = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    assert admission.waiting == 1 and admission.busy()
+
+    release.set()
+    await asyncio.gather(first, second)
+    assert admission.waiting == 0 and not admission.busy()
+
+
+class RecordingSession(FakeSession):
+    """FakeSession that also keeps the text of every callback answer and message sent."""
+
+    def __init__(self):
+        super().__init__()
+        self.texts = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.texts.append(getattr(method, "text", None))
+        return await super().make_request(bot, method, timeout)
+
+
+def _tap(uid: int, update_id: int, data: str) -> Update:
+    user = User(id=uid, is_bot=False, first_name="Tap")
+    message = Message(message_id=1, date=datetime.now(), chat=Chat(id=uid, type="private"), from_user=user, text="menu")
+    query = CallbackQuery(id=str(update_id), from_user=user, chat_instance=str(uid), message=message, data=data)
+    return Update(update_id=update_id, callback_query=query)
+
+
+# — a tap joining a computation already in flight costs neither tokens nor a slot ——————
+@pytest.mark.asyncio
+async def test_coalesced_tap_is_free():
+    admission = Admission(concurrency=1, max_queue=5, burst=4, refill_per_second=1e-6)
+    flights = SingleFlight()
+    release = asyncio.Event()
+    runs = []
+
+    async def flight_key(query, state):
+        return ("probe", query.data)
+
+    router = Router()
+
+    @router.callback_query(flags={"cost": 2, "flight": flight_key})
+    async def probe(query: CallbackQuery, flight_key: tuple):
+        runs.append(flight_key)
+        await query.answer()
+        await flights.do(flight_key, release.wait)
+
+    router.callback_query.middleware(AdmissionControl(admission, flights))
+    dp = Dispatcher()
+    dp.include_router(router)
+    session = RecordingSession()
+    bot = Bot(token="42:ADMISSION-TEST", session=session)
+
+    first = asyncio.create_task(dp.feed_update(bot, _tap(7, 1, "chart")))
+    while not flights.in_flight(("probe", "chart")):
+        await asyncio.sleep(0)
+    # the only slot is held; without the exemption these would queue behind it and spend tokens
+    for update_id in (2, 3, 4):
+        await asyncio.wait_for(dp.feed_update(bot, _tap(7, update_id, "chart")), 1)
+    assert session.texts.count(STILL_COMPUTING) == 3
+    release.set()
+    await first
+
+    assert runs == [("probe", "chart")]
+    assert admission.take(7, 2) == 0  # 4 tokens - 2 for the first tap
+    assert admission.take(7, 2) > 0
+
+
+# — a failing worker gets a short reply instead of silence ——————————————————————
+@pytest.mark.asyncio
+async def test_worker_error_is_answered(monkeypatch):
+    from bot.handlers import correlation
+
+    async def broken(*args):
+        raise ZeroDivisionError("no features")
+
+    monkeypatch.setattr(correlation.precompute, "correlation_result", broken)
+    sent, cleared = [], []
+    query = SimpleNamespace(data="corr_mode:same", from_user=SimpleNamespace(id=7),
+                            answer=_async(lambda *a, **k: None),
+                            message=SimpleNamespace(edit_text=_async(lambda text, **k: sent.append(text))))
+    state = SimpleNamespace(clear=_async(lambda: cleared.append(True)))
+
+    await correlation.choose_mode(query, state, flight_key=("correlation", 1, "same", 3))
+
+    assert sent and sent[0].startswith("⚠️")
+    assert cleared
+
+
+def _async(fn):
+    async def call(*args, **kwargs):
+        return fn(*args, **kwargs)
+    return call
@@ -0,0 +1,70 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from core.analysis import CAPTION_LIMIT, correlation_report, regression_report
+from core.database.models import ParamType
+
+PNG = b"\x89PNG\r\n\x1a\n"
+PARAM_TYPES = {"mood": ParamType.NUMERIC, "sleep": ParamType.NUMERIC, "vitamins": ParamType.BOOLEAN,
+               "stress": ParamType.CLASS, "coffee": ParamType.NUMERIC}
+
+
+@pytest.fixture
+def rows():
+    """40 days where sleep drives mood and stress, with a few skipped entries."""
+    rng = np.random.default_rng(2)
+    out = []
+    for day in range(40):
+        sleep = rng.normal(7, 1)
+        data = {
+            "sleep": round(sleep, 1),
+            "vitamins": "+" if rng.random() < 0.5 else "-",
+            "coffee": int(rng.integers(0, 4)),
+            "mood": round(2 * sleep + rng.normal(0, 1), 1),
+            "stress": int(np.clip(round(10 - sleep + rng.normal(0, 0.7)), 1, 5)),
+        }
+        if day % 7 == 3:
+            del data["coffee"]
+        out.append((date(2024, 1, 1) + timedelta(days=day), data))
+    return out
+
+
+# — /analyze pipeline end to end: one PNG, a caption Telegram accepts, the stored tables ——
+@pytest.mark.parametrize("target, model", [("mood", "ols"), ("stress", "ordinal_logit")])
+def test_regression_report(rows, target, model):
+    payload, png = regression_report(rows, PARAM_TYPES, target)
+
+    assert png.startswith(PNG)
+    assert payload["model"] == model
+    assert payload["tables"] and all(isinstance(t, str) for t in payload["tables"])
+    assert len(payload["caption"]) <= CAPTION_LIMIT
+    assert payload["caption"].startswith(f"🎯 {target}")
+    assert "sleep" in payload["caption"]  # the one real effect is reported as significant
+
+
+# — /correlation default view on sparse entries still gets intervals and stars ——————
+def test_correlation_report(rows):
+    payload, png = correlation_report(rows, PARAM_TYPES, ["mood"])
+
+    assert png.startswith(PNG)
+    assert len(payload["caption"]) <= CAPTION_LIMIT
+    assert "bootstrap CI" in payload["caption"]
+    assert set(payload["matrices"]) == {"pearson", "counts"}
+
+
+# — no usable feature (a constant one, or only the goal): a mean-only model instead of a crash ——
+@pytest.mark.parametrize("ptype", [ParamType.NUMERIC, ParamType.CLASS])
+@pytest.mark.parametrize("extra", [{"sleep": 7}, {}])
+def test_regression_report_without_usable_features(ptype, extra):
+    rows = [(date(2024, 1, 1) + timedelta(days=d), {"mood": d % 5 + 1, **extra}) for d in range(15)]
+    types = {"mood": ptype, "sleep": ParamType.NUMERIC}
+
+    payload, png = regression_report(rows, types, "mood")
+
+    assert png.startswith(PNG)
+    assert payload["tables"]
+    assert "No feature is significant" in payload["caption"]
+    if ptype == ParamType.NUMERIC:
+        assert payload["selected_features"] == []
@@ -0,0 +1,59 @@
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import core.database.requests as rq
+from bot.handlers.enter_data import invalid_value
+from core import anomaly
+from core.database.models import ParamType
+from core.values import to_number
+
+
+@pytest.fixture(autouse=True)
+def override_sessionmaker(monkeypatch, db_engine):
+    monkeypatch.setattr("core.database.requests.async_session", async_sessionmaker(db_engine, expire_on_commit=False))
+
+
+# — the upsert keeps the same running mean/variance as the reference update() ——
+@pytest.mark.asyncio
+async def test_stats_follow_entries_and_flag_outliers():
+    await rq.add_user(55, "anomaly", 550)
+    exp = await rq.add_experiment(55, "sleep")
+    sleep = [7.0, 6.5, 8.0, 7.5, 6.0, 7.0, 7.2, 6.8, 7.9, 7.1, 6.4, 7.3]
+    count, mean, var = 0, 0.0, 0.0
+    for day, hours in enumerate(sleep):
+        await rq.add_daily_entry(55, exp.id, date(2024, 1, 1) + timedelta(days=day),
+                                 {"sleep": hours, "vitamins": "+", "note": "fine"})
+        count, mean, var = anomaly.update(count, mean, var, hours)
+    # a replaced day does not count twice
+    await rq.add_daily_entry(55, exp.id, date(2024, 1, 1), {"sleep": 7.0, "vitamins": "+"})
+
+    stats = await rq.get_parameter_stats(exp.id)
+    assert set(stats) == {"sleep", "vitamins"}
+    assert stats["sleep"].count == len(sleep)
+    assert stats["sleep"].mean == pytest.approx(mean)
+    assert stats["sleep"].var == pytest.approx(var)
+
+    flagged = anomaly.outliers(stats, {"sleep": "75", "vitamins": "+", "note": "x"})
+    assert [o.name for o in flagged] == ["sleep"]
+    assert anomaly.outliers(stats, {"sleep": "8.5"}) == []
+
+
+# — non-finite input is refused at entry and ignored by the statistics ——————
+@pytest.mark.asyncio
+async def test_non_finite_values_are_rejected():
+    numeric = SimpleNamespace(type=ParamType.NUMERIC)
+    for text in ("inf", "-inf", "Infinity", "nan", "1e999"):
+        assert to_number(text) is None
+        assert invalid_value(numeric, text)
+    assert to_number("7.5") == 7.5 and invalid_value(numeric, "7.5") is None
+
+    await rq.add_user(56, "finite", 560)
+    exp = await rq.add_experiment(56, "sleep")
+    await rq.add_daily_entry(56, exp.id, date(2024, 1, 1), {"sleep": 7.0})
+    await rq.add_daily_entry(56, exp.id, date(2024, 1, 2), {"sleep": "inf"})
+    stats = await rq.get_parameter_stats(exp.id)
+    assert stats["sleep"].count == 1 and stats["sleep"].mean == 7.0
+    assert anomaly.outliers(stats, {"sleep": "inf"}) == []
@@ -0,0 +1,232 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.correlations import Сorrelation
+from core.correlation_kernels import (
+    batched_pearson,
+    batched_kendall,
+    bootstrap_distribution,
+    percentile_interval,
+    permutation_pvalues,
+    benjamini_hochberg,
+    lagged_pearson,
+    rolling_pearson,
+    pairwise_pearson,
+    pairwise_spearman,
+    pairwise_mutual_info,
+    distance_correlation,
+    bin_codes,
+)
+
+GOALS = ["mood", "productivity"]
+
+
+@pytest.fixture
+def lifestyle():
+    df = pd.read_csv("data/lifestyle_data_30_days.csv")
+    features = [c for c in df.columns if c not in GOALS]
+    return df, features
+
+
+# — Test 1: batched kernels agree with DataFrame.corr, with and without skipped entries ——
+@pytest.mark.parametrize("missing", [0.0, 0.3])
+@pytest.mark.parametrize("method, kernel", [("pearson", batched_pearson), ("kendall", batched_kendall)])
+def test_kernels_match_pandas(lifestyle, method, kernel, missing):
+    df, features = lifestyle
+    rng = np.random.default_rng(3)
+    df = df.astype(float).mask(rng.random(df.shape) < missing)
+    G = df[GOALS].to_numpy(dtype=float)[None]
+    F = df[features].to_numpy(dtype=float)[None]
+
+    expected = df.corr(method=method)[GOALS].drop(GOALS)
+    np.testing.assert_allclose(kernel(G, F)[0], expected.to_numpy(), atol=1e-10)
+
+
+# — Test 2: bootstrap is reproducible and the same with or without processes ——
+def test_bootstrap_parallel_matches_serial(lifestyle, monkeypatch):
+    df, features = lifestyle
+    G = df[GOALS].to_numpy(dtype=float)
+    F = df[features].to_numpy(dtype=float)
+
+    serial = bootstrap_distribution(G, F, n_boot=200, seed=7, n_jobs=1)
+    again = bootstrap_distribution(G, F, n_boot=200, seed=7, n_jobs=1)
+    np.testing.assert_array_equal(serial, again)
+    assert serial.shape == (200, len(features), len(GOALS))
+
+    monkeypatch.setattr("core.correlation_kernels.PARALLEL_MIN_WORK", 0)
+    parallel = bootstrap_distribution(G, F, n_boot=200, seed=7, n_jobs=2)
+    np.testing.assert_allclose(parallel, serial)
+
+
+# — Test 3: the interval brackets the point estimate ————————————
+def test_percentile_interval_brackets_estimate(lifestyle):
+    df, features = lifestyle
+    G = df[GOALS].to_numpy(dtype=float)
+    F = df[features].to_numpy(dtype=float)
+
+    lower, upper = percentile_interval(bootstrap_distribution(G, F, n_boot=500, seed=1, n_jobs=1))
+    r = batched_pearson(G[None], F[None])[0]
+    assert np.all(lower <= upper)
+    assert np.all((lower <= r) & (r <= upper))
+
+
+# — Test 4: permutation p-values separate a real effect from noise ———————
+def test_permutation_pvalues_and_early_stopping():
+    rng = np.random.default_rng(0)
+    n = 365
+    G = rng.normal(size=(n, 2))
+    F = rng.normal(size=(n, 5))
+    F[:, 0] += 0.5 * G[:, 0]
+
+    pvalues, used = permutation_pvalues(G, F, seed=1, max_perm=5000)
+    assert pvalues[0, 0] < 0.05 / pvalues.size
+    # noise cells that are clearly non-significant stop long before max_perm
+    assert used[2:, :].min() < 5000
+    assert np.all((pvalues > 0) & (pvalues <= 1))
+
+
+# — Test 5: Benjamini–Hochberg on a known example, NaN cells left alone ——————
+def test_benjamini_hochberg():
+    p = np.array([[0.01, 0.04], [0.03, np.nan]])
+    q = benjamini_hochberg(p)
+    np.testing.assert_allclose(q[~np.isnan(p)], [0.03, 0.04, 0.04])
+    assert np.isnan(q[1, 1])
+
+
+# — Test 6: lagged and rolling correlations agree with pandas, gaps included ————
+def test_lagged_and_rolling_match_pandas(lifestyle):
+    df, features = lifestyle
+    df = df.astype(float)
+    df.iloc[[3, 11, 12], :] = np.nan  # skipped days
+    G = df[GOALS].to_numpy()
+    F = df[features].to_numpy()
+
+    r, counts = lagged_pearson(G, F, max_lag=3)
+    for lag in range(4):
+        expected = [df["mood"].corr(df[f].shift(lag)) for f in features]
+        np.testing.assert_allclose(r[lag, :, 0], expected, atol=1e-10)
+    assert counts[0, 0, 0] == len(df) - 3
+
+    rolled = rolling_pearson(G, F, window=10, min_periods=5)
+    expected = df["productivity"].rolling(10, min_periods=5).corr(df["sleep_hours"]).to_numpy()[9:]
+    np.testing.assert_allclose(rolled[:, features.index("sleep_hours"), 1], expected, atol=1e-10)
+
+
+# — Test 7: pairwise-complete Pearson/Spearman match DataFrame.corr, with and without skipped entries ——
+@pytest.mark.parametrize("missing", [0.3, 0.0])
+@pytest.mark.parametrize("method, kernel", [("pearson", pairwise_pearson), ("spearman", pairwise_spearman)])
+def test_pairwise_kernels_match_pandas(lifestyle, method, kernel, missing):
+    df, features = lifestyle
+    rng = np.random.default_rng(3)
+    df = df.astype(float).mask(rng.random(df.shape) < missing)  # skipped parameters
+    G = df[GOALS].to_numpy()
+    F = df[features].to_numpy()
+
+    r, n = kernel(G, F)
+    expected = df.corr(method=method)[GOALS].drop(GOALS)
+    np.testing.assert_allclose(r, expected.to_numpy(), atol=1e-12)
+    overlap = [[(df[f].notna() & df[g].notna()).sum() for g in GOALS] for f in features]
+    np.testing.assert_array_equal(n, overlap)
+
+
+# — Test 8: mutual information and distance correlation match per-pair references and see a U-shape ——
+def test_nonlinear_kernels(monkeypatch):
+    rng = np.random.default_rng(5)
+    n = 120
+    G = rng.normal(size=(n, 2))
+    F = rng.normal(size=(n, 3))
+    F[:, 0] = G[:, 0] ** 2 + 0.1 * rng.normal(size=n)  # too little or too much: r ≈ 0
+    assert abs(pairwise_pearson(G, F)[0][0, 0]) < 0.3
+
+    sparse = np.where(rng.random(F.shape) < 0.2, np.nan, F)
+    mi, counts = pairwise_mutual_info(G, sparse)
+    fc, gc = bin_codes(sparse), bin_codes(G)
+    for i in range(3):
+        for j in range(2):
+            both = (fc[:, i] >= 0) & (gc[:, j] >= 0)
+            joint = pd.crosstab(fc[both, i], gc[both, j]).to_numpy() / both.sum()
+            outer = np.outer(joint.sum(axis=1), joint.sum(axis=0))
+            nz = joint > 0
+            bias = (nz.sum() - joint.shape[0] - joint.shape[1] + 1) / (2 * both.sum())
+            expected = max((joint[nz] * np.log(joint[nz] / outer[nz])).sum() - bias, 0.0)
+            assert mi[i, j] == pytest.approx(expected, abs=1e-12)
+            assert counts[i, j] == both.sum()
+    assert mi[0, 0] > 5 * mi[1:, :].max()
+
+    def centred(x):
+        a = np.abs(x[:, None] - x[None, :])
+        return a - a.mean(axis=0) - a.mean(axis=1)[:, None] + a.mean()
+
+    monkeypatch.setattr("core.correlation_kernels.DCOR_CHUNK_BYTES", 1)  # one row per block
+    dcor, _ = distance_correlation(G, F)
+    for i in range(3):
+        for j in range(2):
+            a, b = centred(F[:, i]), centred(G[:, j])
+            assert dcor[i, j] == pytest.approx(np.sqrt((a * b).mean() / np.sqrt((a * a).mean() * (b * b).mean())))
+    assert dcor[0, 0] > 0.4
+
+    # sparse: every pair over its own overlapping days, none left empty
+    dcor, counts = distance_correlation(G, sparse)
+    for i in range(3):
+        for j in range(2):
+            both = ~np.isnan(sparse[:, i])
+            a, b = centred(sparse[both, i]), centred(G[both, j])
+            assert dcor[i, j] == pytest.approx(np.sqrt((a * b).mean() / np.sqrt((a * a).mean() * (b * b).mean())))
+            assert counts[i, j] == both.sum()
+
+
+# — Test 9: intervals and p-values on sparse data, where hardly a day is complete ————————
+@pytest.mark.parametrize("method", ["pearson", "kendall"])
+def test_pairwise_intervals_without_complete_days(method):
+    rng = np.random.default_rng(11)
+    n, p = 40, 18
+    values = rng.normal(size=(n, p))
+    values[:, 1] += 1.5 * values[:, 0]  # feature x1 drives the goal x0
+    df = pd.DataFrame(values, columns=[f"x{i}" for i in range(p)]).mask(rng.random((n, p)) < 0.3)
+    assert len(df.dropna()) <= 1
+
+    lower, upper = Сorrelation.bootstrap_ci(df, ["x0"], method=method, n_boot=300, seed=1)
+    pvalues, qvalues = Сorrelation.permutation_test(df, ["x0"], method=method, seed=1)
+
+    assert lower.notna().all().all() and upper.notna().all().all()
+    assert np.all(lower.to_numpy() <= upper.to_numpy())
+    assert lower.at["x1", "x0"] > 0.3
+    assert qvalues.at["x1", "x0"] < 0.05
+    assert pvalues.drop("x1").min().min() > 0.001
+
+
+# — Test 10: values far from zero (a weight of 1e8 ± 1) give the same r as centred ones ——————
+def test_pearson_kernels_with_large_offset():
+    rng = np.random.default_rng(13)
+    n = 60
+    G = rng.normal(size=(n, 2))
+    F = rng.normal(size=(n, 3))
+    F[:, 0] += 0.7 * G[:, 0]
+    G[rng.random(G.shape) < 0.2] = np.nan
+    F[rng.random(F.shape) < 0.2] = np.nan
+
+    r, _ = pairwise_pearson(G, F)
+    rolled = rolling_pearson(G, F, window=14)
+    batched = batched_pearson(G[None], F[None])[0]
+    G_far, F_far = G + 1e8, F + 1e8
+
+    np.testing.assert_allclose(pairwise_pearson(G_far, F_far)[0], r, atol=1e-6)
+    np.testing.assert_allclose(rolling_pearson(G_far, F_far, window=14), rolled, atol=1e-6)
+    np.testing.assert_allclose(batched_pearson(G_far[None], F_far[None])[0], batched, atol=1e-6)
+    np.testing.assert_allclose(lagged_pearson(G_far, F_far, max_lag=2)[0], lagged_pearson(G, F, max_lag=2)[0],
+                               atol=1e-6)
+
+
+# — Test 11: permutations that leave a pair too few days are not counted as "not exceeding" ——
+def test_permutation_pvalues_skip_undefined_statistics():
+    n = 12
+    G = np.full((n, 1), np.nan)
+    F = np.full((n, 1), np.nan)
+    G[:6, 0] = [1, 2, 3, 4, 5, 6]
+    F[3:9, 0] = [1, 2, 3, 5, 4, 6]  # 3 overlapping days, fewer after most permutations
+
+    pvalues, used = permutation_pvalues(G, F, seed=2, batch=100, min_perm=1000, max_perm=1000)
+
+    assert 0 < used[0, 0] < 1000
+    assert pvalues[0, 0] >= 1 / (used[0, 0] + 1)
@@ -1,59 +1,50 @@
+import asyncio
 import pytest
-import pytest_asyncio
-from datetime import date
+from datetime import date, timedelta
 from sqlalchemy import text
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
-from config import DATABASE_URL
-from core.database.models import Base
 import core.database.requests as requests
+from core.database.models import ParamType
 from core.database.requests import add_user, get_user
 
+
+# --- patch async_session so the request layer uses the test engine ---
+@pytest.fixture(autouse=True)
+def override_sessionmaker(monkeypatch, db_engine):
+    monkeypatch.setattr("core.database.requests.async_session", async_sessionmaker(db_engine, expire_on_commit=False))
+
+
+async def _experiment(uid: int, username: str) -> int:
+    await requests.add_user(uid, username, uid * 10)
+    exp = await requests.add_experiment(uid, "test experiment")
+    return exp.id
+
+
 @pytest.mark.asyncio
-async def test_postgres_connection():
+async def test_connection(db_engine):
     """
-    Can we connect to Postgres and run a trivial query?
+    Can we connect to the database and run a trivial query?
     """
-    engine = create_async_engine(DATABASE_URL, echo=False)
-    try:
-        async with engine.connect() as conn:
-            result = await conn.execute(text("SELECT 1"))
-            assert result.scalar_one() == 1
-    finally:
-        await engine.dispose()
-
-
-# --- Async fixture: engine + clean schema for user tests ---
-@pytest_asyncio.fixture
-async def pg_engine():
-    engine = create_async_engine(DATABASE_URL, echo=False)
-    # Create tables once before any tests in this module
-    async with engine.begin() as conn:
-        # Ensure clean slate for users table
-        await conn.run_sync(Base.metadata.drop_all)
-        await conn.run_sync(Base.metadata.create_all)
-    yield engine
-
-    # teardown: drop all tables to clean up
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-    # finally dispose the engine
-
-    await engine.dispose()
-
-# --- Sync fixture: patch async_session to use our test engine ---
-@pytest.fixture(autouse=True)
-def override_sessionmaker(monkeypatch, pg_engine):
-    TestSession = sessionmaker(pg_engine, class_=AsyncSession, expire_on_commit=False)
-    # patch the session factory in your requests module
-    monkeypatch.setattr("data.requests.async_session", TestSession)
+    async with db_engine.connect() as conn:
+        result = await conn.execute(text("SELECT 1"))
+        assert result.scalar_one() == 1
+
+
+@pytest.mark.asyncio
+async def test_sqlite_pragmas(db_engine):
+    if db_engine.dialect.name != "sqlite":
+        pytest.skip("SQLite only")
+    async with db_engine.connect() as conn:
+        assert (await conn.execute(text("PRAGMA journal_mode"))).scalar_one() == "wal"
+        assert (await conn.execute(text("PRAGMA foreign_keys"))).scalar_one() == 1
+
 
 # —————————————————————————————
 # Step 2 Test: add_user & get_user
 # —————————————————————————————
 @pytest.mark.asyncio
-async def test_add_and_get_user(pg_engine):
+async def test_add_and_get_user(db_engine):
     # 1) No user at first:
     assert await get_user(9999) is None
 
@@ -71,7 +62,7 @@ async def test_add_and_get_user(pg_engine):
     # 4) Calling add_user again with same tg_id shouldn't raise or create duplicates
     await add_user(tg_id, "testuser", 12345)
     # Verify still only one row in users table:
-    async with pg_engine.connect() as conn:
+    async with db_engine.connect() as conn:
         result = await conn.execute(text("SELECT count(*) FROM users"))
         assert result.scalar_one() == 1
 
@@ -87,7 +78,7 @@ async def test_no_daily_entries_for_new_user():
 @pytest.mark.asyncio
 async def test_add_and_get_all_daily_entries():
     uid = 1001
-    await requests.add_user(uid, "daily_all", 111)
+    exp_id = await _experiment(uid, "daily_all")
     today = date.today()
     payload = {
         "sleep_hours": 6.5,
@@ -98,12 +89,13 @@ async def test_add_and_get_all_daily_entries():
         "vitamins": 1,
         "productivity": 4
     }
-    await requests.add_daily_entry(uid, today, payload)
+    await requests.add_daily_entry(uid, exp_id, today, payload)
 
     all_entries = await requests.get_daily_entries_for_user(uid)
     assert len(all_entries) == 1
     entry = all_entries[0]
     assert entry.user_id == uid
+    assert entry.experiment_id == exp_id
     assert entry.entry_date == today
     assert entry.data == payload
 
@@ -112,10 +104,10 @@ async def test_add_and_get_all_daily_entries():
 @pytest.mark.asyncio
 async def test_get_daily_entry_by_exact_date():
     uid = 1002
-    await requests.add_user(uid, "daily_exact", 222)
+    exp_id = await _experiment(uid, "daily_exact")
     target_date = date.today()
     payload = {"foo": "bar"}
-    await requests.add_daily_entry(uid, target_date, payload)
+    await requests.add_daily_entry(uid, exp_id, target_date, payload)
 
     fetched = await requests.get_daily_entry_by_date(uid, target_date)
     assert fetched is not None
@@ -135,18 +127,125 @@ async def test_get_daily_entry_missing_date():
     assert fetched is None
 
 
-# — Test 5: raw SQL count for daily_entries ————————————————
+# — Test 5: a second entry for the same day replaces the first and bumps data_version ——
 @pytest.mark.asyncio
-async def test_raw_sql_count_daily_entries(pg_engine):
+async def test_add_daily_entry_upserts(db_engine):
     uid = 1004
-    await requests.add_user(uid, "daily_count", 444)
+    exp_id = await _experiment(uid, "daily_count")
     d = date.today()
-    pl = {"a": 1}
-    await requests.add_daily_entry(uid, d, pl)
+    await requests.add_daily_entry(uid, exp_id, d, {"a": 1})
+    await requests.add_daily_entry(uid, exp_id, d, {"a": 2})
 
-    async with pg_engine.connect() as conn:
+    async with db_engine.connect() as conn:
         result = await conn.execute(
             text("SELECT count(*) FROM daily_entries WHERE user_id = :uid"),
             {"uid": uid}
         )
-        assert result.scalar_one() == 1
\ No newline at end of file
+        assert result.scalar_one() == 1
+    assert (await requests.get_daily_entry_by_all_conditions(uid, exp_id, d)).data == {"a": 2}
+    assert await requests.get_data_version(exp_id) == 2
+
+
+# — Test 6: rollups and streak are maintained on write and match a full rebuild ——
+@pytest.mark.asyncio
+async def test_rollups_follow_entries():
+    uid = 1005
+    exp_id = await _experiment(uid, "rollups")
+    monday = date(2024, 1, 1)
+    await requests.add_daily_entry(uid, exp_id, monday, {"mood": 4, "note": "ok"})
+    await requests.add_daily_entry(uid, exp_id, monday + timedelta(days=1), {"mood": 2, "sport": "+"})
+    await requests.add_daily_entry(uid, exp_id, monday + timedelta(days=3), {"mood": 5})
+    # a replaced day is recomputed, a back-filled one joins the two runs
+    await requests.add_daily_entry(uid, exp_id, monday + timedelta(days=1), {"mood": 3, "sport": "-"})
+    await requests.add_daily_entry(uid, exp_id, monday + timedelta(days=2), {"mood": 1})
+
+    def as_dict(rollups):
+        return {(r.period, r.period_start, r.parameter): (r.count, r.total, r.total_sq, r.min_value, r.max_value)
+                for r in rollups}
+
+    incremental = as_dict(await requests.get_rollups(exp_id, monday, monday))
+    assert incremental[("week", monday, "mood")] == (4, 13.0, 51.0, 1.0, 5.0)
+    assert incremental[("month", monday, "sport")] == (1, 0.0, 0.0, 0.0, 0.0)
+    assert not any(key[2] == "note" for key in incremental)
+    exp = await requests.get_experiment(exp_id)
+    assert (exp.streak, exp.best_streak, exp.last_entry_date) == (4, 4, monday + timedelta(days=3))
+
+    await requests.rebuild_rollups(exp_id)
+    assert as_dict(await requests.get_rollups(exp_id, monday, monday)) == incremental
+
+
+# — Test 7: merge=True adds to the day's values instead of replacing them ——
+@pytest.mark.asyncio
+async def test_add_daily_entry_merge():
+    uid = 1006
+    exp_id = await _experiment(uid, "daily_merge")
+    d = date.today()
+    await requests.add_daily_entry(uid, exp_id, d, {"a": 1, "b": 2})
+    await requests.add_daily_entry(uid, exp_id, d, {"b": 3, "c": 4}, merge=True)
+    assert (await requests.get_daily_entry_by_all_conditions(uid, exp_id, d)).data == {"a": 1, "b": 3, "c": 4}
+    # "c" is new to the day and counts; the replaced "b" does not count twice
+    stats = await requests.get_parameter_stats(exp_id)
+    assert {name: s.count for name, s in stats.items()} == {"a": 1, "b": 1, "c": 1}
+
+
+# — Test 8: the daily reminder goes to users without today's entry, found in one query ——
+@pytest.mark.asyncio
+async def test_remind_missing_entries(monkeypatch):
+    from bot import daily_reminder
+    today = date.today()
+    done = await _experiment(1007, "entered_today")
+    late = await _experiment(1008, "entered_yesterday")
+    await requests.add_user(1009, "no_experiment", 10090)
+    await requests.add_daily_entry(1007, done, today, {"a": 1})
+    await requests.add_daily_entry(1008, late, today - timedelta(days=1), {"a": 1})
+
+    assert [u.tg_id for u in await requests.get_users_without_entry(today)] == [1008, 1009]
+
+    class FakeBot:
+        sent = []
+
+        async def send_message(self, chat_id, text):
+            self.sent.append(chat_id)
+
+    monkeypatch.setattr(daily_reminder, "_bot", FakeBot())
+    monkeypatch.setattr(daily_reminder, "_election", None)
+    await daily_reminder.remind_missing_entries()
+    assert FakeBot.sent == [10080, 10090]
+
+
+# — Test 9: cached parameters follow add_parameter at once and other writers within the TTL ——
+@pytest.mark.asyncio
+async def test_cached_parameters_expire(db_engine, monkeypatch):
+    exp_id = await _experiment(1010, "cached")
+    await requests.add_parameter(1010, "mood", True, ParamType.NUMERIC, exp_id)
+    assert [p.name for p in await requests.get_cached_parameters(exp_id)] == ["mood"]
+
+    await requests.add_parameter(1010, "sleep", False, ParamType.NUMERIC, exp_id)
+    assert [p.name for p in await requests.get_cached_parameters(exp_id)] == ["mood", "sleep"]
+
+    # another instance adds one: this process keeps its copy until the entry expires
+    async with db_engine.begin() as conn:
+        await conn.execute(
+            text("INSERT INTO parameters (user_id, experiment_id, name, is_goal, type) "
+                 "VALUES (1010, :exp, 'sport', false, 'NUMERIC')"), {"exp": exp_id})
+    assert len(await requests.get_cached_parameters(exp_id)) == 2
+    monkeypatch.setattr(requests, "PARAMETER_CACHE_TTL", 0.0)
+    assert [p.name for p in await requests.get_cached_parameters(exp_id)] == ["mood", "sleep", "sport"]
+
+
+# — Test 10: concurrent submits of the same day count it once ——————————————————
+@pytest.mark.asyncio
+async def test_concurrent_entries_count_once(db_engine):
+    if db_engine.dialect.name != "postgresql":
+        pytest.skip("needs Postgres row locks (set TEST_DATABASE_URL)")
+    uid = 1011
+    exp_id = await _experiment(uid, "concurrent")
+    d = date.today()
+    await asyncio.gather(*(requests.add_daily_entry(uid, exp_id, d, {"mood": 4}) for _ in range(5)))
+
+    stats = await requests.get_parameter_stats(exp_id)
+    assert stats["mood"].count == 1
+    rollups = await requests.get_rollups(exp_id, d - timedelta(days=7), d - timedelta(days=31))
+    assert {r.period: r.count for r in rollups} == {"week": 1, "month": 1}
+    exp = await requests.get_experiment(exp_id)
+    assert (exp.streak, exp.best_streak) == (1, 1)
@@ -0,0 +1,75 @@
+import itertools
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.api as sm
+
+from core.feature_selection import MIN_ROWS_PER_FEATURE, best_subsets
+
+
+@pytest.fixture
+def lifestyle():
+    df = pd.read_csv("data/lifestyle_data_45_days.csv")
+    return df.drop(columns=["mood"]), df["mood"]
+
+
+# — Test 1: branch and bound finds the same top models as brute force ——————
+@pytest.mark.parametrize("criterion", ["aic", "bic", "ebic", "adj_r2"])
+def test_best_subsets_match_brute_force(lifestyle, criterion):
+    X, y = lifestyle
+    p = X.shape[1]
+    fits = []
+    for k in range(1, min(p, len(y) // MIN_ROWS_PER_FEATURE) + 1):
+        for cols in itertools.combinations(X.columns, k):
+            m = sm.OLS(y, sm.add_constant(X[list(cols)])).fit()
+            ebic = m.bic + 2 * math.log(math.comb(p, min(k, p // 2)))
+            loss = {"aic": m.aic, "bic": m.bic, "ebic": ebic, "adj_r2": -m.rsquared_adj}[criterion]
+            fits.append((loss, list(cols), m))
+    fits.sort(key=lambda f: f[0])
+
+    result = best_subsets(X, y, criterion=criterion, top=3)
+    assert list(result["features"]) == [f[1] for f in fits[:3]]
+    best = fits[0][2]
+    assert result.loc[0, "aic"] == pytest.approx(best.aic)
+    assert result.loc[0, "bic"] == pytest.approx(best.bic)
+    assert result.loc[0, "adj_r2"] == pytest.approx(best.rsquared_adj)
+
+
+# — Test 2: parallel, serial and stepwise search recover a planted model ——————
+def test_parallel_and_stepwise_recover_signal():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(150, 16)), columns=[f"x{i}" for i in range(16)])
+    y = 2 * X["x1"] - X["x5"] + 0.8 * X["x9"] + rng.normal(scale=0.5, size=150)
+
+    serial = best_subsets(X, y, criterion="bic", n_jobs=1)
+    parallel = best_subsets(X, y, criterion="bic", n_jobs=2)
+    stepwise = best_subsets(X, y, criterion="bic", method="stepwise")
+
+    assert serial["features"][0] == ["x1", "x5", "x9"]
+    pd.testing.assert_frame_equal(serial, parallel)
+    assert stepwise["features"][0] == ["x1", "x5", "x9"]
+
+
+# — Test 3: pure noise on a short experiment does not buy a saturated model ——————
+@pytest.mark.parametrize("days", [10, 12, 15])
+@pytest.mark.parametrize("criterion", ["bic", "ebic"])
+def test_noise_on_short_experiment_selects_few_features(days, criterion):
+    for seed in range(5):
+        rng = np.random.default_rng(seed)
+        X = pd.DataFrame(rng.normal(size=(days, 19)), columns=[f"x{i}" for i in range(19)])
+        y = pd.Series(rng.normal(size=days))
+
+        result = best_subsets(X, y, criterion=criterion, top=1)
+
+        assert result["k"][0] <= 2
+        assert result["r2"][0] < 0.99
+
+
+# — Test 4: nothing to select still returns the usual columns ————————————
+def test_no_usable_feature_gives_empty_ranking():
+    y = pd.Series(np.arange(15) % 5, dtype=float)
+    for X in (pd.DataFrame({"sleep": np.full(15, 7.0)}), pd.DataFrame(index=y.index)):
+        result = best_subsets(X, y, criterion="ebic")
+        assert result.empty and "features" in result.columns
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+import pytest
+from apscheduler.schedulers.base import STATE_RUNNING
+from sqlalchemy import text
+
+from core.database.leader import LeaderElection
+
+
+def _election(db_engine, name, events):
+    return LeaderElection(db_engine, lambda: events.append(name), lambda: events.append(f"{name} out"), interval=0.05)
+
+
+@pytest.mark.asyncio
+async def test_single_node_is_always_leader(db_engine):
+    if db_engine.dialect.name == "postgresql":
+        pytest.skip("SQLite only: no lock to contend for")
+    events = []
+    first, second = _election(db_engine, "first", events), _election(db_engine, "second", events)
+    first.start()
+    second.start()
+    await asyncio.sleep(0.2)
+    try:
+        assert first.is_leader and second.is_leader
+        assert await first.confirm()
+    finally:
+        await first.stop()
+        await second.stop()
+
+
+@pytest.mark.asyncio
+async def test_one_leader_at_a_time(db_engine):
+    if db_engine.dialect.name != "postgresql":
+        pytest.skip("needs Postgres advisory locks (set TEST_DATABASE_URL)")
+    events = []
+    first, second = _election(db_engine, "first", events), _election(db_engine, "second", events)
+    first.start()
+    await asyncio.sleep(0.2)
+    second.start()
+    await asyncio.sleep(0.2)
+    try:
+        assert first.is_leader and not second.is_leader
+        assert await first.confirm() and not await second.confirm()
+
+        # the leader goes away: the other takes over
+        await first.stop()
+        await asyncio.sleep(0.2)
+        assert second.is_leader
+        assert events == ["first", "first out", "second"]
+
+        # the lock connection dies: the next pre-job confirmation steps down at once,
+        # without waiting for the election loop (stopped here, so it cannot get there first)
+        second._task.cancel()
+        pid = await second._conn.scalar(text("SELECT pg_backend_pid()"))
+        async with db_engine.connect() as conn:
+            await conn.execute(text("SELECT pg_terminate_backend(:pid)"), {"pid": pid})
+        assert not await second.confirm()
+        assert not second.is_leader and events[-1] == "second out"
+    finally:
+        await first.stop()
+        await second.stop()
+
+
+# — the elected instance stores the jobs (off the event loop) and resumes the scheduler ——
+@pytest.mark.asyncio
+async def test_scheduler_runs_on_the_leader(db_engine, monkeypatch):
+    from bot import daily_reminder
+
+    monkeypatch.setattr(daily_reminder, "_election", None)
+    stored_in = []
+    add_jobs = daily_reminder.add_jobs
+    monkeypatch.setattr(daily_reminder, "add_jobs",
+                        lambda scheduler: stored_in.append(threading.get_ident()) or add_jobs(scheduler))
+    scheduler, election = await daily_reminder.start_scheduler(None, db_engine)
+    try:
+        for _ in range(100):
+            if scheduler.state == STATE_RUNNING:
+                break
+            await asyncio.sleep(0.01)
+        assert election.is_leader and scheduler.state == STATE_RUNNING
+        assert {job.id for job in scheduler.get_jobs()} == set(daily_reminder.JOBS)
+        assert stored_in and threading.get_ident() not in stored_in
+    finally:
+        await election.stop()
+        scheduler.shutdown(wait=False)
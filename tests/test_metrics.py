@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Chat, Message, Update, User
+from sqlalchemy import text
+
+from benchmarks.load import FakeSession
+from bot.middlewares import setup_metrics
+from core import metrics
+
+
+def _series(exposition: str, prefix: str) -> dict[str, float]:
+    """Sample lines of the exposition text starting with `prefix`, as {series: value}."""
+    return {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+            for line in exposition.splitlines() if line.startswith(prefix)}
+
+
+# — one fake update through UpdateMetrics: handler time, SQL per update and Bot API calls ——
+@pytest.mark.asyncio
+async def test_update_metrics_exposition(db_engine):
+    router = Router()
+
+    @router.message()
+    async def metrics_probe(message: Message):
+        async with db_engine.connect() as conn:
+            for _ in range(3):
+                await conn.execute(text("SELECT 1"))
+        await message.answer("pong")
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    bot = Bot(token="42:METRICS-TEST", session=FakeSession())
+    setup_metrics(dp, router, bot, db_engine)
+    sent_before = _series(metrics.render(), 'telegram_api_seconds_count{method="SendMessage"}')
+
+    user = User(id=5, is_bot=False, first_name="Probe")
+    message = Message(message_id=1, date=datetime.now(), chat=Chat(id=5, type="private"), from_user=user, text="hi")
+    await dp.feed_update(bot, Update(update_id=1, message=message))
+    exposition = metrics.render()
+
+    assert "# TYPE bot_update_sql_statements histogram" in exposition
+    # 3 statements land in the le="3" bucket; buckets are cumulative
+    statements = _series(exposition, 'bot_update_sql_statements_')
+    label = 'handler="metrics_probe"'
+    assert statements[f'bot_update_sql_statements_bucket{{{label},le="2"}}'] == 0
+    assert statements[f'bot_update_sql_statements_bucket{{{label},le="3"}}'] == 1
+    assert statements[f'bot_update_sql_statements_bucket{{{label},le="+Inf"}}'] == 1
+    assert statements[f'bot_update_sql_statements_sum{{{label}}}'] == 3
+    assert statements[f'bot_update_sql_statements_count{{{label}}}'] == 1
+
+    assert _series(exposition, f'bot_handler_seconds_count{{{label}}}') == {f'bot_handler_seconds_count{{{label}}}': 1}
+    sql_seconds = _series(exposition, f'bot_update_sql_seconds_sum{{{label}}}')
+    assert 0 < sql_seconds[f'bot_update_sql_seconds_sum{{{label}}}'] < 5
+    sent = _series(exposition, 'telegram_api_seconds_count{method="SendMessage"}')
+    assert sum(sent.values()) == sum(sent_before.values()) + 1
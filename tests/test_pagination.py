@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import pytest
+
+import bot.keyboards as kb
+from bot.handlers.pagination import turn_page
+
+
+def _callbacks(rows):
+    return [[button.callback_data for button in row] for row in rows]
+
+
+def test_page_bounds_edges():
+    assert kb._page_bounds(0, 0) == (0, 1, 0)                                 # empty list: one empty page
+    assert kb._page_bounds(2 * kb.PAGE_SIZE, 1) == (1, 2, kb.PAGE_SIZE)       # exact multiple: no empty last page
+    assert kb._page_bounds(2 * kb.PAGE_SIZE, 5) == (1, 2, kb.PAGE_SIZE)       # out of range: clamped
+    assert kb._page_bounds(kb.PAGE_SIZE + 1, -3) == (0, 2, 0)
+
+
+def test_nav_row_edges():
+    assert kb._nav_row("e", 0, 1) == []
+    assert _callbacks(kb._nav_row("e", 0, 3)) == [[kb.PAGE_NOOP, "pg:e:1"]]
+    assert _callbacks(kb._nav_row("e", 1, 3)) == [["pg:e:0", kb.PAGE_NOOP, "pg:e:2"]]
+    assert _callbacks(kb._nav_row("e", 2, 3)) == [["pg:e:1", kb.PAGE_NOOP]]
+
+
+def test_page_of_edges():
+    items = [SimpleNamespace(id=i) for i in range(2 * kb.PAGE_SIZE)]
+    assert kb.page_of([], 3) == 0
+    assert kb.page_of(items, kb.PAGE_SIZE - 1) == 0
+    assert kb.page_of(items, kb.PAGE_SIZE) == 1
+    assert kb.page_of(items, 999) == 0
+
+
+# — a tap on an old parameter keyboard after the dialog ended gets an alert, not a KeyError ——
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["g", "v"])
+async def test_turn_page_after_state_cleared(kind):
+    answers = []
+
+    async def answer(text=None, show_alert=False):
+        answers.append((text, show_alert))
+
+    async def get_data():
+        return {}
+
+    query = SimpleNamespace(data=f"pg:{kind}:1", answer=answer)
+    await turn_page(query, SimpleNamespace(get_data=get_data))
+    assert len(answers) == 1 and answers[0][1] and "expired" in answers[0][0]
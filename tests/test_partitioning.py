@@ -0,0 +1,24 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from core.database import partitioning
+
+
+# — every per-user daily_entries statement of the request layer stays on one partition ——
+@pytest.mark.asyncio
+async def test_request_statements_are_pruned(db_engine):
+    if db_engine.dialect.name != "postgresql":
+        pytest.skip("needs the partitioned table (set TEST_DATABASE_URL)")
+    async with db_engine.connect() as conn:
+        async with conn.begin() as transaction:
+            report = await partitioning.check_pruning(conn, user_id=4242)
+            await transaction.rollback()
+        assert (await conn.execute(text("SELECT count(*) FROM experiments"))).scalar_one() == 0
+
+    functions = {name.split(" #")[0] for name in report}
+    assert functions == {name for name, _ in partitioning._request_calls(4242, date.today())}
+    assert {verdict for verdict, _ in report.values()} == {"ok", "routed", "all users"}
+    # the previous-row select, the upsert and the rollup / streak recounts of add_daily_entry
+    assert len([name for name in report if name.startswith("add_daily_entry (back-fill)")]) == 3
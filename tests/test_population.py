@@ -0,0 +1,67 @@
+import asyncio
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.database.models import DAILY_ENTRY_PARTITIONS, DailyEntry, Experiment, User
+from core.population import SufficientStats, _sources, compute_population_correlations
+
+
+# — merged partitions give DataFrame.corr's pairwise-complete matrix, even for large offsets ——
+def test_merged_partitions_match_pandas():
+    rng = np.random.default_rng(4)
+    n = 600
+    sleep = rng.normal(7, 1, n)
+    df = pd.DataFrame({
+        "sleep": sleep,
+        "mood": 2 * sleep + rng.normal(0, 1, n),
+        # a nearly constant large value: raw Σx² - (Σx)²/n loses every digit here
+        "steps": 1e6 + sleep * 1e-2 + rng.normal(0, 1e-2, n),
+        "vitamins": np.where(rng.random(n) < 0.5, "+", "-"),
+    })
+    rows = [{k: v for k, v in row.items() if random.Random(i).random() > 0.2}  # skipped entries
+            for i, row in enumerate(df.to_dict("records"))]
+
+    parts = [SufficientStats() for _ in range(4)]
+    for i, data in enumerate(rows):
+        parts[i % 4].update(data)
+    merged = SufficientStats()
+    for part in reversed(parts):
+        merged.merge(part)
+    whole = SufficientStats()
+    for data in rows:
+        whole.update(data)
+
+    expected = pd.DataFrame(rows).replace({"+": 1.0, "-": 0.0}).astype(float).corr()
+    corr, counts = merged.correlation(min_count=0)
+    pd.testing.assert_frame_equal(corr, expected.loc[corr.index, corr.columns], atol=1e-9)
+    pd.testing.assert_frame_equal(corr, whole.correlation(min_count=0)[0], atol=1e-9)
+    assert counts.loc["sleep", "mood"] == pd.DataFrame(rows)[["sleep", "mood"]].dropna().shape[0]
+
+
+# — the workers read every partition exactly once, and the result matches a single pass ——
+@pytest.mark.asyncio
+async def test_population_scan_reads_each_row_once(db_engine):
+    url = db_engine.url.render_as_string(hide_password=False)
+    if db_engine.dialect.name == "postgresql":
+        names = [t.name for part in range(3) for t in _sources(url, part, 3)]
+        assert sorted(names) == sorted(f"daily_entries_p{k}" for k in range(DAILY_ENTRY_PARTITIONS))
+
+    rng = np.random.default_rng(8)
+    rows = []
+    for uid in range(1, 6):
+        for day in range(40):
+            sleep = float(rng.normal(7, 1))
+            rows.append({"user_id": uid, "experiment_id": uid, "entry_date": date(2024, 1, 1) + timedelta(days=day),
+                         "data": {"sleep": sleep, "mood": 2 * sleep + float(rng.normal())}})
+    async with db_engine.begin() as conn:
+        await conn.execute(User.__table__.insert(), [{"tg_id": u, "username": f"u{u}"} for u in range(1, 6)])
+        await conn.execute(Experiment.__table__.insert(), [{"id": u, "user_id": u, "name": "e"} for u in range(1, 6)])
+        await conn.execute(DailyEntry.__table__.insert(), rows)
+
+    corr = await asyncio.to_thread(compute_population_correlations, 3, url, None)
+    expected = pd.DataFrame([r["data"] for r in rows]).corr()
+    assert corr.loc["mood", "sleep"] == pytest.approx(expected.loc["mood", "sleep"])
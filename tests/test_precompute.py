@@ -0,0 +1,118 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import core.database.requests as rq
+from core import precompute
+from core.database import query_audit
+from core.database.models import ParamType
+
+
+@pytest.fixture(autouse=True)
+def fake_workers(monkeypatch, db_engine):
+    """Request layer on the test engine; pipelines replaced by a stub that records its calls."""
+    monkeypatch.setattr("core.database.requests.async_session", async_sessionmaker(db_engine, expire_on_commit=False))
+    calls = []
+
+    async def run_cpu(ref, *args, **kwargs):
+        calls.append(ref)
+        return {"caption": ref, "summary": ref}, b"png"
+
+    monkeypatch.setattr("core.workers.run_cpu", run_cpu)
+    return calls
+
+
+async def _experiment_with_entries(days: int) -> int:
+    await rq.add_user(77, "precompute", 770)
+    exp = await rq.add_experiment(77, "nightly")
+    await rq.add_parameter(77, "mood", True, ParamType.NUMERIC, exp.id)
+    await rq.add_parameter(77, "sleep", False, ParamType.NUMERIC, exp.id)
+    for day in range(days):
+        await rq.add_daily_entry(77, exp.id, date(2024, 1, 1) + timedelta(days=day), {"mood": day % 5, "sleep": 7})
+    return exp.id
+
+
+# — stale artefacts are computed once, stored, and served to the handlers without refitting ——
+@pytest.mark.asyncio
+async def test_precompute_stores_and_resumes(fake_workers):
+    exp_id = await _experiment_with_entries(12)
+
+    # no time left: nothing starts and everything stays stale
+    assert await precompute.precompute_all(budget=0) == {"done": 0, "failed": 0, "deferred": 7}
+    assert fake_workers == []
+
+    # regression for the goal + every view but rolling, which needs 28 days and stores its warning
+    assert await precompute.precompute_all() == {"done": 7, "failed": 0, "deferred": 0}
+    assert sorted(fake_workers) == ["core.analysis:correlation_report"] * 5 + ["core.analysis:regression_report"]
+
+    version = await rq.get_data_version(exp_id)
+    payload, png = await precompute.correlation_result(77, exp_id, "same", version)
+    assert png == b"png"
+    payload, png = await precompute.correlation_result(77, exp_id, "rolling", version)
+    assert png is None and "rolling" in payload["caption"]
+    assert len(fake_workers) == 6
+
+    # nothing stale until new entries arrive
+    assert await precompute.precompute_all() == {"done": 0, "failed": 0, "deferred": 0}
+    await rq.add_daily_entry(77, exp_id, date(2024, 2, 1), {"mood": 3})
+    assert (await precompute.precompute_all())["done"] == 7
+
+
+# — goals never entered, or nothing but goals: a stored warning, not a worker crash ——————
+@pytest.mark.asyncio
+@pytest.mark.parametrize("entry, warning", [({"sleep": 7}, "None of the goal"), ({"mood": 3}, "Only goal")])
+async def test_correlation_warns_without_pairs(fake_workers, entry, warning):
+    await rq.add_user(78, "sparse", 780)
+    exp = await rq.add_experiment(78, "sparse")
+    await rq.add_parameter(78, "mood", True, ParamType.NUMERIC, exp.id)
+    await rq.add_parameter(78, "sleep", False, ParamType.NUMERIC, exp.id)
+    for day in range(12):
+        await rq.add_daily_entry(78, exp.id, date(2024, 1, 1) + timedelta(days=day), entry)
+
+    payload, png = await precompute.correlation_result(78, exp.id, "same", await rq.get_data_version(exp.id))
+
+    assert png is None and warning in payload["caption"]
+    assert fake_workers == []
+
+
+# — a stored warning goes stale once the missing parameter is added ——————————————————
+@pytest.mark.asyncio
+async def test_new_parameter_invalidates_results(fake_workers):
+    await rq.add_user(79, "late goal", 790)
+    exp = await rq.add_experiment(79, "late goal")
+    await rq.add_parameter(79, "sleep", False, ParamType.NUMERIC, exp.id)
+    for day in range(12):
+        await rq.add_daily_entry(79, exp.id, date(2024, 1, 1) + timedelta(days=day), {"sleep": 7, "mood": day % 5})
+    payload, _ = await precompute.correlation_result(79, exp.id, "same", await rq.get_data_version(exp.id))
+    assert "no goal parameters" in payload["caption"]
+
+    await rq.add_parameter(79, "mood", True, ParamType.NUMERIC, exp.id)
+    payload, png = await precompute.correlation_result(79, exp.id, "same", await rq.get_data_version(exp.id))
+
+    assert png == b"png" and fake_workers == ["core.analysis:correlation_report"]
+
+
+# — experiments logged before data_version existed are precomputed too, without per-job lookups ——
+@pytest.mark.asyncio
+async def test_precompute_legacy_experiment(fake_workers, db_engine):
+    await rq.add_user(80, "legacy", 800)
+    exp = await rq.add_experiment(80, "legacy")
+    # written the old way: no data_version bump
+    async with db_engine.begin() as conn:
+        await conn.execute(
+            text("INSERT INTO parameters (user_id, experiment_id, name, is_goal, type) VALUES "
+                 "(80, :exp, 'mood', true, 'NUMERIC'), (80, :exp, 'sleep', false, 'NUMERIC')"), {"exp": exp.id})
+        for day in range(12):
+            await conn.execute(
+                text("INSERT INTO daily_entries (user_id, experiment_id, entry_date, data) VALUES (80, :exp, :day, :data)"),
+                {"exp": exp.id, "day": date(2024, 1, 1) + timedelta(days=day), "data": f'{{"mood": {day % 5}, "sleep": 7}}'})
+    assert await rq.get_data_version(exp.id) == 0
+
+    with query_audit.query_scope("precompute") as scope:
+        assert await precompute.precompute_all() == {"done": 7, "failed": 0, "deferred": 0}
+
+    # the backlog query loads the parameters once for every job
+    assert sum(count for sql, (count, _) in scope.statements.items() if "FROM parameters" in sql) == 1
+    assert await precompute.precompute_all() == {"done": 0, "failed": 0, "deferred": 0}
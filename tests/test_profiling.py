@@ -0,0 +1,66 @@
+import json
+import sys
+import threading
+import time
+
+from core import profiling
+
+
+def busy_loop(seconds: float) -> int:
+    """Pure-Python work the sampler can see on the stack."""
+    total, end = 0, time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        total += sum(range(200))
+    return total
+
+
+def _frames(stacks) -> set[str]:
+    return {frame.split(" (")[0] for stack in stacks for frame in stack.split(";")}
+
+
+# — start/stop: the busy frame is sampled while acquired, nothing is after release ——————
+def test_sampler_sees_busy_frame():
+    sampler = profiling.Sampler(threading.get_ident(), interval=0.001)
+    sampler.start()
+    try:
+        sampler.acquire()
+        start = time.perf_counter()
+        busy_loop(0.2)
+        end = time.perf_counter()
+        sampler.release()
+        time.sleep(0.05)  # a sample in progress at release lands now
+        taken = len(sampler.samples)
+        busy_loop(0.1)
+        assert len(sampler.samples) == taken
+    finally:
+        sampler.close()
+
+    stacks = sampler.collapsed(start, end)
+    # aggregated: one entry per distinct stack, counts add up to the samples in the window
+    assert sum(stacks.values()) == sum(1 for t, _ in sampler.samples if start <= t <= end) > 10
+    busy = [stack for stack in stacks if "busy_loop (test_profiling.py:" in stack]
+    assert busy and sum(stacks[s] for s in busy) >= 0.8 * sum(stacks.values())
+    # root first: the test function is called before busy_loop on every stack
+    assert all(s.index("test_sampler_sees_busy_frame") < s.index("busy_loop") for s in busy)
+
+
+# — worker side: the job's result plus its own samples ——————————————————————————
+def test_profiled_call():
+    (started, finished, result), samples = profiling.profiled_call(
+        "tests.test_profiling:busy_loop", (0.1,), {}, interval=0.001)
+
+    assert result > 0 and finished - started >= 0.1
+    assert "busy_loop" in _frames(samples)
+
+
+# — saved trace → collapsed stacks for flamegraph.pl, worker stacks prefixed ——————————
+def test_trace_export(tmp_path, capsys, monkeypatch):
+    record = {"handler": "run_analysis", "user_id": 7,
+              "loop_samples": {"main;handle": 3}, "worker_samples": {"main;busy_loop": 5}}
+    path = profiling.save_trace(record, out_dir=tmp_path)
+    assert json.loads(path.read_text())["handler"] == "run_analysis"
+
+    monkeypatch.setattr(sys, "argv", ["profiling", str(path), str(path)])
+    profiling.main()
+    assert capsys.readouterr().out.splitlines() == ["worker;main;busy_loop 10", "main;handle 6"]
+    assert profiling.folded(record, "loop") == {"main;handle": 3}
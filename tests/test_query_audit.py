@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy import text
+
+from core.database import query_audit
+
+
+# — a failing EXPLAIN leaves the audited request's transaction usable ——————————
+@pytest.mark.asyncio
+async def test_failed_explain_keeps_transaction(db_engine):
+    def explain_broken(conn):
+        with pytest.raises(Exception):
+            query_audit._explain(conn, "SELECT * FROM no_such_table", ())
+        return query_audit._explain(conn, "SELECT 1", ())
+
+    async with db_engine.begin() as conn:
+        await conn.execute(text("SELECT count(*) FROM users"))
+        assert await conn.run_sync(explain_broken)
+        assert (await conn.execute(text("SELECT count(*) FROM users"))).scalar_one() == 0
+
+
+# — slow statements are logged with their plan, repeated shapes as N+1 ——————————
+@pytest.mark.asyncio
+async def test_slow_and_repeated_statements_are_logged(db_engine, monkeypatch, caplog):
+    monkeypatch.setattr(query_audit, "SLOW_QUERY_SECONDS", 0.0)
+    # tests/conftest.py already listens on every Engine
+    with query_audit.query_scope("probe"):
+        async with db_engine.connect() as conn:
+            for tg_id in range(query_audit.REPEAT_THRESHOLD):
+                await conn.execute(text("SELECT * FROM users WHERE tg_id = :id"), {"id": tg_id})
+    assert "Slow query in probe" in caplog.text and "EXPLAIN failed" not in caplog.text
+    assert f"Possible N+1 in probe: {query_audit.REPEAT_THRESHOLD}×" in caplog.text
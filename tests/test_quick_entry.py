@@ -0,0 +1,30 @@
+from datetime import date
+from types import SimpleNamespace
+
+from bot.handlers.quick_entry import parse_pairs, validate
+from core.database.models import ParamType
+
+PARAMS = [
+    SimpleNamespace(name="sleep hours", type=ParamType.NUMERIC, class_min=None, class_max=None),
+    SimpleNamespace(name="mood", type=ParamType.CLASS, class_min=1, class_max=5),
+    SimpleNamespace(name="vitamins", type=ParamType.BOOLEAN, class_min=None, class_max=None),
+]
+
+
+def test_parse_pairs():
+    assert parse_pairs("sleep hours=7.5 mood=4, vitamins=+") == [("sleep hours", "7.5"), ("mood", "4"), ("vitamins", "+")]
+    # a filled-in template: one pair per line, blanks allowed
+    assert parse_pairs("\nsleep hours=7\nmood=\nvitamins=-\n") == [("sleep hours", "7"), ("mood", ""), ("vitamins", "-")]
+    assert parse_pairs("mood 4") is None
+    assert parse_pairs("mood=4 oops") is None
+
+
+def test_validate_all_values_in_one_pass():
+    values, day, errors = validate(PARAMS, [("Sleep Hours", "7.5"), ("mood", ""), ("date", "2024-03-01")])
+    assert values == {"sleep hours": "7.5"}
+    assert day == date(2024, 3, 1)
+    assert errors == []
+
+    values, _, errors = validate(PARAMS, [("mood", "9"), ("vitamins", "yes"), ("steps", "1000"), ("sleep hours", "8")])
+    assert values == {"sleep hours": "8"}
+    assert errors == ["mood: Value must be 1–5.", "vitamins: Send `+` or `-`.", "steps: no such parameter"]
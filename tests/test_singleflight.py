@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from core.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_identical_calls_share_one_computation():
+    flights = SingleFlight()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    results = await asyncio.gather(*(flights.do(("regression", 1, "mood", 3), compute) for _ in range(5)))
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert not flights.in_flight(("regression", 1, "mood", 3))
+
+    # a new data_version is a different key and computes again
+    await flights.do(("regression", 1, "mood", 4), compute)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_the_others():
+    flights = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        return 42
+
+    first = asyncio.create_task(flights.do("k", compute))
+    second = asyncio.create_task(flights.do("k", compute))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    assert await second == 42
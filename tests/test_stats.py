@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import core.database.requests as rq
+from bot.handlers.stats import show_stats
+
+
+@pytest.fixture(autouse=True)
+def override_sessionmaker(monkeypatch, db_engine):
+    monkeypatch.setattr("core.database.requests.async_session", async_sessionmaker(db_engine, expire_on_commit=False))
+
+
+class FakeQuery:
+    def __init__(self, data: str):
+        self.data = data
+        self.sent = []
+        self.message = SimpleNamespace(edit_text=self._edit)
+
+    async def _edit(self, text, **kwargs):
+        self.sent.append(text)
+
+    async def answer(self, *args, **kwargs):
+        pass
+
+
+class FakeState:
+    async def clear(self):
+        pass
+
+
+# — an experiment written before rollups existed (data_version still 0) is rebuilt once ——
+@pytest.mark.asyncio
+async def test_stats_for_legacy_experiment(db_engine):
+    await rq.add_user(88, "legacy", 880)
+    exp = await rq.add_experiment(88, "old")
+    today = date.today()
+    # raw inserts, as the bot wrote them before rollups: no rollups, streak or data_version bump
+    async with db_engine.begin() as conn:
+        for days_ago, data in ((0, '{"mood": 4}'), (1, '{"sleep": 7}')):
+            await conn.execute(
+                text("INSERT INTO daily_entries (user_id, experiment_id, entry_date, data) VALUES (88, :exp, :day, :data)"),
+                {"exp": exp.id, "day": today - timedelta(days=days_ago), "data": data})
+    assert (await rq.get_experiment(exp.id)).data_version == 0
+
+    query = FakeQuery(f"sel_exp:{exp.id}")
+    await show_stats(query, FakeState())
+
+    report = query.sent[0]
+    assert "No entries" not in report
+    assert "mood" in report and "sleep" in report
+    # two days with an entry, each with a different parameter
+    days_this_month = 2 if today.day > 1 else 1
+    assert f"month {days_this_month}/" in report
+    assert (await rq.get_experiment(exp.id)).last_entry_date == today